@@ -3,6 +3,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from st_components.imports_and_utils import *
 from core.onekeycleanup import cleanup
 from core.config_utils import load_key
+from core.pipeline import Stage, StageError, run_pipeline, text_stages, audio_stages
 import shutil
 from functools import partial
 from rich.panel import Panel
@@ -20,52 +21,33 @@ def process_video(file, dubbing=False, is_retry=False):
     if not is_retry:
         prepare_output_folder(OUTPUT_DIR)
     
-    text_steps = [
-        ("🎥 Processing input file", partial(process_input_file, file)),
-        ("🎙️ Transcribing with Whisper", partial(step2_whisperX.transcribe)),
-        ("✂️ Splitting sentences", split_sentences),
-        ("📝 Summarizing and translating", summarize_and_translate),
-        ("⚡ Processing and aligning subtitles", process_and_align_subtitles),
-        ("🎬 Merging subtitles to video", step7_merge_sub_to_vid.merge_subtitles_to_video),
-    ]
-    
+    # subtitle burning (step 7) overlaps the dubbing steps, they only share read-only inputs
+    stages = [Stage("input_file", partial(process_input_file, file), label="🎥 Processing input file",
+                    outputs=["video"], cache=False)]
+    stages += text_stages()
     if dubbing:
-        dubbing_steps = [
-            ("🔊 Generating audio tasks", gen_audio_tasks),
-            ("🎵 Extracting reference audio", step9_extract_refer_audio.extract_refer_audio_main),
-            ("🗣️ Generating audio", step10_gen_audio.gen_audio),
-            ("🔄 Merging full audio", step11_merge_full_audio.merge_full_audio),
-            ("🎞️ Merging dubbing to video", step12_merge_dub_to_vid.merge_video_audio),
-        ]
-        text_steps.extend(dubbing_steps)
-    
-    current_step = ""
-    for step_name, step_func in text_steps:
-        current_step = step_name
-        for attempt in range(3):
-            try:
-                console.print(Panel(
-                    f"[bold green]{step_name}[/]",
-                    subtitle=f"Attempt {attempt + 1}/3" if attempt > 0 else None,
-                    border_style="blue"
-                ))
-                result = step_func()
-                if result is not None:
-                    globals().update(result)
-                break
-            except Exception as e:
-                if attempt == 2:
-                    error_panel = Panel(
-                        f"[bold red]Error in step '{current_step}':[/]\n{str(e)}",
-                        border_style="red"
-                    )
-                    console.print(error_panel)
-                    cleanup(ERROR_OUTPUT_DIR)
-                    return False, current_step, str(e)
-                console.print(Panel(
-                    f"[yellow]Attempt {attempt + 1} failed. Retrying...[/]",
-                    border_style="yellow"
-                ))
+        stages += audio_stages()
+
+    def on_start(stage):
+        console.print(Panel(f"[bold green]{stage.label}[/]", border_style="blue"))
+
+    def on_retry(stage, attempt, error):
+        console.print(Panel(
+            f"[yellow]{stage.label}: attempt {attempt} failed. Retrying...[/]\n{error}",
+            subtitle=f"Attempt {attempt + 1}/3",
+            border_style="yellow"
+        ))
+
+    try:
+        run_pipeline(stages, retries=3, on_start=on_start, on_retry=on_retry)
+    except StageError as e:
+        error_panel = Panel(
+            f"[bold red]Error in step '{e.stage.label}':[/]\n{str(e)}",
+            border_style="red"
+        )
+        console.print(error_panel)
+        cleanup(ERROR_OUTPUT_DIR)
+        return False, e.stage.label, str(e)
     
     console.print(Panel("[bold green]All steps completed successfully! 🎉[/]", border_style="green"))
     cleanup(SAVE_DIR)
@@ -85,20 +67,4 @@ def process_input_file(file):
         output_file = os.path.join(OUTPUT_DIR, file)
         shutil.copy(input_file, output_file)
         video_file = output_file
-    return {'video_file': video_file}
-
-def split_sentences():
-    step3_1_spacy_split.split_by_spacy()
-    step3_2_splitbymeaning.split_sentences_by_meaning()
-
-def summarize_and_translate():
-    step4_1_summarize.get_summary()
-    step4_2_translate_all.translate_all()
-
-def process_and_align_subtitles():
-    step5_splitforsub.split_for_sub_main()
-    step6_generate_final_timeline.align_timestamp_main()
-
-def gen_audio_tasks():
-    step8_1_gen_audio_task.gen_audio_task_main()
-    step8_2_gen_dub_chunks.gen_dub_chunks()
+    return video_file
@@ -0,0 +1,33 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ruamel.yaml import YAML
+from core.config_utils import load_key, CONFIG_PATH
+
+# keys hit inside per-row loops (calc_if_too_fast, get_joiner, translate)
+KEYS = ["speed_factor.accept", "language_split_with_space", "display_language", "whisper.language"]
+N = 2000
+
+def load_key_uncached(key):
+    """The previous implementation: re-open and re-parse config.yaml on every call"""
+    yaml = YAML()
+    yaml.preserve_quotes = True
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as file:
+        data = yaml.load(file)
+    value = data
+    for k in key.split('.'):
+        value = value[k]
+    return value
+
+def bench(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(KEYS[i % len(KEYS)])
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    load_key(KEYS[0])  # warm up the snapshot
+    uncached = bench(load_key_uncached, N // 10) * 10
+    cached = bench(load_key, N)
+    print(f"🐢 re-parse per call : {uncached / N * 1e6:10.1f} µs/call ({uncached:.2f}s for {N} calls)")
+    print(f"🚀 cached snapshot   : {cached / N * 1e6:10.1f} µs/call ({cached:.4f}s for {N} calls)")
+    print(f"⚡ speedup: {uncached / cached:.0f}x")
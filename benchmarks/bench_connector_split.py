@@ -0,0 +1,139 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+import spacy
+from spacy.tokens import Doc
+from core.spacy_utils import split_by_connector
+from core.spacy_utils.split_by_connector import analyze_connectors, split_by_connector_spans
+
+# Connector splitting: the legacy chain cut a sentence at its first connector, re-parsed both parts and repeated
+# until no part was cut; split_by_connector_spans makes every cut in one pass over the sentence's parse, the left
+# context restarting at the previous cut. Both run on the same sentences and the resulting parts are compared.
+# Without a model, hand-annotated sentences (POS, dependencies, heads) stand in and a part is "re-parsed" by
+# keeping its tokens' labels, heads outside the part become roots (Span.as_doc). With a model name, the
+# transcript is parsed for real and every part is re-parsed by the model, as the legacy chain did.
+# usage: python benchmarks/bench_connector_split.py [model] [sentences]
+MODEL = sys.argv[1] if len(sys.argv) > 1 else None
+N_SENTENCES = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+# word|POS|dep|head, heads are token indices within the sentence
+ANNOTATED = [
+    "I|PRON|nsubj|1 told|VERB|ROOT|1 him|PRON|dobj|1 yesterday|NOUN|npadvmod|1 after|ADP|prep|1 the|DET|det|6 "
+    "game|NOUN|pobj|4 that|SCONJ|mark|10 the|DET|det|9 coach|NOUN|nsubj|10 wanted|VERB|ccomp|1 "
+    "everyone|PRON|dobj|10 back|ADV|advmod|10 at|ADP|prep|10 the|DET|det|15 rink|NOUN|pobj|13 "
+    "early|ADV|advmod|10 .|PUNCT|punct|1",
+    # "that" as a determiner is not cut
+    "Last|ADJ|amod|1 night|NOUN|npadvmod|4 we|PRON|nsubj|4 all|DET|appos|2 watched|VERB|ROOT|4 that|DET|det|6 "
+    "clip|NOUN|dobj|4 from|ADP|prep|6 the|DET|det|9 game|NOUN|pobj|7 five|NUM|nummod|11 times|NOUN|npadvmod|4 "
+    "in|ADP|prep|4 a|DET|det|14 row|NOUN|pobj|12 and|CCONJ|cc|4 we|PRON|nsubj|20 still|ADV|advmod|20 "
+    "could|AUX|aux|20 not|PART|neg|20 see|VERB|conj|4 the|DET|det|22 foul|NOUN|dobj|20 .|PUNCT|punct|4",
+    # three cuts in a row, "that" right after a cut lacks left context
+    "He|PRON|nsubj|1 kept|VERB|ROOT|1 the|DET|det|3 puck|NOUN|dobj|1 on|ADP|prep|1 his|PRON|poss|6 "
+    "stick|NOUN|pobj|4 because|SCONJ|mark|10 the|DET|det|9 defender|NOUN|nsubj|10 was|AUX|advcl|1 "
+    "too|ADV|advmod|12 slow|ADJ|acomp|10 and|CCONJ|cc|1 he|PRON|nsubj|15 knew|VERB|conj|1 that|SCONJ|mark|20 "
+    "the|DET|det|18 goalie|NOUN|nsubj|20 would|AUX|aux|20 drop|VERB|ccomp|15 early|ADV|advmod|20 "
+    "but|CCONJ|cc|15 nobody|PRON|nsubj|24 expected|VERB|conj|15 the|DET|det|26 shot|NOUN|dobj|24 "
+    "at|ADP|prep|24 all|ADV|pobj|27 .|PUNCT|punct|1",
+    "We|PRON|nsubj|1 lost|VERB|ROOT|1 the|DET|det|3 game|NOUN|dobj|1 in|ADP|prep|1 overtime|NOUN|pobj|4 "
+    "and|CCONJ|cc|1 then|ADV|advmod|9 we|PRON|nsubj|9 lost|VERB|conj|1 the|DET|det|12 next|ADJ|amod|12 "
+    "one|NOUN|dobj|9 and|CCONJ|cc|12 the|DET|det|15 one|NOUN|conj|12 after|ADP|prep|15 that|PRON|pobj|16 "
+    "too|ADV|advmod|9 .|PUNCT|punct|1",
+    # "and" has 5 words of left context only when counted across the cut at "because"
+    "She|PRON|nsubj|1 said|VERB|ROOT|1 it|PRON|nsubj|3 was|AUX|ccomp|1 over|ADJ|acomp|3 because|SCONJ|mark|7 "
+    "he|PRON|nsubj|7 blew|VERB|advcl|3 it|PRON|dobj|7 and|CCONJ|cc|7 the|DET|det|11 play|NOUN|nsubj|12 "
+    "went|VERB|conj|7 on|ADP|prt|12 for|ADP|prep|12 a|DET|det|16 while|NOUN|pobj|14 after|ADP|prep|12 "
+    "that|PRON|pobj|17 .|PUNCT|punct|1",
+    # "that" before a contraction is skipped
+    "They|PRON|nsubj|2 always|ADV|advmod|2 say|VERB|ROOT|2 that|PRON|nsubj|4 's|AUX|ccomp|2 the|DET|det|7 "
+    "whole|ADJ|amod|7 difference|NOUN|attr|4 between|ADP|prep|7 a|DET|det|11 good|ADJ|amod|11 "
+    "player|NOUN|pobj|8 and|CCONJ|cc|11 a|DET|det|15 great|ADJ|amod|15 one|NOUN|conj|11 in|ADP|prep|15 "
+    "this|DET|det|18 league|NOUN|pobj|16 .|PUNCT|punct|2",
+    # "which" as a determiner is not cut, "when" is
+    "Nobody|PRON|nsubj|4 in|ADP|prep|0 the|DET|det|3 building|NOUN|pobj|1 knew|VERB|ROOT|4 which|DET|det|6 "
+    "team|NOUN|nsubj|8 would|AUX|aux|8 win|VERB|ccomp|4 until|ADP|prep|8 the|DET|det|13 very|ADV|advmod|12 "
+    "last|ADJ|amod|13 minute|NOUN|pobj|9 when|SCONJ|advmod|18 the|DET|det|16 puck|NOUN|nsubj|18 "
+    "finally|ADV|advmod|18 crossed|VERB|relcl|13 the|DET|det|20 line|NOUN|dobj|18 .|PUNCT|punct|4",
+    # punctuation does not count as context
+    "Well|INTJ|intj|5 ,|PUNCT|punct|5 honestly|ADV|advmod|5 ,|PUNCT|punct|5 that|PRON|nsubj|5 is|AUX|ROOT|5 "
+    "the|DET|det|7 spot|NOUN|attr|5 on|ADP|prep|7 the|DET|det|10 ice|NOUN|pobj|8 where|SCONJ|advmod|17 "
+    "most|ADJ|amod|13 goals|NOUN|nsubj|17 in|ADP|prep|13 this|DET|det|16 league|NOUN|pobj|14 "
+    "come|VERB|relcl|7 from|ADP|prep|17 .|PUNCT|punct|5",
+    "You|PRON|nsubj|2 can|AUX|aux|2 shoot|VERB|ROOT|2 high|ADV|advmod|2 glove|NOUN|compound|5 "
+    "side|NOUN|npadvmod|2 right|ADV|advmod|7 away|ADV|advmod|2 or|CCONJ|cc|2 you|PRON|nsubj|11 "
+    "can|AUX|aux|11 wait|VERB|conj|2 for|SCONJ|mark|15 him|PRON|nsubj|15 to|PART|aux|15 drop|VERB|advcl|11 "
+    "and|CCONJ|cc|15 go|VERB|conj|15 five|NUM|nummod|19 hole|NOUN|npadvmod|17 .|PUNCT|punct|2",
+]
+
+NO_SPACE_BEFORE = {".", ",", "'s", "n't"}
+
+def annotated_doc(vocab, sentences):
+    """One Doc of all sentences, with the given POS, dependencies and heads"""
+    words, pos, deps, heads = [], [], [], []
+    for sentence in sentences:
+        offset = len(words)
+        for token in sentence.split():
+            word, tag, dep, head = token.split("|")
+            words.append(word)
+            pos.append(tag)
+            deps.append(dep)
+            heads.append(offset + int(head))
+    spaces = [i + 1 < len(words) and words[i + 1] not in NO_SPACE_BEFORE for i in range(len(words))]
+    return Doc(vocab, words=words, spaces=spaces, pos=pos, deps=deps, heads=heads)
+
+def legacy_split_at_first_connector(doc, context_words=5):
+    for i, token in enumerate(doc):
+        split_before, _ = analyze_connectors(doc, token)
+        if i + 1 < len(doc) and doc[i + 1].text in ["'s", "'re", "'ve", "'ll", "'d"]:
+            continue
+        left_words = [word.text for word in doc[max(0, token.i - context_words):token.i] if not word.is_punct]
+        right_words = [word.text for word in doc[token.i+1:min(len(doc), token.i + context_words + 1)] if not word.is_punct]
+        if len(left_words) >= context_words and len(right_words) >= context_words and split_before:
+            return [doc[:token.i], doc[token.i:]]
+    return [doc[:]]
+
+def legacy_split_by_connectors(sentence, reparse, context_words=5):
+    """The legacy loop: cut every part at its first connector, re-parse the parts, until a pass makes no cut"""
+    parts = [reparse(sentence)]
+    while True:
+        new_parts = [piece for part in parts for piece in legacy_split_at_first_connector(part, context_words)]
+        if len(new_parts) == len(parts):
+            return [part.text.strip() for part in parts]
+        parts = [reparse(piece) for piece in new_parts]
+
+def compare(sentences, reparse):
+    start = time.perf_counter()
+    legacy = [legacy_split_by_connectors(sentence, reparse) for sentence in sentences]
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new = [[piece.text.strip() for piece in split_by_connector_spans([sentence])] for sentence in sentences]
+    new_time = time.perf_counter() - start
+    diffs = [(a, b) for a, b in zip(legacy, new) if a != b]
+    print(f"{len(sentences)} sentences, legacy {sum(map(len, legacy)) - len(legacy)} cuts in {legacy_time:.2f}s, "
+          f"one pass {sum(map(len, new)) - len(new)} cuts in {new_time:.2f}s, {len(diffs)} sentences differ")
+    for a, b in diffs[:10]:
+        print(f"  legacy:   {a}\n  one pass: {b}")
+    return legacy, new
+
+CLAUSES = [
+    "so in the same frame right there", "almost in the exact same spot on the ice", "Brown has committed himself",
+    "whereas McDavid has not", "and that is the whole difference", "because the goalie has to respect the shot",
+    "which means he cannot cheat to the post", "but most players never learn this", "when you watch it again in slow motion",
+    "and you can see that his weight shifts to the left", "or the defender reads the pass that he wanted to make",
+]
+
+def model_transcript(n, seed=0):
+    rng = random.Random(seed)
+    return " ".join(" ".join(rng.sample(CLAUSES, rng.randint(2, 5))).capitalize() + "." for _ in range(n))
+
+if __name__ == "__main__":
+    split_by_connector.print = lambda *args, **kwargs: None
+    if MODEL is None:
+        doc = annotated_doc(spacy.blank("en").vocab, ANNOTATED)
+        legacy, new = compare(list(doc.sents), lambda part: part.as_doc())
+        for parts in new:
+            print("  " + " | ".join(parts))
+    else:
+        nlp = spacy.load(MODEL)
+        doc = nlp(model_transcript(N_SENTENCES))
+        # legacy: each sentence and each part parsed on its own; one pass: spans of the whole-transcript parse
+        compare(list(doc.sents), lambda part: nlp(part.text.strip()))
@@ -0,0 +1,60 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import resource
+import tempfile
+import subprocess
+
+# Peak memory of whole-file vs windowed Demucs separation over growing durations. Every run is a fresh
+# process so ru_maxrss is the peak of that separation alone. Needs demucs/torch, Linux or macOS.
+# usage: python benchmarks/bench_demucs_memory.py [minutes ...]
+WINDOW = 60
+
+def make_audio(path, seconds):
+    # noise plus a tone, stereo at the model rate like raw.mp3
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', f'anoisesrc=c=pink:a=0.1:r=44100:d={seconds}',
+        '-f', 'lavfi', '-i', f'sine=f=220:sample_rate=44100:d={seconds}',
+        '-filter_complex', 'amix=inputs=2', '-ac', '2', '-b:a', '128k', path
+    ], check=True)
+
+def child(mode, raw_file, out_dir):
+    from core import audio_store
+    from core.all_whisper_methods import demucs_vl
+    audio_store.STORE_DIR = os.path.join(out_dir, 'pcm')
+    model = demucs_vl.get_model('htdemucs')
+    model.eval()
+    files = dict(raw_file=raw_file, vocal_file=os.path.join(out_dir, 'vocal.mp3'),
+                 background_file=os.path.join(out_dir, 'background.mp3'))
+    start = time.perf_counter()
+    if mode == 'windowed':
+        demucs_vl.separate_windowed(model, WINDOW, **files)
+    else:
+        demucs_vl.separate_whole(model, **files)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 2**20 if sys.platform == 'darwin' else peak / 2**10  # bytes on macOS, KB on Linux
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_mb": peak_mb}))
+
+def run(mode, raw_file, out_dir):
+    out = subprocess.run([sys.executable, __file__, '--child', mode, raw_file, out_dir],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--child']:
+        child(*sys.argv[2:5])
+        sys.exit(0)
+    minutes_list = [float(m) for m in sys.argv[1:]] or [5, 20, 60]
+    print(f"{'minutes':>8}{'whole peak':>14}{'whole time':>12}{'windowed peak':>16}{'windowed time':>15}")
+    for minutes in minutes_list:
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = os.path.join(tmp, 'raw.mp3')
+            make_audio(raw_file, int(minutes * 60))
+            results = {}
+            for mode in ('whole', 'windowed'):
+                out_dir = os.path.join(tmp, mode)
+                os.makedirs(out_dir)
+                results[mode] = run(mode, raw_file, out_dir)
+        whole, windowed = results['whole'], results['windowed']
+        print(f"{minutes:>8.0f}{whole['peak_mb']:>11.0f} MB{whole['seconds']:>11.1f}s"
+              f"{windowed['peak_mb']:>13.0f} MB{windowed['seconds']:>14.1f}s")
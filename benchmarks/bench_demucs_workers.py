@@ -0,0 +1,37 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tempfile
+from core import audio_store
+from core.all_whisper_methods import demucs_vl
+from benchmarks.bench_demucs_memory import make_audio
+
+# CPU scaling of windowed Demucs separation with 1, 2, 4 and 8 worker processes. Needs demucs/torch;
+# run it on a CPU-only node (CUDA_VISIBLE_DEVICES= on a GPU box), since sharding only applies on CPU.
+# usage: python benchmarks/bench_demucs_workers.py [minutes] [window seconds]
+MINUTES = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+WINDOW = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+WORKERS = [1, 2, 4, 8]
+
+if __name__ == "__main__":
+    assert demucs_vl.get_device() == 'cpu', "process sharding is CPU only"
+    model = demucs_vl.get_model(demucs_vl.DEMUCS_MODEL)
+    model.eval()
+    print(f"{MINUTES:.0f} min audio, {WINDOW:.0f}s windows, {os.cpu_count()} cores")
+    print(f"{'workers':>8}{'threads each':>14}{'time':>10}{'speedup':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_file = os.path.join(tmp, 'raw.mp3')
+        make_audio(raw_file, int(MINUTES * 60))
+        audio_store.STORE_DIR = os.path.join(tmp, 'pcm')
+        audio_store.pcm_entry(raw_file, model.samplerate, model.audio_channels)  # decode outside the timing
+        baseline = None
+        for workers in WORKERS:
+            files = dict(raw_file=raw_file, vocal_file=os.path.join(tmp, f'vocal_{workers}.mp3'),
+                         background_file=os.path.join(tmp, f'background_{workers}.mp3'))
+            if workers == 1:
+                demucs_vl.torch.set_num_threads(os.cpu_count() or 1)
+            start = time.perf_counter()
+            demucs_vl.separate_windowed(model, WINDOW, workers=workers, **files)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            print(f"{workers:>8}{threads:>14}{elapsed:>9.1f}s{baseline / elapsed:>9.2f}x")
@@ -0,0 +1,56 @@
+import os, sys, time, json, threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from openai import AsyncOpenAI
+from core.ask_gpt import get_client, parse_json, run_async
+
+N = 200
+COMPLETION = {
+    "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "stub",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": json.dumps({"1": {"origin": "hello", "direct": "你好"}})}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+}
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /v1/chat/completions endpoint"""
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+    connections = set()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StubHandler.connections.add(self.client_address)
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+async def sequential_calls(make_client, base_url):
+    for _ in range(N):
+        client = make_client(base_url)
+        response = await client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}])
+        parse_json(response.choices[0].message.content)
+
+def run(make_client, base_url):
+    StubHandler.connections.clear()
+    start = time.perf_counter()
+    run_async(sequential_calls(make_client, base_url))
+    return (time.perf_counter() - start) / N, len(StubHandler.connections)
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    fresh, fresh_conns = run(lambda url: AsyncOpenAI(api_key="sk-bench", base_url=url), base_url)
+    pooled, pooled_conns = run(lambda url: get_client(url, "sk-bench"), base_url)
+    print(f"🐢 new client per call : {fresh * 1000:.2f} ms/call, {fresh_conns} TCP connections")
+    print(f"🚀 pooled client       : {pooled * 1000:.2f} ms/call, {pooled_conns} TCP connections")
+
+    server.shutdown()
@@ -0,0 +1,61 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tempfile
+import subprocess
+from core import audio_store
+from core.all_whisper_methods.dsp_separation import dsp_separate
+
+# Speed and downstream ASR of the separation engines on a real recording (speech over music works best).
+# htdemucs and the word counts need demucs / whisperx, engines or columns that cannot be imported are skipped.
+# usage: python benchmarks/bench_separation.py <audio or video file> [max minutes]
+VOCALS_RATIO = 2.5  # same boost step2 applies to separated vocals
+
+def to_raw(src, path, seconds):
+    """The same conversion step2 does for raw.mp3, returns the duration"""
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', src, '-t', str(seconds), '-vn', '-c:a', 'libmp3lame',
+                    '-b:a', '128k', '-ar', '32000', '-ac', '1', path], check=True)
+    return os.path.getsize(audio_store.pcm_entry(path, 32000)) / 4 / 32000
+
+def separate_htdemucs(raw_file, vocal_file, background_file):
+    from core.all_whisper_methods import demucs_vl
+    model = demucs_vl.get_model(demucs_vl.DEMUCS_MODEL)
+    model.eval()
+    demucs_vl.separate_windowed(model, 60, raw_file=raw_file, vocal_file=vocal_file, background_file=background_file)
+
+def word_count(audio_file, volume):
+    from core.all_whisper_methods.whisperX_local import transcribe_audio, release_models
+    from core.all_whisper_methods.audio_preprocess import get_audio_duration
+    result = transcribe_audio(audio_file, 0, get_audio_duration(audio_file), volume=volume)
+    release_models(force=True)
+    return sum(len(segment['text'].split()) for segment in result['segments'])
+
+def try_word_count(audio_file, volume):
+    try:
+        return word_count(audio_file, volume)
+    except ImportError:
+        return None
+
+if __name__ == "__main__":
+    src = sys.argv[1]
+    minutes = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    engines = {"dsp": dsp_separate, "htdemucs": separate_htdemucs}
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_store.STORE_DIR = os.path.join(tmp, 'pcm')
+        raw_file = os.path.join(tmp, 'raw.mp3')
+        seconds = to_raw(src, raw_file, minutes * 60)
+        rows = [("none (raw)", None, try_word_count(raw_file, 1.0))]
+        for name, separate in engines.items():
+            vocal_file = os.path.join(tmp, f'vocal_{name}.mp3')
+            try:
+                start = time.perf_counter()
+                separate(raw_file, vocal_file, os.path.join(tmp, f'background_{name}.mp3'))
+                elapsed = time.perf_counter() - start
+            except ImportError as e:
+                print(f"skip {name}: {e}")
+                continue
+            rows.append((name, elapsed, try_word_count(vocal_file, VOCALS_RATIO)))
+
+    print(f"{'engine':>12}{'time':>10}{'x real time':>13}{'ASR words':>11}")
+    for name, elapsed, words in rows:
+        speed = f"{elapsed:9.1f}s{seconds / elapsed:12.1f}x" if elapsed else f"{'-':>10}{'-':>13}"
+        print(f"{name:>12}{speed}{words if words is not None else '-':>11}")
@@ -0,0 +1,89 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import subprocess
+import tempfile
+import numpy as np
+from core import audio_store
+from core.all_whisper_methods import audio_preprocess
+from core.all_whisper_methods.audio_preprocess import split_audio, get_audio_duration
+
+# Synthetic "speech": a tone muted for 0.8s every 7s, encoded like for_whisper.mp3 (16 kHz mono 96k)
+HOURS = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+def make_audio(path, seconds):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', f'sine=f=440:sample_rate=16000:d={seconds}',
+        '-af', "volume=enable='lt(mod(t,7),0.8)':volume=0", '-b:a', '96k', '-ac', '1', path
+    ], check=True)
+
+def detect_silence_legacy(audio_file, start, end):
+    """The previous per-boundary detector: output seeking decodes from the start of the file every call"""
+    cmd = ['ffmpeg', '-y', '-i', audio_file, '-ss', str(start), '-to', str(end),
+           '-af', 'silencedetect=n=-30dB:d=0.5', '-f', 'null', '-']
+    output = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8').stderr
+    return [float(line.split('silence_end: ')[1].split(' ')[0]) for line in output.split('\n') if 'silence_end' in line]
+
+def split_audio_legacy(audio_file, target_len=30*60, win=60):
+    duration = get_audio_duration(audio_file)
+    segments, pos = [], 0
+    while pos < duration:
+        if duration - pos < target_len:
+            segments.append((pos, duration))
+            break
+        win_start = pos + target_len - win
+        win_end = min(win_start + 2 * win, duration)
+        silences = detect_silence_legacy(audio_file, win_start, win_end)
+        if silences:
+            target_pos = target_len - (win_start - pos)
+            split_at = next((t for t in silences if t - win_start > target_pos), None)
+            if split_at:
+                segments.append((pos, split_at))
+                pos = split_at
+                continue
+        segments.append((pos, pos + target_len))
+        pos += target_len
+    return segments
+
+def load_segments_legacy(audio_file, segments, tmp):
+    """The previous whisper input path: cut each segment to a temp wav with ffmpeg, then load it at 16 kHz"""
+    wav = os.path.join(tmp, 'segment.wav')
+    for start, end in segments:
+        subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', audio_file, '-ss', str(start), '-t', str(end - start),
+                        '-vn', '-ar', '32000', '-ac', '1', wav], check=True)
+        raw = subprocess.run(['ffmpeg', '-v', 'error', '-i', wav, '-ar', '16000', '-f', 'f32le', '-'],
+                             capture_output=True, check=True).stdout
+        np.frombuffer(raw, dtype=np.float32).sum()
+
+def load_segments_store(audio_file, segments):
+    samples = audio_store.load_pcm(audio_file, 16000)
+    for start, end in segments:
+        np.asarray(audio_store.pcm_slice(samples, 16000, start, end)).sum()
+
+if __name__ == "__main__":
+    audio_preprocess.print = lambda *args, **kwargs: None  # silence the rich progress prints
+    audio_store.rprint = lambda *args, **kwargs: None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.mp3')
+        audio_store.STORE_DIR = os.path.join(tmp, 'pcm')
+        start = time.perf_counter()
+        make_audio(path, int(HOURS * 3600))
+        print(f"generated {HOURS}h synthetic audio in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        legacy = split_audio_legacy(path)
+        legacy_split = time.perf_counter() - start
+        load_segments_legacy(path, legacy, tmp)
+        legacy_total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        segments = split_audio(path)
+        map_split = time.perf_counter() - start
+        load_segments_store(path, segments)
+        map_total = time.perf_counter() - start
+
+    print(f"cut points (per-boundary silencedetect): {[round(b, 2) for _, b in legacy]}")
+    print(f"cut points (single-pass silence map):    {[round(b, 2) for _, b in segments]}")
+    print(f"{'':28}{'split':>8}{'split + whisper input':>24}")
+    print(f"{'per-boundary + temp wavs':28}{legacy_split:7.1f}s{legacy_total:23.1f}s")
+    print(f"{'silence map + PCM store':28}{map_split:7.1f}s{map_total:23.1f}s")
+    print(f"speedup {legacy_total / map_total:.1f}x end to end")
@@ -0,0 +1,80 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+import spacy
+from core.spacy_utils import load_nlp_model, split_by_comma, split_by_connector, split_long_by_root
+from core.spacy_utils.split_by_mark import split_by_mark
+
+# spaCy work of step 3: the legacy chain parsed the transcript for sentence marks, then re-parsed every sentence
+# for the comma stage and again for the connector stage (a lower bound, the connector loop re-parsed each cut
+# part too), vs split_by_spacy's single parse whose spans every stage cuts. Token counting with the full
+# pipeline vs count_tokens (tokenizer alone). Without the model installed, an untrained pipeline with the same
+# components stands in: random weights, but the same compute per sentence.
+# usage: python benchmarks/bench_spacy_pipe.py [sentences] [model]
+N_SENTENCES = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+MODEL = sys.argv[2] if len(sys.argv) > 2 else "en_core_web_md"
+
+CLAUSES = [
+    "so in the same frame right there", "almost in the exact same spot on the ice",
+    "Brown has committed himself", "whereas McDavid has not", "and that is the whole difference",
+    "because the goalie has to respect the shot", "which means he cannot cheat to the post",
+    "but most players never learn this", "when you watch it again in slow motion", "you can see his weight shift",
+]
+
+def transcript(n, seed=0):
+    rng = random.Random(seed)
+    return [", ".join(rng.sample(CLAUSES, rng.randint(1, 4))).capitalize() + "." for _ in range(n)]
+
+def load_model(name):
+    try:
+        return spacy.load(name)
+    except OSError:
+        print(f"{name} not installed, timing an untrained tok2vec + tagger + parser + ner pipeline")
+        nlp = spacy.blank("en")
+        nlp.add_pipe("tok2vec")
+        labels = {"tagger": ["NN", "VB", "DT", "IN", "JJ", "PRP", "RB", "CC", ","],
+                  "parser": ["ROOT", "nsubj", "dobj", "prep", "pobj", "det", "amod", "advmod", "cc", "conj", "mark", "punct"],
+                  "ner": ["PERSON", "ORG", "GPE"]}
+        for pipe, pipe_labels in labels.items():
+            component = nlp.add_pipe(pipe)
+            for label in pipe_labels:
+                component.add_label(label)
+        nlp.initialize()
+        return nlp
+
+def timed(label, func, n):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:44}{elapsed:8.1f}s{n / elapsed:12.0f} sent/s")
+    return elapsed
+
+def legacy_parses(nlp, text):
+    sentences = [sent.text.strip() for sent in nlp(text).sents]
+    for _ in ("comma", "connector"):
+        sentences = [sent.text.strip() for sent in nlp.pipe(sentences, batch_size=256)]
+    return sentences
+
+def one_parse_split(nlp, text):
+    spans = split_by_connector.split_by_connector_spans(split_by_comma.split_by_comma_spans(split_by_mark(nlp(text))))
+    return list(split_long_by_root.split_long_by_root(spans, nlp))
+
+if __name__ == "__main__":
+    nlp = load_model(MODEL)
+    nlp.max_length = 10 ** 8
+    sentences = transcript(N_SENTENCES)
+    text = " ".join(sentences)
+    load_nlp_model.load_key = lambda key: {"spacy_batch_size": 256}[key]
+    for module in (split_by_comma, split_by_connector, split_long_by_root):
+        module.print = lambda *args, **kwargs: None
+    print(f"{N_SENTENCES} sentences, {MODEL}, {os.cpu_count()} cores")
+
+    print("parse")
+    legacy = timed("  legacy: marks, then re-parse per stage", lambda: legacy_parses(nlp, text), N_SENTENCES)
+    elapsed = timed("  split_by_spacy: one parse, span stages", lambda: one_parse_split(nlp, text), N_SENTENCES)
+    print(f"  speedup {legacy / elapsed:.1f}x")
+
+    print("token counts (step3_2 length check)")
+    legacy = timed("  len(nlp(sentence))", lambda: [len(nlp(s)) for s in sentences], N_SENTENCES)
+    elapsed = timed("  count_tokens", lambda: load_nlp_model.count_tokens(nlp, sentences), N_SENTENCES)
+    print(f"  speedup {legacy / elapsed:.1f}x")
@@ -0,0 +1,54 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tempfile
+import spacy
+from core.spacy_utils import load_nlp_model
+from core.spacy_utils.load_nlp_model import NlpView
+from benchmarks.bench_spacy_pipe import transcript, load_model as build_model
+
+# Model load time and per-sentence latency of the split stages, before (a full spacy.load in step3_1 and
+# again in step3_2, for every video of a batch) and after (one registry load without the unused components,
+# stage views). Without the model installed, an untrained pipeline with the same components is saved to disk.
+# usage: python benchmarks/bench_spacy_registry.py [videos] [sentences] [model]
+VIDEOS = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+N_SENTENCES = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+MODEL = sys.argv[3] if len(sys.argv) > 3 else "en_core_web_md"
+
+def latency_ms(func, sentences):
+    start = time.perf_counter()
+    for sentence in sentences:
+        func(sentence)
+    return (time.perf_counter() - start) / len(sentences) * 1000
+
+if __name__ == "__main__":
+    load_nlp_model.print = lambda *args, **kwargs: None
+    sentences = transcript(N_SENTENCES)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            spacy.load(MODEL)
+            model = MODEL
+        except OSError:
+            model = os.path.join(tmp, 'model')
+            build_model(MODEL).to_disk(model)
+
+        start = time.perf_counter()
+        for _ in range(VIDEOS):
+            full = spacy.load(model)  # step3_1
+            spacy.load(model)  # step3_2
+        before_load = time.perf_counter() - start
+        before_split = latency_ms(full, sentences)
+        before_count = latency_ms(lambda s: len(full(s)), sentences)
+
+        start = time.perf_counter()
+        for _ in range(VIDEOS):
+            split = NlpView(load_nlp_model.load_model(model), "split")
+            tokenize = NlpView(load_nlp_model.load_model(model), "tokenize")
+        after_load = time.perf_counter() - start
+        after_split = latency_ms(split, sentences)
+        after_count = latency_ms(lambda s: len(tokenize.tokenizer(s)), sentences)
+
+    print(f"{VIDEOS} videos, {N_SENTENCES} sentences, pipes {full.pipe_names} -> split view {[p for p in split.pipe_names if p not in split.disable]}")
+    print(f"{'':30}{'before':>10}{'after':>10}")
+    print(f"{'model loads (all videos)':30}{before_load:9.2f}s{after_load:9.2f}s")
+    print(f"{'split parse per sentence':30}{before_split:8.2f}ms{after_split:8.2f}ms")
+    print(f"{'token count per sentence':30}{before_count:8.2f}ms{after_count:8.2f}ms")
@@ -0,0 +1,105 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+from difflib import SequenceMatcher
+from core import step3_2_splitbymeaning as step3_2
+
+# Split points of find_split_positions on a fixture corpus of LLM-style [br] splits, legacy full SequenceMatcher
+# scan vs the normalized exact match + banded edit distance. Every case must give the same split points.
+# The corpus covers exact splits, whitespace and case drift, dropped punctuation, reworded parts and CJK.
+# usage: python benchmarks/bench_split_positions.py [cases per kind] [words per sentence]
+N_CASES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+N_WORDS = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+WORDS = ("so in the same frame right there almost exact spot on ice Brown has committed himself whereas McDavid "
+         "not and that is whole difference because goalie to respect shot which means he cannot cheat post but "
+         "most players never learn this when you watch it again slow motion can see his weight shift").split()
+REWORDS = {"cannot": "can't", "because": "'cause", "going": "gonna", "that is": "that's", "and": "&"}
+CJK = "我们今天要讨论的是这个问题的核心就在于守门员必须尊重射门所以他不能提前移动到门柱大多数球员从来没有学会这一点"
+
+def legacy_find_split_positions(original, modified, joiner):
+    split_positions = []
+    parts = modified.split('[br]')
+    start = 0
+    for i in range(len(parts) - 1):
+        max_similarity = 0
+        best_split = None
+        for j in range(start, len(original)):
+            original_left = original[start:j]
+            modified_left = joiner.join(parts[i].split())
+            similarity = SequenceMatcher(None, original_left, modified_left).ratio()
+            if similarity > max_similarity:
+                max_similarity = similarity
+                best_split = j
+        if best_split is not None:
+            split_positions.append(best_split)
+            start = best_split
+    return split_positions
+
+def cut(tokens, rng, joiner):
+    """Tokens joined into 2-4 parts at random word boundaries"""
+    points = sorted(rng.sample(range(2, len(tokens) - 1), rng.randint(1, 3)))
+    return [joiner.join(tokens[a:b]) for a, b in zip([0] + points, points + [len(tokens)])]
+
+def english(kind, rng):
+    tokens = [rng.choice(WORDS) for _ in range(N_WORDS)]
+    for i in rng.sample(range(N_WORDS), N_WORDS // 8):
+        tokens[i] += ","
+    tokens[0], tokens[-1] = tokens[0].capitalize(), tokens[-1] + "."
+    original = " ".join(tokens)
+    parts = cut(tokens, rng, " ")
+    if kind == "spacing":
+        original = original.replace(" ", "  ", 3).replace(", ", " , ", 2)
+    elif kind == "case":
+        parts = [p.lower() if rng.random() < 0.5 else p for p in parts]
+    elif kind == "punctuation":
+        parts = [p.replace(",", "", 1) for p in parts]
+    elif kind == "reworded":
+        for old, new in REWORDS.items():
+            parts = [p.replace(old, new, 1) for p in parts]
+    return original, parts, " "
+
+def chinese(kind, rng):
+    start = rng.randrange(len(CJK) // 2)
+    chars = list(CJK[start:start + rng.randint(20, len(CJK) // 2)])
+    original = "".join(chars)
+    parts = cut(chars, rng, "")
+    if kind == "cjk_spaced":  # the LLM puts spaces around its break markers
+        parts = [f" {p} " for p in parts]
+    return original, parts, ""
+
+KINDS = {"exact": english, "spacing": english, "case": english, "punctuation": english, "reworded": english,
+         "cjk": chinese, "cjk_spaced": chinese}
+
+def fixture_corpus(seed=0):
+    rng = random.Random(seed)
+    return [(kind, *make(kind, rng)) for kind, make in KINDS.items() for _ in range(N_CASES)]
+
+if __name__ == "__main__":
+    step3_2.console.print = lambda *args, **kwargs: None  # low-similarity warnings
+    corpus = fixture_corpus()
+    print(f"{len(corpus)} cases, {N_WORDS} words per English sentence")
+    print(f"{'kind':>12}{'legacy':>10}{'new':>10}{'speedup':>9}{'same splits':>13}")
+    total_legacy = total_new = mismatches = 0
+    for kind in KINDS:
+        cases = [case[1:] for case in corpus if case[0] == kind]
+        elapsed_legacy = elapsed_new = 0
+        same = 0
+        for original, parts, joiner in cases:
+            step3_2.get_joiner = lambda language: joiner
+            step3_2.load_key = lambda key: "zh" if joiner == "" else "en"
+            modified = "[br]".join(parts)
+            start = time.perf_counter()
+            expected = legacy_find_split_positions(original, modified, joiner)
+            elapsed_legacy += time.perf_counter() - start
+            start = time.perf_counter()
+            got = step3_2.find_split_positions(original, modified)
+            elapsed_new += time.perf_counter() - start
+            same += got == expected
+            if got != expected and mismatches < 5:
+                print(f"  mismatch {kind}: {original!r} {parts!r} legacy {expected} new {got}")
+            mismatches += got != expected
+        total_legacy, total_new = total_legacy + elapsed_legacy, total_new + elapsed_new
+        print(f"{kind:>12}{elapsed_legacy:9.2f}s{elapsed_new:9.3f}s{elapsed_legacy / elapsed_new:8.0f}x{same:>8}/{len(cases)}")
+    print(f"{'total':>12}{total_legacy:9.2f}s{total_new:9.3f}s{total_legacy / total_new:8.0f}x"
+          f"{len(corpus) - mismatches:>8}/{len(corpus)}")
@@ -0,0 +1,84 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import re
+import random
+import tempfile
+import pandas as pd
+from core.step6_generate_final_timeline import align_timestamp, SUBTITLE_OUTPUT_CONFIGS
+
+# Timeline post-processing and SRT rendering of align_timestamp on a long subtitle table: the legacy .loc gap
+# loop, per-row time formatting and one iterrows pass per subtitle file vs the columnar version.
+# Sentence lookup is left out (see bench_transcript_index.py), both get the same timestamps.
+# Checks that the returned table and all four .srt files are identical.
+# usage: python benchmarks/bench_subtitles.py [rows]
+N_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+class FixedTimestamps:
+    """Stands in for the TranscriptIndex, returns precomputed (start, end) pairs"""
+    def __init__(self, timestamps):
+        self.list = timestamps
+
+    def timestamps(self, sentences):
+        return self.list
+
+def subtitle_table(n, seed=0):
+    rng = random.Random(seed)
+    timestamps, t = [], 0.0
+    for _ in range(n):
+        start = t + rng.choice([0, 0, rng.uniform(0, 0.9), rng.uniform(1, 5)])
+        t = start + rng.uniform(0.5, 6)
+        timestamps.append((round(start, 3), round(t, 3)))
+    df = pd.DataFrame({'Source': [f" Sentence number {i}, which is said here. " for i in range(n)],
+                       'Translation': [f"第{i}句，在这里说。" for i in range(n)]})
+    return df, timestamps
+
+def legacy_convert_to_srt_format(start_time, end_time):
+    def seconds_to_hmsm(seconds):
+        hours = int(seconds // 3600)
+        minutes = int((seconds % 3600) // 60)
+        seconds = seconds % 60
+        milliseconds = int(seconds * 1000) % 1000
+        return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
+    return f"{seconds_to_hmsm(start_time)} --> {seconds_to_hmsm(end_time)}"
+
+def legacy_align_timestamp(timestamps, df_translate, subtitle_output_configs, output_dir, for_display=True):
+    df_trans_time = df_translate.copy()
+    df_trans_time['timestamp'] = timestamps
+    df_trans_time['duration'] = df_trans_time['timestamp'].apply(lambda x: x[1] - x[0])
+    for i in range(len(df_trans_time)-1):
+        delta_time = df_trans_time.loc[i+1, 'timestamp'][0] - df_trans_time.loc[i, 'timestamp'][1]
+        if 0 < delta_time < 1:
+            df_trans_time.at[i, 'timestamp'] = (df_trans_time.loc[i, 'timestamp'][0], df_trans_time.loc[i+1, 'timestamp'][0])
+    df_trans_time['timestamp'] = df_trans_time['timestamp'].apply(lambda x: legacy_convert_to_srt_format(x[0], x[1]))
+    if for_display:
+        df_trans_time['Translation'] = df_trans_time['Translation'].apply(lambda x: re.sub(r'[，。]', ' ', x).strip())
+    def generate_subtitle_string(df, columns):
+        return ''.join([f"{i+1}\n{row['timestamp']}\n{row[columns[0]].strip()}\n{row[columns[1]].strip() if len(columns) > 1 else ''}\n\n" for i, row in df.iterrows()]).strip()
+    os.makedirs(output_dir, exist_ok=True)
+    for filename, columns in subtitle_output_configs:
+        with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(generate_subtitle_string(df_trans_time, columns))
+    return df_trans_time
+
+def read_outputs(output_dir):
+    outputs = {}
+    for filename, _ in SUBTITLE_OUTPUT_CONFIGS:
+        with open(os.path.join(output_dir, filename), encoding='utf-8') as f:
+            outputs[filename] = f.read()
+    return outputs
+
+if __name__ == "__main__":
+    df, timestamps = subtitle_table(N_ROWS)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        legacy = legacy_align_timestamp(timestamps, df, SUBTITLE_OUTPUT_CONFIGS, os.path.join(tmp, 'legacy'))
+        legacy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        new = align_timestamp(FixedTimestamps(timestamps), df, SUBTITLE_OUTPUT_CONFIGS, os.path.join(tmp, 'new'))
+        new_time = time.perf_counter() - start
+        same_files = read_outputs(os.path.join(tmp, 'legacy')) == read_outputs(os.path.join(tmp, 'new'))
+
+    print(f"{N_ROWS} subtitle rows, {len(SUBTITLE_OUTPUT_CONFIGS)} srt files")
+    print(f"legacy   {legacy_time:8.2f}s")
+    print(f"columnar {new_time:8.2f}s   speedup {legacy_time / new_time:.0f}x")
+    print(f"same table: {legacy.equals(new)}, same srt files: {same_files}")
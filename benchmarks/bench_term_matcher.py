@@ -0,0 +1,72 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import random
+import tempfile
+from core import step4_1_summarize
+
+# Prompt building of translate_all with a large glossary: the legacy search_things_to_note_in_prompt (re-reads
+# terminology.json per chunk, one lowercase substring scan per term) vs the cached Aho–Corasick TermMatcher.
+# With word boundaries off both must give the same prompts; with them on (space-delimited languages) the
+# chunks whose prompt changes are counted, those are partial-word hits the legacy search reported.
+# usage: python benchmarks/bench_term_matcher.py [terms] [chunks]
+N_TERMS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+N_CHUNKS = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+SYLLABLES = ["ka", "ri", "mo", "ten", "zu", "la", "vi", "on", "ex", "dra", "po", "si", "net", "al", "gor"]
+
+def word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+
+def glossary(n, rng):
+    terms = []
+    for _ in range(n):
+        src = " ".join(word(rng) for _ in range(rng.choice([1, 1, 1, 2, 3])))
+        terms.append({"src": src.title() if rng.random() < 0.3 else src, "tgt": src.upper(), "note": f"meaning of {src}"})
+    return {"theme": "benchmark", "terms": terms}
+
+def chunks(n, rng):
+    """Translation chunks of ~10 lines, about 500 characters like split_chunks_by_chars"""
+    return ["\n".join(" ".join(word(rng) for _ in range(rng.randint(5, 12))).capitalize() + "." for _ in range(10))
+            for _ in range(n)]
+
+def legacy_search_things_to_note_in_prompt(sentence, path):
+    with open(path, 'r', encoding='utf-8') as file:
+        things_to_note = json.load(file)
+    things_to_note_list = [term['src'] for term in things_to_note['terms'] if term['src'].lower() in sentence.lower()]
+    if things_to_note_list:
+        return '\n'.join(
+            f'{i+1}. "{term["src"]}": "{term["tgt"]}",'
+            f' meaning: {term["note"]}'
+            for i, term in enumerate(things_to_note['terms'])
+            if term['src'] in things_to_note_list
+        )
+    return None
+
+def timed(func, texts):
+    start = time.perf_counter()
+    results = [func(text) for text in texts]
+    return results, time.perf_counter() - start
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    texts = chunks(N_CHUNKS, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'terminology.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(glossary(N_TERMS, rng), f, ensure_ascii=False)
+        step4_1_summarize.TERMINOLOGY_JSON_PATH = path
+        step4_1_summarize.load_key = lambda key: "en"
+
+        legacy, legacy_time = timed(lambda text: legacy_search_things_to_note_in_prompt(text, path), texts)
+        step4_1_summarize.get_joiner = lambda language: ""  # plain substring matching, as the legacy search
+        substring, substring_time = timed(step4_1_summarize.search_things_to_note_in_prompt, texts)
+        step4_1_summarize.get_joiner = lambda language: " "
+        bounded, bounded_time = timed(step4_1_summarize.search_things_to_note_in_prompt, texts)
+
+    print(f"{N_TERMS} terms, {N_CHUNKS} chunks")
+    print(f"{'legacy per-term scan':32}{legacy_time:8.2f}s")
+    print(f"{'TermMatcher, substrings':32}{substring_time:8.2f}s  speedup {legacy_time / substring_time:.0f}x"
+          f"  same prompts: {legacy == substring}")
+    print(f"{'TermMatcher, word boundaries':32}{bounded_time:8.2f}s  speedup {legacy_time / bounded_time:.0f}x"
+          f"  prompts without partial-word hits: {sum(a != b for a, b in zip(legacy, bounded))}/{N_CHUNKS}")
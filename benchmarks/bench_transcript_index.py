@@ -0,0 +1,85 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+import tracemalloc
+import pandas as pd
+from core.transcript_index import TranscriptIndex, remove_punctuation
+
+# Sentence timestamps of a long word-level transcript: the legacy per-character dict + sliding compare, called
+# three times per video (translate_all, align_timestamp_main x2), vs one TranscriptIndex shared by the three.
+# Checks that both give the same timestamps. usage: python benchmarks/bench_transcript_index.py [hours]
+HOURS = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+WORDS_PER_MINUTE = 150
+CALLS = 3
+
+WORDS = ("so in the same frame right there almost exact spot on the ice Brown has committed himself whereas "
+         "McDavid has not and that's the whole difference because goalie has to respect shot which means he "
+         "can't cheat to post but most players never learn this when you watch it again in slow motion").split()
+
+def transcript(hours, seed=0):
+    """Word rows (text, start, end) and the sentences of 3-15 words they make up"""
+    rng = random.Random(seed)
+    n = int(hours * 60 * WORDS_PER_MINUTE)
+    words = [rng.choice(WORDS) for _ in range(n)]
+    sentences, i = [], 0
+    while i < n:
+        length = rng.randint(3, 15)
+        chunk = words[i:i + length]
+        sentences.append(" ".join(chunk).capitalize() + rng.choice([".", ",", "?", ""]))
+        words[i + len(chunk) - 1] += "."  # whisper keeps punctuation on the words
+        i += length
+    times = [k * 60 / WORDS_PER_MINUTE for k in range(n + 1)]
+    return pd.DataFrame({'text': words, 'start': times[:-1], 'end': times[1:]}), pd.DataFrame({'Source': sentences})
+
+def legacy_get_sentence_timestamps(df_words, df_sentences):
+    time_stamp_list = []
+    full_words_str = ''
+    position_to_word_idx = {}
+    for idx, word in enumerate(df_words['text']):
+        clean_word = remove_punctuation(word.lower())
+        start_pos = len(full_words_str)
+        full_words_str += clean_word
+        for pos in range(start_pos, len(full_words_str)):
+            position_to_word_idx[pos] = idx
+    current_pos = 0
+    for idx, sentence in df_sentences['Source'].items():
+        clean_sentence = remove_punctuation(sentence.lower()).replace(" ", "")
+        sentence_len = len(clean_sentence)
+        match_found = False
+        while current_pos <= len(full_words_str) - sentence_len:
+            if full_words_str[current_pos:current_pos+sentence_len] == clean_sentence:
+                start_word_idx = position_to_word_idx[current_pos]
+                end_word_idx = position_to_word_idx[current_pos + sentence_len - 1]
+                time_stamp_list.append((float(df_words['start'][start_word_idx]), float(df_words['end'][end_word_idx])))
+                current_pos += sentence_len
+                match_found = True
+                break
+            current_pos += 1
+        if not match_found:
+            raise ValueError("❎ No match found for sentence.")
+    return time_stamp_list
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+if __name__ == "__main__":
+    df_words, df_sentences = transcript(HOURS)
+    print(f"{HOURS:g} h transcript: {len(df_words)} words, {len(df_sentences)} sentences, {CALLS} lookups per video")
+
+    legacy, legacy_time, legacy_peak = measure(
+        lambda: [legacy_get_sentence_timestamps(df_words, df_sentences) for _ in range(CALLS)][-1])
+    def indexed():
+        index = TranscriptIndex(df_words)
+        return [index.timestamps(df_sentences['Source']) for _ in range(CALLS)][-1]
+    new, new_time, new_peak = measure(indexed)
+
+    print(f"{'':24}{'time':>10}{'peak mem':>12}")
+    print(f"{'legacy dict + slide':24}{legacy_time:9.2f}s{legacy_peak:9.1f} MB")
+    print(f"{'TranscriptIndex':24}{new_time:9.2f}s{new_peak:9.1f} MB")
+    print(f"speedup {legacy_time / new_time:.0f}x, same timestamps: {legacy == new}")
@@ -0,0 +1,95 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import tempfile
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from core import audio_store
+from core.config_utils import load_key
+from core.all_whisper_methods import whisperX_302
+from core.all_whisper_methods.audio_preprocess import split_audio
+
+# A local stand-in for the 302 whisperx endpoint: counts uploaded bytes, simulates an uplink shared by all
+# concurrent uploads and a fixed server-side processing time per request, answers with a one-segment result.
+# usage: python benchmarks/bench_whisper_upload.py [minutes] [uplink MB/s]
+MINUTES = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+UPLINK_BYTES_PER_S = float(sys.argv[2] if len(sys.argv) > 2 else 4) * 1024 * 1024
+PROCESSING_S = 1.0
+
+class Stub(BaseHTTPRequestHandler):
+    uploaded = 0
+    requests = 0
+    lock = threading.Lock()
+    link = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with Stub.lock:
+            Stub.uploaded += len(body)
+            Stub.requests += 1
+        with Stub.link:
+            time.sleep(len(body) / UPLINK_BYTES_PER_S)
+        time.sleep(PROCESSING_S)
+        reply = json.dumps({"segments": [{"start": 0.0, "end": 1.0, "text": "stub", "words": []}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+def make_audio(path, seconds):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', f'sine=f=440:sample_rate=44100:d={seconds}',
+        '-af', "volume=enable='lt(mod(t,7),0.8)':volume=0", '-b:a', '128k', '-ac', '1', path
+    ], check=True)
+
+def transcribe_legacy(audio_path, segments, url, tmp):
+    """The previous path: cut each segment to a 32 kHz wav and upload it, one segment after the other"""
+    for start, end in segments:
+        wav = os.path.join(tmp, 'segment.wav')
+        subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', audio_path, '-ss', str(start), '-t', str(end - start),
+                        '-vn', '-ar', '32000', '-ac', '1', wav], check=True)
+        with open(wav, 'rb') as f:
+            requests.post(url, data={"processing_type": "align"}, files=[('audio_input', ('segment.wav', f, 'application/octet-stream'))])
+
+def run(label, func):
+    Stub.uploaded = Stub.requests = 0
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:34}{Stub.requests:>9}{Stub.uploaded / 1024 / 1024:>13.1f} MB{elapsed:>10.1f}s")
+    return elapsed
+
+if __name__ == "__main__":
+    whisperX_302.rprint = lambda *args, **kwargs: None
+    audio_store.rprint = lambda *args, **kwargs: None
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/302/whisperx"
+    whisperX_302.API_URL = url
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'raw.mp3')
+        make_audio(path, int(MINUTES * 60))
+        audio_store.STORE_DIR = os.path.join(tmp, 'pcm')
+        whisperX_302.CACHE_DIR = os.path.join(tmp, 'whisperx302')
+        # short segments so a one hour file gives several uploads
+        segments = split_audio(path, target_len=5*60, win=30)
+        print(f"{MINUTES:.0f} min audio, {len(segments)} segments, {load_key('max_workers')} workers, "
+              f"uplink {UPLINK_BYTES_PER_S / 1024 / 1024:.0f} MB/s, {PROCESSING_S:.1f}s processing per request")
+        print(f"{'':34}{'requests':>9}{'uploaded':>16}{'wall':>11}")
+
+        legacy = run("sequential 32 kHz wav", lambda: transcribe_legacy(path, segments, url, tmp))
+        for codec in whisperX_302.CODECS:
+            whisperX_302.load_key = lambda key, codec=codec: codec if key == "whisper.upload_codec" else load_key(key)
+            elapsed = run(f"parallel 16 kHz {codec}", lambda: whisperX_302.transcribe_segments_302(path, segments))
+            print(f"{'':34}speedup {legacy / elapsed:.1f}x")
+        # the codec is part of the segment key, so the opus results are still cached
+        whisperX_302.load_key = lambda key: "opus" if key == "whisper.upload_codec" else load_key(key)
+        run("parallel opus, segment cache warm", lambda: whisperX_302.transcribe_segments_302(path, segments))
+    server.shutdown()
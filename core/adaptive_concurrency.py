@@ -0,0 +1,161 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from rich import print as rprint
+from openai import RateLimitError
+from core.config_utils import load_key
+
+# Additive-increase / multiplicative-decrease concurrency control per backend (LLM base_url, TTS method).
+# The limit grows by 1 after a full window of healthy calls and is halved on 429 / 5xx / timeouts
+# or when latency degrades far beyond the best observed latency. Latency is tracked per kind of call
+# (the LLM log_title): short split prompts and long translation prompts share a backend, not a baseline.
+
+BACKOFF_FACTOR = 0.5
+LATENCY_SLOWDOWN = 3.0  # ewma latency this many times above the baseline counts as congestion
+EWMA_ALPHA = 0.2
+
+_CONTROLLERS = {}
+_REGISTRY_LOCK = threading.Lock()
+
+def classify_error(error):
+    """Return 'throttle', 'server', 'timeout' or None for errors that say nothing about load.
+    Decided on the HTTP status and the exception type only, never on the message text."""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if status == 429 or isinstance(error, RateLimitError):
+        return 'throttle'
+    if isinstance(status, int) and status >= 500:
+        return 'server'
+    # httpx.TimeoutException, openai.APITimeoutError, requests Timeout, asyncio/builtin TimeoutError
+    if any('timeout' in cls.__name__.lower() for cls in type(error).__mro__):
+        return 'timeout'
+    return None
+
+class AIMDController:
+    def __init__(self, name, initial, max_limit, min_limit=1):
+        self.name = name
+        self.min_limit, self.max_limit = min_limit, max(max_limit, min_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self.successes = 0
+        self.latency = {}  # kind of call -> [ewma latency, baseline (best ewma) latency]
+        self.last_window = 1.0  # ewma latency of the last call, length of the back-off window
+        self.last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_cond = None
+
+    @property
+    def current(self):
+        return int(self.limit)
+
+    def _set_limit(self, new_limit, reason):
+        new_limit = min(max(new_limit, self.min_limit), self.max_limit)
+        if int(new_limit) != int(self.limit):
+            rprint(f"[cyan]🎚️ [AIMD] {self.name}: concurrency {int(self.limit)} → {int(new_limit)} ({reason})[/cyan]")
+        self.limit = new_limit
+        self.successes = 0
+
+    def on_success(self, latency, kind=None):
+        with self._cond:
+            stats = self.latency.get(kind)
+            if stats is None:
+                stats = self.latency[kind] = [latency, latency]
+            else:
+                stats[0] = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * stats[0]
+                stats[1] = min(stats[1], stats[0])
+            ewma, baseline = stats
+            self.last_window = ewma
+            if ewma > LATENCY_SLOWDOWN * baseline:
+                if self._decrease(f"latency {ewma:.2f}s vs baseline {baseline:.2f}s"):
+                    # the slowdown may be the new normal, let the baseline follow
+                    stats[1] = max(baseline, ewma / LATENCY_SLOWDOWN)
+            else:
+                self.successes += 1
+                if self.successes >= self.current:  # one full window of healthy calls
+                    self._set_limit(self.limit + 1, f"latency {ewma:.2f}s")
+            self._cond.notify_all()
+
+    def on_error(self, kind):
+        with self._cond:
+            self._decrease(kind)
+            self._cond.notify_all()
+
+    def _decrease(self, reason):
+        # calls already in flight fail together, only back off once per latency window
+        now = time.monotonic()
+        if now - self.last_decrease < self.last_window:
+            return False
+        self.last_decrease = now
+        self._set_limit(self.limit * BACKOFF_FACTOR, reason)
+        return True
+
+    def _record(self, start, error=None, kind=None):
+        if error is None:
+            self.on_success(time.monotonic() - start, kind)
+        else:
+            kind = classify_error(error)
+            if kind:
+                self.on_error(kind)
+
+    @contextmanager
+    def slot(self, kind=None):
+        """Blocking slot for thread pools, `kind` names the kind of call its latency is compared with"""
+        with self._cond:
+            while self.in_flight >= self.current:
+                self._cond.wait()
+            self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._record(start, e)
+            raise
+        else:
+            self._record(start, kind=kind)
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    @asynccontextmanager
+    async def async_slot(self, kind=None):
+        """Slot for coroutines running on a single event loop, `kind` as for slot()"""
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        async with self._async_cond:
+            await self._async_cond.wait_for(lambda: self.in_flight < self.current)
+            with self._cond:
+                self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._record(start, e)
+            raise
+        else:
+            self._record(start, kind=kind)
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+            async with self._async_cond:
+                self._async_cond.notify_all()
+
+def get_controller(name, initial=None, max_limit=None):
+    """One controller per backend, shared by every stage in the process. Rebuilt when the settings it was
+    made from change (max_workers, adaptive_concurrency), so config edits apply to the next stage"""
+    initial = load_key("max_workers") if initial is None else initial
+    adaptive_set = load_key("adaptive_concurrency")
+    if not adaptive_set["enabled"]:
+        max_limit, min_limit = initial, initial
+    else:
+        max_limit, min_limit = adaptive_set["max_workers"] if max_limit is None else max_limit, 1
+    settings = (initial, max_limit, min_limit)
+    with _REGISTRY_LOCK:
+        built = _CONTROLLERS.get(name)
+        if built is None or built[0] != settings:
+            controller = AIMDController(name, initial, max_limit, min_limit=min_limit)
+            rprint(f"[cyan]🎚️ [AIMD] {name}: start at concurrency {controller.current} (max {controller.max_limit})[/cyan]")
+            _CONTROLLERS[name] = built = (settings, controller)
+    return built[1]
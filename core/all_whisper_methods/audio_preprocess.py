@@ -1,27 +1,16 @@
 import os, sys, subprocess
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple
 from rich import print
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from core.config_utils import update_key
+from core.audio_store import load_pcm
 
 AUDIO_DIR = "output/audio"
 RAW_AUDIO_FILE = "output/audio/raw.mp3"
 CLEANED_CHUNKS_EXCEL_PATH = "output/log/cleaned_chunks.xlsx"
 
-def compress_audio(input_file: str, output_file: str):
-    """将输入音频文件压缩为低质量音频文件，用于转录"""
-    if not os.path.exists(output_file):
-        print(f"🗜️ Converting to low quality audio with FFmpeg ......")
-        # 16000 Hz, 1 channel, (Whisper default) , 96kbps to keep more details as well as smaller file size
-        subprocess.run([
-            'ffmpeg', '-y', '-i', input_file, '-vn', '-b:a', '96k',
-            '-ar', '16000', '-ac', '1', '-metadata', 'encoding=UTF-8',
-            '-f', 'mp3', output_file
-        ], check=True, stderr=subprocess.PIPE)
-        print(f"🗜️ Converted <{input_file}> to <{output_file}> with FFmpeg")
-    return output_file
-
 def convert_video_to_audio(video_file: str):
     os.makedirs(AUDIO_DIR, exist_ok=True)
     if not os.path.exists(RAW_AUDIO_FILE):
@@ -35,19 +24,35 @@ def convert_video_to_audio(video_file: str):
         ], check=True, stderr=subprocess.PIPE)
         print(f"🎬➡️🎵 Converted <{video_file}> to <{RAW_AUDIO_FILE}> with FFmpeg\n")
 
-def _detect_silence(audio_file: str, start: float, end: float) -> List[float]:
-    """Detect silence points in the given audio segment"""
-    cmd = ['ffmpeg', '-y', '-i', audio_file, 
-           '-ss', str(start), '-to', str(end),
-           '-af', 'silencedetect=n=-30dB:d=0.5', 
-           '-f', 'null', '-']
-    
-    output = subprocess.run(cmd, capture_output=True, text=True, 
-                          encoding='utf-8').stderr
-    
-    return [float(line.split('silence_end: ')[1].split(' ')[0])
-            for line in output.split('\n')
-            if 'silence_end' in line]
+SILENCE_SR = 16000  # the rate whisper reads, so silence detection and transcription share one decode
+SILENCE_FRAME = 0.01  # seconds per energy frame
+SILENCE_BLOCK = SILENCE_SR * 60  # samples scanned per block, keeps memory flat for multi-hour files
+
+def build_silence_map(audio_file: str, noise_db: float = -30, min_silence: float = 0.5, volume: float = 1.0) -> Tuple[np.ndarray, float]:
+    """Scan the whole file once and return (silence end times in seconds, duration).
+    Same rule as ffmpeg silencedetect: a silence is a run of at least `min_silence` seconds below `noise_db`."""
+    samples = load_pcm(audio_file, SILENCE_SR, volume=volume)
+    frame = int(SILENCE_SR * SILENCE_FRAME)
+    duration = len(samples) / SILENCE_SR
+    if not len(samples):
+        return np.zeros(0), duration
+
+    peaks = []
+    for i in range(0, len(samples), SILENCE_BLOCK):
+        block = samples[i:i + SILENCE_BLOCK]
+        usable = len(block) // frame * frame
+        if usable:
+            frames = block[:usable].reshape(-1, frame)
+            peaks.append(np.maximum(frames.max(axis=1), -frames.min(axis=1)))
+        if usable < len(block):
+            peaks.append(np.abs(block[usable:]).max(keepdims=True))
+
+    silent = np.concatenate(peaks) < 10 ** (noise_db / 20)
+    # run boundaries of the silent mask, vectorized
+    edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long_enough = (ends - starts) * SILENCE_FRAME >= min_silence
+    return np.minimum(ends[long_enough] * SILENCE_FRAME, duration), duration
 
 def get_audio_duration(audio_file: str) -> float:
     """Get the duration of an audio file using ffmpeg."""
@@ -65,11 +70,12 @@ def get_audio_duration(audio_file: str) -> float:
         duration = 0
     return duration
 
-def split_audio(audio_file: str, target_len: int = 30*60, win: int = 60) -> List[Tuple[float, float]]:
+def split_audio(audio_file: str, target_len: int = 30*60, win: int = 60, volume: float = 1.0) -> List[Tuple[float, float]]:
     # 30 min 16000 Hz 96kbps ~ 22MB < 25MB required by whisper
     print("[bold blue]🔪 Starting audio segmentation...[/]")
     
-    duration = get_audio_duration(audio_file)
+    # one decode for every cut point instead of one seek-from-start per boundary
+    silence_ends, duration = build_silence_map(audio_file, volume=volume)
     
     segments = []
     pos = 0
@@ -79,11 +85,11 @@ def split_audio(audio_file: str, target_len: int = 30*60, win: int = 60) -> List
             break
         win_start = pos + target_len - win
         win_end = min(win_start + 2 * win, duration)
-        silences = _detect_silence(audio_file, win_start, win_end)
+        silences = silence_ends[(silence_ends >= win_start) & (silence_ends <= win_end)]
     
-        if silences:
+        if silences.size:
             target_pos = target_len - (win_start - pos)
-            split_at = next((t for t in silences if t - win_start > target_pos), None)
+            split_at = next((float(t) for t in silences if t - win_start > target_pos), None)
             if split_at:
                 segments.append((pos, split_at))
                 pos = split_at
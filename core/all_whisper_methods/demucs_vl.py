@@ -1,58 +1,379 @@
 import os, sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 import torch
+import numpy as np
+import subprocess
+import multiprocessing
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from rich.console import Console
 from rich import print as rprint
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 from demucs.pretrained import get_model
 from demucs.audio import save_audio
+from demucs.apply import apply_model
 from torch.cuda import is_available as is_cuda_available
 from typing import Optional
 from demucs.api import Separator
 from demucs.apply import BagOfModels
 import gc
+import json
+import time
+import shutil
+from datetime import datetime
+from core.config_utils import load_key
+from core.audio_store import load_pcm, put_pcm, pcm_entry, register_pcm, open_encoder, close_encoder, abort_encoder
+from core.all_whisper_methods.audio_preprocess import get_audio_duration
 
 AUDIO_DIR = "output/audio"
 RAW_AUDIO_FILE = os.path.join(AUDIO_DIR, "raw.mp3")
 BACKGROUND_AUDIO_FILE = os.path.join(AUDIO_DIR, "background.mp3")
 VOCAL_AUDIO_FILE = os.path.join(AUDIO_DIR, "vocal.mp3")
+DEMUCS_MODEL = "htdemucs"
+DEMUCS_SR = 44100  # htdemucs output rate
+DEMUCS_OVERLAP = 2.0  # seconds shared by neighbouring windows, cross-faded when stitching
+STATS_BLOCK = 1 << 20  # frames per read when computing the normalization of the whole mix
+DECISION_LOG = "output/log/demucs_decision.json"
+PROBE_SR = 16000
+PROBE_WINDOWS = 32
+PROBE_SECONDS = 5.0
+PROBE_DECODERS = 8  # ffmpeg processes decoding probe windows at once
+PROBE_FFT, PROBE_HOP = 1024, 512
+FLOOR_PERCENTILE = 20
+
+def get_device():
+    return "cuda" if is_cuda_available() else "mps" if torch.backends.mps.is_available() else "cpu"
 
 class PreloadedSeparator(Separator):
     def __init__(self, model: BagOfModels, shifts: int = 1, overlap: float = 0.25,
                  split: bool = True, segment: Optional[int] = None, jobs: int = 0):
         self._model, self._audio_channels, self._samplerate = model, model.audio_channels, model.samplerate
-        device = "cuda" if is_cuda_available() else "mps" if torch.backends.mps.is_available() else "cpu"
-        self.update_parameter(device=device, shifts=shifts, overlap=overlap, split=split,
+        self.update_parameter(device=get_device(), shifts=shifts, overlap=overlap, split=split,
                             segment=segment, jobs=jobs, progress=True, callback=None, callback_arg=None)
 
+def current_rss_mb():
+    """Resident memory of this process in MB, None where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def report_peak_memory(console, peak_rss):
+    if peak_rss is not None:
+        console.print(f"[cyan]📊 Peak memory during separation: {peak_rss:.0f} MB RSS[/cyan]")
+    if is_cuda_available():
+        console.print(f"[cyan]📊 Peak GPU memory: {torch.cuda.max_memory_allocated() / 2**20:.0f} MB[/cyan]")
+
+# ------------
+# Whole-file separation, memory grows with the duration
+# ------------
+
+def separate_whole(model, raw_file=RAW_AUDIO_FILE, vocal_file=VOCAL_AUDIO_FILE, background_file=BACKGROUND_AUDIO_FILE):
+    console = Console()
+    separator = PreloadedSeparator(model=model, shifts=1, overlap=0.25)
+    # copy-on-write map, Separator normalizes the waveform in place
+    pcm = load_pcm(raw_file, model.samplerate, channels=model.audio_channels, mode='c')
+    _, outputs = separator.separate_tensor(torch.from_numpy(pcm.T), model.samplerate)
+    peak_rss = current_rss_mb()
+
+    kwargs = {"samplerate": model.samplerate, "bitrate": 64, "preset": 2,
+             "clip": "rescale", "as_float": False, "bits_per_sample": 16}
+
+    console.print("🎤 Saving vocals track...")
+    save_audio(outputs['vocals'].cpu(), vocal_file, **kwargs)
+    # reference clip extraction reads mono vocals at the model rate, hand them over without a decode
+    put_pcm(vocal_file, model.samplerate, outputs['vocals'].mean(0).clamp(-1, 1).cpu().numpy())
+
+    console.print("🎹 Saving background music...")
+    background = sum(audio for source, audio in outputs.items() if source != 'vocals')
+    save_audio(background.cpu(), background_file, **kwargs)
+    peak_rss = max(peak_rss, current_rss_mb()) if peak_rss is not None else None
+
+    del outputs, background, separator, pcm
+    gc.collect()
+    return peak_rss
+
+# ------------
+# Windowed separation: overlapping windows are separated one at a time, cross-faded and streamed to the encoders
+# ------------
+
+def plan_windows(n, window, overlap):
+    """[start, end) frames of windows of `window` frames sharing `overlap` frames, the last one ends at n"""
+    hop = window - overlap
+    return [(start, min(start + window, n)) for start in range(0, max(n - overlap, 1), hop)]
+
+def mix_stats(entry, channels):
+    """Mean and std of the mono mix over the whole file, read in blocks. Demucs normalizes with these,
+    using the statistics of each window instead would change the loudness from window to window."""
+    total = total_sq = count = 0
+    with open(entry, 'rb') as f:
+        while True:
+            block = np.fromfile(f, dtype=np.float32, count=STATS_BLOCK * channels)
+            if not len(block):
+                break
+            mono = block.reshape(-1, channels).mean(1, dtype=np.float64)
+            total += mono.sum()
+            total_sq += np.square(mono).sum()
+            count += len(mono)
+    if not count:
+        return 0.0, 1.0
+    mean = total / count
+    return float(mean), float(np.sqrt(max(total_sq / count - mean ** 2, 0.0)))
+
+def read_window(entry, channels, start, end):
+    data = np.fromfile(entry, dtype=np.float32, count=(end - start) * channels, offset=start * channels * 4)
+    return np.ascontiguousarray(data.reshape(-1, channels).T)
+
+def separate_window(model, wav, mean, std, device):
+    """(2, channels, frames) float32: vocals and the sum of the other stems"""
+    mix = (torch.from_numpy(wav) - mean) / (std + 1e-8)
+    with torch.no_grad():
+        out = apply_model(model, mix[None], shifts=1, split=True, overlap=0.25, device=device, progress=False)[0]
+    out = out * (std + 1e-8) + mean
+    vocals = out[model.sources.index('vocals')]
+    background = out.sum(0) - vocals
+    return torch.stack([vocals, background]).cpu().numpy()
+
+# ------------
+# CPU sharding: windows are separated by a pool of processes, each with its own model and a share of the cores
+# ------------
+
+_WORKER = {}
+
+def _init_worker(model_name, threads):
+    """Runs in a fresh spawned interpreter: everything the worker needs comes from its arguments,
+    the model is loaded here rather than inherited from the parent"""
+    torch.set_num_threads(threads)
+    model = get_model(model_name)
+    model.eval()
+    _WORKER['model'] = model
+
+def _separate_shard(entry, channels, start, end, mean, std):
+    return separate_window(_WORKER['model'], read_window(entry, channels, start, end), mean, std, 'cpu')
+
+def resolve_workers(n_windows, device):
+    """Processes for CPU separation. torch stops scaling at a few threads per model, so by default
+    one worker per 4 cores. GPU and MPS always use the single in-process model."""
+    if device != 'cpu':
+        return 1
+    workers = load_key("demucs_cpu_workers") or max(1, (os.cpu_count() or 1) // 4)
+    return max(1, min(workers, n_windows))
+
+def iter_window_stems(model, entry, channels, windows, mean, std, device, workers=1):
+    """Stems of each window in order. With several workers at most 2 windows per worker are in flight,
+    so the finished-but-not-yet-stitched results stay bounded as well."""
+    if workers <= 1:
+        for start, end in windows:
+            yield separate_window(model, read_window(entry, channels, start, end), mean, std, device)
+        return
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # spawn, not fork: a forked child would inherit torch's thread pools and CUDA state from this process
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(DEMUCS_MODEL, threads))
+    try:
+        pending = iter(windows)
+        futures = deque(pool.submit(_separate_shard, entry, channels, start, end, mean, std)
+                        for start, end in islice(pending, 2 * workers))
+        while futures:
+            stems = futures.popleft().result()
+            for start, end in islice(pending, 1):
+                futures.append(pool.submit(_separate_shard, entry, channels, start, end, mean, std))
+            yield stems
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+class StemStitcher:
+    """Cross-fades consecutive windows and writes the finished frames of both stems as they come in.
+    Only the overlap of the previous window is held back, so memory does not depend on the duration."""
+    def __init__(self, sr, channels, overlap, vocal_file, background_file):
+        self.sr, self.overlap = sr, overlap
+        self.files = [vocal_file, background_file]
+        self.encoders = [open_encoder(path, sr, channels) for path in self.files]
+        # mono vocals for the audio store, streamed next to the mp3
+        self.mono_file = vocal_file + '.f32.tmp'
+        self.mono = open(self.mono_file, 'wb')
+        self.fade_in = np.linspace(0, 1, overlap, dtype=np.float32)
+        self.tail = None
+
+    def add(self, stems, last):
+        if self.tail is not None:
+            head = stems[..., :self.overlap]
+            stems[..., :self.overlap] = self.tail * (1 - self.fade_in) + head * self.fade_in
+        keep = stems.shape[-1] if last else stems.shape[-1] - self.overlap
+        self.tail = None if last else stems[..., keep:].copy()
+        # streaming cannot rescale by the peak of the whole track like save_audio does, clamp instead
+        done = np.clip(stems[..., :keep], -1, 1)
+        for (proc, _), stem in zip(self.encoders, done):
+            proc.stdin.write(np.ascontiguousarray(stem.T).tobytes())
+        done[0].mean(0).tofile(self.mono)
+
+    def close(self):
+        self.mono.close()
+        for (proc, tmp_file), path in zip(self.encoders, self.files):
+            close_encoder(proc, tmp_file, path)
+        register_pcm(self.files[0], self.sr, self.mono_file)
+
+    def abort(self):
+        self.mono.close()
+        for proc, tmp_file in self.encoders:
+            abort_encoder(proc, tmp_file)
+        if os.path.exists(self.mono_file):
+            os.remove(self.mono_file)
+
+def separate_windowed(model, window_seconds, raw_file=RAW_AUDIO_FILE, vocal_file=VOCAL_AUDIO_FILE,
+                      background_file=BACKGROUND_AUDIO_FILE, overlap_seconds=DEMUCS_OVERLAP, workers=None):
+    sr, channels = model.samplerate, model.audio_channels
+    device = get_device()
+    entry = pcm_entry(raw_file, sr, channels)
+    n = os.path.getsize(entry) // (4 * channels)
+    overlap = int(overlap_seconds * sr)
+    windows = plan_windows(n, max(int(window_seconds * sr), 2 * overlap), overlap)
+    mean, std = mix_stats(entry, channels)
+    workers = resolve_workers(len(windows), device) if workers is None else workers
+
+    stitcher = StemStitcher(sr, channels, overlap, vocal_file, background_file)
+    peak_rss = current_rss_mb()
+    try:
+        with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"),
+                      BarColumn(), TaskProgressColumn()) as progress:
+            on = f" on {workers} CPU workers" if workers > 1 else ""
+            task = progress.add_task(f"🎵 Separating {len(windows)} windows of {window_seconds}s{on}...", total=len(windows))
+            stems_iter = iter_window_stems(model, entry, channels, windows, mean, std, device, workers)
+            for i, stems in enumerate(stems_iter):
+                stitcher.add(stems, last=i == len(windows) - 1)
+                del stems
+                rss = current_rss_mb()
+                peak_rss = max(peak_rss, rss) if rss is not None else None
+                progress.advance(task)
+        stitcher.close()
+    except BaseException:
+        stitcher.abort()
+        raise
+    return peak_rss
+
+# ------------
+# Speech-only detection: separation is skipped when nothing but the voice is there
+# ------------
+
+def floor_share(windows):
+    """Share of the spectral energy that is still there in the quiet frames of a window, median over `windows`
+    (1-d sample arrays, cut to the shortest). Speech stops between words and phrases, so with a clean voice the low
+    percentile of every frequency bin is near zero; music or ambience keeps playing through the pauses and lifts it.
+    Calibrated on synthetic speech: ~0.00 alone, ~0.005 with music 20 dB under it, ~0.03 at 10 dB, ~0.17 at 0 dB."""
+    win = min((len(window) for window in windows), default=0)
+    if win < PROBE_FFT:
+        return 0.0
+    windows = np.stack([np.asarray(window[:win], dtype=np.float32) for window in windows])
+    frames = np.lib.stride_tricks.sliding_window_view(windows, PROBE_FFT, axis=1)[:, ::PROBE_HOP]
+    power = np.abs(np.fft.rfft(frames * np.hanning(PROBE_FFT).astype(np.float32), axis=-1)) ** 2
+    total = power.mean(1).sum(-1)
+    floor = np.percentile(power, FLOOR_PERCENTILE, axis=1).sum(-1)
+    voiced = total > 1e-6  # fully silent windows say nothing either way
+    return float(np.median(floor[voiced] / total[voiced])) if voiced.any() else 0.0
+
+def background_share(samples, sr=PROBE_SR, n_windows=PROBE_WINDOWS, seconds=PROBE_SECONDS):
+    """floor_share of up to `n_windows` windows of `seconds` spread across samples already in memory"""
+    win = min(int(seconds * sr), len(samples))
+    if win < PROBE_FFT:
+        return 0.0
+    starts = np.linspace(0, len(samples) - win, min(n_windows, max(1, len(samples) // win))).astype(int)
+    return floor_share([samples[start:start + win] for start in starts])
+
+def decode_clip(audio_file, start, seconds, sr=PROBE_SR):
+    """Mono float32 samples of `seconds` from about `start`. ffmpeg seeks in the input instead of decoding up to it,
+    fastseek jumps by bitrate instead of scanning the mp3 frames, the probe does not need an exact position"""
+    cmd = ['ffmpeg', '-v', 'error', '-fflags', '+fastseek', '-ss', f"{start:.3f}", '-t', f"{seconds:.3f}", '-i', audio_file,
+           '-vn', '-ac', '1', '-ar', str(sr), '-f', 'f32le', 'pipe:1']
+    return np.frombuffer(subprocess.run(cmd, check=True, capture_output=True).stdout, dtype=np.float32)
+
+def probe_background_share(audio_file, sr=PROBE_SR, n_windows=PROBE_WINDOWS, seconds=PROBE_SECONDS):
+    """background_share of a file, only the probe windows are decoded (n_windows × seconds, not the whole file)"""
+    duration = get_audio_duration(audio_file)
+    count = min(n_windows, max(1, int(duration // seconds)))
+    starts = np.linspace(0, max(duration - seconds, 0.0), count)
+    with ThreadPoolExecutor(max_workers=min(PROBE_DECODERS, count)) as pool:
+        windows = list(pool.map(lambda start: decode_clip(audio_file, start, seconds, sr), starts))
+    return floor_share(windows)
+
+def log_decision(decision):
+    try:
+        from core.step1_ytdlp import find_video_files
+        decision = {"video": os.path.basename(find_video_files()), **decision}
+    except Exception:
+        pass
+    os.makedirs(os.path.dirname(DECISION_LOG), exist_ok=True)
+    with open(DECISION_LOG, 'w', encoding='utf-8') as f:
+        json.dump(decision, f, indent=4, ensure_ascii=False)
+
+def demucs_skipped():
+    """True when the last separation was bypassed and vocal.mp3 is the raw audio"""
+    if not os.path.exists(DECISION_LOG):
+        return False
+    with open(DECISION_LOG, 'r', encoding='utf-8') as f:
+        return json.load(f).get("skipped", False)
+
+def bypass_separation():
+    """The raw audio becomes the vocal track, the background is the same length of silence"""
+    root, ext = os.path.splitext(VOCAL_AUDIO_FILE)
+    shutil.copyfile(RAW_AUDIO_FILE, f"{root}.tmp{ext}")
+    os.replace(f"{root}.tmp{ext}", VOCAL_AUDIO_FILE)
+    root, ext = os.path.splitext(BACKGROUND_AUDIO_FILE)
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', RAW_AUDIO_FILE, '-af', 'volume=0', '-b:a', '32k',
+                    f"{root}.tmp{ext}"], check=True)
+    os.replace(f"{root}.tmp{ext}", BACKGROUND_AUDIO_FILE)
+
+def should_separate(console):
+    threshold = load_key("demucs_skip_below")
+    start = time.time()
+    if not threshold:
+        log_decision({"skipped": False, "threshold": threshold, "time": datetime.now().isoformat(timespec='seconds')})
+        return True
+    share = probe_background_share(RAW_AUDIO_FILE)
+    skipped = share < threshold
+    log_decision({"skipped": skipped, "background_share": round(share, 4), "threshold": threshold,
+                  "probe_seconds": round(time.time() - start, 2), "time": datetime.now().isoformat(timespec='seconds')})
+    if skipped:
+        console.print(f"[cyan]🗣️ Background share {share:.3f} < {threshold}, speech only, skip Demucs.[/cyan]")
+    else:
+        console.print(f"[cyan]🎶 Background share {share:.3f} >= {threshold}, separating vocals.[/cyan]")
+    return not skipped
+
 def demucs_main():
     if os.path.exists(VOCAL_AUDIO_FILE) and os.path.exists(BACKGROUND_AUDIO_FILE):
         rprint(f"[yellow]⚠️ {VOCAL_AUDIO_FILE} and {BACKGROUND_AUDIO_FILE} already exist, skip Demucs processing.[/yellow]")
         return
-    
+
     console = Console()
     os.makedirs(AUDIO_DIR, exist_ok=True)
-    
-    console.print("🤖 Loading <htdemucs> model...")
-    model = get_model('htdemucs')
-    separator = PreloadedSeparator(model=model, shifts=1, overlap=0.25)
-    
+    if not should_separate(console):
+        bypass_separation()
+        return
+    if load_key("separation_engine") == "dsp":
+        from core.all_whisper_methods.dsp_separation import dsp_separate
+        console.print("🎵 Separating audio with spectral masking...")
+        dsp_separate(RAW_AUDIO_FILE, VOCAL_AUDIO_FILE, BACKGROUND_AUDIO_FILE)
+        return
+
+    console.print(f"🤖 Loading <{DEMUCS_MODEL}> model...")
+    model = get_model(DEMUCS_MODEL)
+    model.eval()
+    if is_cuda_available():
+        torch.cuda.reset_peak_memory_stats()
+
+    window = load_key("demucs_window")
     console.print("🎵 Separating audio...")
-    _, outputs = separator.separate_audio_file(RAW_AUDIO_FILE)
-    
-    kwargs = {"samplerate": model.samplerate, "bitrate": 64, "preset": 2, 
-             "clip": "rescale", "as_float": False, "bits_per_sample": 16}
-    
-    console.print("🎤 Saving vocals track...")
-    save_audio(outputs['vocals'].cpu(), VOCAL_AUDIO_FILE, **kwargs)
-    
-    console.print("🎹 Saving background music...")
-    background = sum(audio for source, audio in outputs.items() if source != 'vocals')
-    save_audio(background.cpu(), BACKGROUND_AUDIO_FILE, **kwargs)
-    
+    if window:
+        peak_rss = separate_windowed(model, window)
+    else:
+        peak_rss = separate_whole(model)
+    report_peak_memory(console, peak_rss)
+
     # Clean up memory
-    del outputs, background, model, separator
+    del model
     gc.collect()
-    
+
     console.print("[green]✨ Audio separation completed![/green]")
 
 if __name__ == "__main__":
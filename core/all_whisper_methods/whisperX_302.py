@@ -2,94 +2,127 @@ import requests
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from core.config_utils import load_key
+from core.audio_store import load_pcm, pcm_slice
 from rich import print as rprint
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+import numpy as np
+import hashlib
 import time
 import json
-import tempfile
 import subprocess
 
 OUTPUT_LOG_DIR = "output/log"
-def transcribe_audio_302(audio_path: str, start: float = None, end: float = None):
-    os.makedirs(OUTPUT_LOG_DIR, exist_ok=True)
-    LOG_FILE = f"{OUTPUT_LOG_DIR}/whisperx302.json"
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-        
+CACHE_DIR = f"{OUTPUT_LOG_DIR}/whisperx302"
+API_URL = "https://api.302.ai/302/whisperx"
+UPLOAD_SR = 16000
+ENCODE_BLOCK = 1 << 18  # samples written to the encoder at a time
+
+# Segments are uploaded compressed instead of as 32 kHz WAV, speech at 16 kHz loses nothing for ASR.
+# Opus at the lowest encoder complexity is ~3x faster to encode and still ~15x smaller than the WAV
+CODECS = {
+    'opus': (['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip', '-compression_level', '0', '-f', 'ogg'], 'ogg', 'audio/ogg'),
+    'flac': (['-c:a', 'flac', '-f', 'flac'], 'flac', 'audio/flac'),
+}
+
+def _pcm_bytes(samples: np.ndarray) -> memoryview:
+    """Raw bytes of float32 samples without copying them (a slice of the PCM store already is float32)"""
+    return memoryview(np.ascontiguousarray(samples, dtype=np.float32)).cast('B')
+
+def encode_segment(samples: np.ndarray, codec: str) -> bytes:
+    """Encode float32 mono samples at UPLOAD_SR in memory, no temp file. The samples are written to ffmpeg
+    in blocks from a thread while its output is read, so no second copy of the segment is made"""
+    args, _, _ = CODECS[codec]
+    cmd = ['ffmpeg', '-v', 'error', '-f', 'f32le', '-ar', str(UPLOAD_SR), '-ac', '1', '-i', '-', *args, '-']
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def feed():
+        try:
+            for i in range(0, len(samples), ENCODE_BLOCK):
+                proc.stdin.write(_pcm_bytes(samples[i:i + ENCODE_BLOCK]))
+        except BrokenPipeError:
+            pass  # ffmpeg exited early, its error is raised below
+        finally:
+            proc.stdin.close()
+
+    writer = Thread(target=feed, daemon=True)
+    writer.start()
+    audio_bytes = proc.stdout.read()
+    stderr = proc.stderr.read()
+    writer.join()
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, audio_bytes, stderr)
+    return audio_bytes
+
+def segment_key(samples: np.ndarray, language: str, codec: str) -> str:
+    """Content hash of the segment audio and the request options, the cache survives re-splitting"""
+    sha = hashlib.sha1(_pcm_bytes(samples))
+    sha.update(f"|{language}|{codec}|align|raw".encode('utf-8'))
+    return sha.hexdigest()
+
+def shift_timestamps(result: dict, offset: float) -> dict:
+    for segment in result['segments']:
+        segment['start'] += offset
+        segment['end'] += offset
+        for word in segment.get('words', []):
+            if 'start' in word:
+                word['start'] += offset
+            if 'end' in word:
+                word['end'] += offset
+    return result
+
+def transcribe_audio_302(audio_path: str, start: float = None, end: float = None, volume: float = 1.0):
     WHISPER_LANGUAGE = load_key("whisper.language")
-    url = "https://api.302.ai/302/whisperx"
-    
-    # 如果指定了开始和结束时间，创建临时音频片段
+    samples = load_pcm(audio_path, UPLOAD_SR, volume=volume)
+    offset = start or 0
     if start is not None and end is not None:
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_audio:
-            temp_audio_path = temp_audio.name
-            
-        # 使用ffmpeg截取音频片段
-        ffmpeg_cmd = f'ffmpeg -y -i "{audio_path}" -ss {start} -t {end-start} -vn -ar 32000 -ac 1 "{temp_audio_path}"'
-        subprocess.run(ffmpeg_cmd, shell=True, check=True, capture_output=True)
-        audio_path = temp_audio_path
-    
+        samples = pcm_slice(samples, UPLOAD_SR, start, end)
+
+    codec = load_key("whisper.upload_codec")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_file = os.path.join(CACHE_DIR, f"{segment_key(samples, WHISPER_LANGUAGE, codec)}.json")
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return shift_timestamps(json.load(f), offset)
+
+    _, ext, mime = CODECS[codec]
+    audio_bytes = encode_segment(samples, codec)
+
     payload = {
         "processing_type": "align",
         "language": WHISPER_LANGUAGE,
         "output": "raw"
     }
-    
-    start_time = time.time()
-    rprint(f"[cyan]🎤 Transcribing audio with language:  <{WHISPER_LANGUAGE}> ...[/cyan]")
-    files = [
-        ('audio_input',(
-            os.path.basename(audio_path),
-            open(audio_path, 'rb'),
-            'application/octet-stream'
-        ))
-    ]
-    
     headers = {
         'Authorization': f'Bearer {load_key("whisper.whisperX_302_api_key")}'
     }
 
-    # 使用 with 语句确保文件正确关闭
-    with open(audio_path, 'rb') as audio_file:
-        files = [
-            ('audio_input', (
-                os.path.basename(audio_path),
-                audio_file,
-                'application/octet-stream'
-            ))
-        ]
-        response = requests.request("POST", url, headers=headers, data=payload, files=files)
-    
-    # 清理临时文件
-    if start is not None and end is not None:
-        if os.path.exists(temp_audio_path):
-            time.sleep(0.1)
-            try:
-                os.unlink(temp_audio_path)
-            except PermissionError:
-                print(f"警告：无法删除临时文件 {temp_audio_path}")
-    
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(response.json(), f, indent=4, ensure_ascii=False)
-        
-    # 调整时间戳
-    if start is not None:
-        result = response.json()
-        for segment in result['segments']:
-            segment['start'] += start
-            segment['end'] += start
-            for word in segment.get('words', []):
-                if 'start' in word:
-                    word['start'] += start
-                if 'end' in word:
-                    word['end'] += start
-        response._content = json.dumps(result).encode()
-    
+    start_time = time.time()
+    rprint(f"[cyan]🎤 Transcribing {offset:.0f}s-{offset + len(samples) / UPLOAD_SR:.0f}s with language <{WHISPER_LANGUAGE}>, uploading {len(audio_bytes) / 1024:.0f} KB {codec} ...[/cyan]")
+    files = [('audio_input', (f"segment_{offset:.0f}.{ext}", audio_bytes, mime))]
+    response = requests.post(API_URL, headers=headers, data=payload, files=files)
+    response.raise_for_status()
+    result = response.json()
+
+    # cache the raw result, timestamps are relative to the segment
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, cache_file)
+
     elapsed_time = time.time() - start_time
     rprint(f"[green]✓ Transcription completed in {elapsed_time:.2f} seconds[/green]")
-    return response.json()
+    return shift_timestamps(result, offset)
+
+def transcribe_segments_302(audio_path: str, segments, volume: float = 1.0):
+    """Upload all segments concurrently, results come back in segment order"""
+    workers = max(1, min(load_key("max_workers"), len(segments)))
+    load_pcm(audio_path, UPLOAD_SR, volume=volume)  # decode once before the workers slice it
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(transcribe_audio_302, audio_path, start, end, volume) for start, end in segments]
+        return [future.result() for future in futures]
 
-if __name__ == "__main__":  
+if __name__ == "__main__":
     # 使用示例:
     result = transcribe_audio_302("output/audio/raw.mp3")
     rprint(result)
@@ -5,17 +5,28 @@ warnings.filterwarnings("ignore")
 
 import whisperx
 import torch
+import gc
 import time
 import subprocess
+import numpy as np
 from typing import Dict
 from rich import print as rprint
-import librosa
-import tempfile
+from threading import Lock
+from functools import lru_cache
 from core.config_utils import load_key
 from core.all_whisper_methods.audio_preprocess import save_language
+from core.audio_store import load_pcm, pcm_slice
 
 MODEL_DIR = load_key("model_dir")
+WHISPER_SR = 16000
 
+# Models stay resident for every segment of a run (and across runs with `whisper.keep_warm`),
+# keyed by everything that changes what gets loaded.
+_MODELS = {}
+_MODEL_LOCK = Lock()
+_TIMINGS = {"load": 0.0, "transcribe": 0.0, "align": 0.0}
+
+@lru_cache(maxsize=None)
 def check_hf_mirror() -> str:
     """Check and return the fastest HF mirror"""
     mirrors = {
@@ -46,12 +57,11 @@ def check_hf_mirror() -> str:
     rprint(f"[cyan]🚀 Selected mirror:[/cyan] {fastest_url} ({best_time:.2f}s)")
     return fastest_url
 
-def transcribe_audio(audio_file: str, start: float, end: float) -> Dict:
-    os.environ['HF_ENDPOINT'] = check_hf_mirror() #? don't know if it's working...
-    WHISPER_LANGUAGE = load_key("whisper.language")
+@lru_cache(maxsize=None)
+def get_device_settings():
+    """Return (device, batch_size, compute_type) for this machine"""
     device = "cuda" if torch.cuda.is_available() else "cpu"
     rprint(f"🚀 Starting WhisperX using device: {device} ...")
-    
     if device == "cuda":
         gpu_mem = torch.cuda.get_device_properties(0).total_memory / (1024**3)
         batch_size = 16 if gpu_mem > 8 else 2
@@ -61,74 +71,136 @@ def transcribe_audio(audio_file: str, start: float, end: float) -> Dict:
         batch_size = 1
         compute_type = "int8"
         rprint(f"[cyan]📦 Batch size:[/cyan] {batch_size}, [cyan]⚙️ Compute type:[/cyan] {compute_type}")
-    rprint(f"[green]▶️ Starting WhisperX for segment {start:.2f}s to {end:.2f}s...[/green]")
-    
-    try:
-        if WHISPER_LANGUAGE == 'zh':
-            model_name = "Huan69/Belle-whisper-large-v3-zh-punct-fasterwhisper"
-            local_model = os.path.join(MODEL_DIR, "Belle-whisper-large-v3-zh-punct-fasterwhisper")
-        else:
-            model_name = load_key("whisper.model")
-            local_model = os.path.join(MODEL_DIR, model_name)
-            
+    return device, batch_size, compute_type
+
+def _get_resident(key, loader):
+    """Load a model once and keep it, the time spent loading is accounted separately from inference"""
+    with _MODEL_LOCK:
+        if key not in _MODELS:
+            start = time.time()
+            _MODELS[key] = loader()
+            elapsed = time.time() - start
+            _TIMINGS["load"] += elapsed
+            rprint(f"[cyan]⏱️ Loaded {key[0]} model in {elapsed:.1f}s[/cyan]")
+        return _MODELS[key]
+
+def get_whisper_model(device, compute_type, whisper_language):
+    if whisper_language == 'zh':
+        model_name = "Huan69/Belle-whisper-large-v3-zh-punct-fasterwhisper"
+        local_model = os.path.join(MODEL_DIR, "Belle-whisper-large-v3-zh-punct-fasterwhisper")
+    else:
+        model_name = load_key("whisper.model")
+        local_model = os.path.join(MODEL_DIR, model_name)
+
+    def loader():
+        name = model_name
         if os.path.exists(local_model):
             rprint(f"[green]📥 Loading local WHISPER model:[/green] {local_model} ...")
-            model_name = local_model
+            name = local_model
         else:
+            os.environ['HF_ENDPOINT'] = check_hf_mirror() #? don't know if it's working...
             rprint(f"[green]📥 Using WHISPER model from HuggingFace:[/green] {model_name} ...")
-
         vad_options = {"vad_onset": 0.500,"vad_offset": 0.363}
         asr_options = {"temperatures": [0],"initial_prompt": "",}
-        whisper_language = None if 'auto' in WHISPER_LANGUAGE else WHISPER_LANGUAGE
+        language = None if 'auto' in whisper_language else whisper_language
         rprint("[bold yellow]**You can ignore warning of `Model was trained with torch 1.10.0+cu102, yours is 2.0.0+cu118...`**[/bold yellow]")
-        model = whisperx.load_model(model_name, device, compute_type=compute_type, language=whisper_language, vad_options=vad_options, asr_options=asr_options, download_root=MODEL_DIR)
-
-        # Create temp file with wav format for better compatibility
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_audio:
-            temp_audio_path = temp_audio.name
-        
-        # Extract audio segment using ffmpeg
-        ffmpeg_cmd = f'ffmpeg -y -i "{audio_file}" -ss {start} -t {end-start} -vn -ar 32000 -ac 1 "{temp_audio_path}"'
-        subprocess.run(ffmpeg_cmd, shell=True, check=True, capture_output=True)
-        
-        try:
-            # Load audio segment with librosa
-            audio_segment, sample_rate = librosa.load(temp_audio_path, sr=16000)
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_audio_path):
-                os.unlink(temp_audio_path)
-
-        rprint("[bold green]note: You will see Progress if working correctly[/bold green]")
-        result = model.transcribe(audio_segment, batch_size=batch_size, print_progress=True)
-
-        # Free GPU resources
-        del model
-        torch.cuda.empty_cache()
+        return whisperx.load_model(name, device, compute_type=compute_type, language=language, vad_options=vad_options, asr_options=asr_options, download_root=MODEL_DIR)
+    return _get_resident(("whisper", model_name, device, compute_type, whisper_language), loader)
 
-        # Save language
-        save_language(result['language'])
-        if result['language'] == 'zh' and WHISPER_LANGUAGE != 'zh':
-            raise ValueError("Please specify the transcription language as zh and try again!")
+def get_align_model(language_code, device):
+    def loader():
+        os.environ['HF_ENDPOINT'] = check_hf_mirror()
+        return whisperx.load_align_model(language_code=language_code, device=device)
+    return _get_resident(("align", language_code, device), loader)
 
-        # Align whisper output
-        model_a, metadata = whisperx.load_align_model(language_code=result["language"], device=device)
-        result = whisperx.align(result["segments"], model_a, metadata, audio_segment, device, return_char_alignments=False)
+def release_asr_models():
+    """Free the ASR model before the align model is loaded, both together do not fit on small GPUs"""
+    with _MODEL_LOCK:
+        for key in [key for key in _MODELS if key[0] == "whisper"]:
+            del _MODELS[key]
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
 
-        # Free GPU resources again
+def release_models(force=False):
+    """Drop resident models at the end of a transcription unless `whisper.keep_warm` is set"""
+    rprint(f"[cyan]⏱️ WhisperX model load {_TIMINGS['load']:.1f}s, transcribe {_TIMINGS['transcribe']:.1f}s, align {_TIMINGS['align']:.1f}s[/cyan]")
+    for k in _TIMINGS:
+        _TIMINGS[k] = 0.0
+    if load_key("whisper.keep_warm") and not force:
+        return
+    with _MODEL_LOCK:
+        _MODELS.clear()
+    gc.collect()
+    if torch.cuda.is_available():
         torch.cuda.empty_cache()
-        del model_a
-
-        # Adjust timestamps
-        for segment in result['segments']:
-            segment['start'] += start
-            segment['end'] += start
-            for word in segment['words']:
-                if 'start' in word:
-                    word['start'] += start
-                if 'end' in word:
-                    word['end'] += start
-        return result
+
+def _transcribe_segment(audio_file, start, end, volume):
+    """Raw whisper result of one segment and its audio, timestamps relative to `start`"""
+    WHISPER_LANGUAGE = load_key("whisper.language")
+    device, batch_size, compute_type = get_device_settings()
+    rprint(f"[green]▶️ Starting WhisperX for segment {start:.2f}s to {end:.2f}s...[/green]")
+    model = get_whisper_model(device, compute_type, WHISPER_LANGUAGE)
+
+    # Zero-copy slice of the 16 kHz PCM shared with the silence detector, decoded once per run
+    audio_segment = np.asarray(pcm_slice(load_pcm(audio_file, WHISPER_SR, volume=volume), WHISPER_SR, start, end))
+
+    rprint("[bold green]note: You will see Progress if working correctly[/bold green]")
+    inference_start = time.time()
+    result = model.transcribe(audio_segment, batch_size=batch_size, print_progress=True)
+    transcribe_time = time.time() - inference_start
+    _TIMINGS["transcribe"] += transcribe_time
+    rprint(f"[cyan]⏱️ Segment transcribed in {transcribe_time:.1f}s[/cyan]")
+
+    # Save language
+    save_language(result['language'])
+    if result['language'] == 'zh' and WHISPER_LANGUAGE != 'zh':
+        raise ValueError("Please specify the transcription language as zh and try again!")
+    return result, audio_segment
+
+def _align_segment(result, audio_segment, start):
+    """Word-aligned result of one transcribed segment, timestamps shifted to the whole audio"""
+    device = get_device_settings()[0]
+    model_a, metadata = get_align_model(result["language"], device)
+    align_start = time.time()
+    result = whisperx.align(result["segments"], model_a, metadata, audio_segment, device, return_char_alignments=False)
+    align_time = time.time() - align_start
+    _TIMINGS["align"] += align_time
+    rprint(f"[cyan]⏱️ Segment aligned in {align_time:.1f}s[/cyan]")
+
+    # Adjust timestamps
+    for segment in result['segments']:
+        segment['start'] += start
+        segment['end'] += start
+        for word in segment['words']:
+            if 'start' in word:
+                word['start'] += start
+            if 'end' in word:
+                word['end'] += start
+    return result
+
+def transcribe_segments(audio_file: str, segments, volume: float = 1.0):
+    """Transcribe every segment with the ASR model, then align them all, each model is loaded once.
+    Unless `whisper.keep_warm` is set the ASR model is freed before the align model loads, and all models
+    are released at the end, also when a segment fails."""
+    try:
+        transcribed = [(_transcribe_segment(audio_file, start, end, volume), start) for start, end in segments]
+        if not load_key("whisper.keep_warm"):
+            release_asr_models()
+        return [_align_segment(result, audio_segment, start) for (result, audio_segment), start in transcribed]
+    except Exception as e:
+        rprint(f"[red]WhisperX processing error:[/red] {e}")
+        raise
+    finally:
+        release_models()
+
+def transcribe_audio(audio_file: str, start: float, end: float, volume: float = 1.0) -> Dict:
+    """A single segment, models stay loaded for the caller to release with release_models()"""
+    try:
+        result, audio_segment = _transcribe_segment(audio_file, start, end, volume)
+        if not load_key("whisper.keep_warm"):
+            release_asr_models()
+        return _align_segment(result, audio_segment, start)
     except Exception as e:
         rprint(f"[red]WhisperX processing error:[/red] {e}")
-        raise
\ No newline at end of file
+        raise
@@ -1,17 +1,26 @@
 import os, sys, json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from threading import Lock
+from threading import Lock, Thread, current_thread
+import asyncio
+import sqlite3
+import hashlib
+from contextlib import closing
 import json_repair
-import json 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, RateLimitError
 import time
 from requests.exceptions import RequestException
 from core.config_utils import load_key
+from core.adaptive_concurrency import get_controller
 
 LOG_FOLDER = 'output/gpt_log'
+CACHE_DB = os.path.join(LOG_FOLDER, 'cache.db')
 LOCK = Lock()
+CLIENT_LOCK = Lock()
+_CLIENTS = {}
 
 def save_log(model, prompt, response, log_title = 'default', message = None):
+    """Append a readable JSON log, only used for errors and exports"""
     os.makedirs(LOG_FOLDER, exist_ok=True)
     log_data = {
         "model": model,
@@ -21,27 +30,57 @@ def save_log(model, prompt, response, log_title = 'default', message = None):
     }
     log_file = os.path.join(LOG_FOLDER, f"{log_title}.json")
     
-    if os.path.exists(log_file):
-        with open(log_file, 'r', encoding='utf-8') as f:
-            logs = json.load(f)
-    else:
-        logs = []
-    logs.append(log_data)
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, ensure_ascii=False, indent=4)
-        
-def check_ask_gpt_history(prompt, model, log_title):
+    with LOCK:
+        if os.path.exists(log_file):
+            with open(log_file, 'r', encoding='utf-8') as f:
+                logs = json.load(f)
+        else:
+            logs = []
+        logs.append(log_data)
+        with open(log_file, 'w', encoding='utf-8') as f:
+            json.dump(logs, f, ensure_ascii=False, indent=4)
+
+def _connect_cache():
+    # short-lived connections: cheap, and safe when `output/gpt_log` gets archived between videos
+    os.makedirs(LOG_FOLDER, exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")  # readers never block on the writer, across threads and processes
+    conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY, log_title TEXT, model TEXT, prompt TEXT, response TEXT, created REAL)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_title ON responses (log_title)")
+    return conn
+
+def _cache_key(prompt, model, response_json):
+    return hashlib.sha256(json.dumps([model, response_json, prompt], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def check_ask_gpt_history(prompt, model, response_json=True):
     # check if the prompt has been asked before
-    if not os.path.exists(LOG_FOLDER):
+    if not os.path.exists(CACHE_DB):
         return False
-    file_path = os.path.join(LOG_FOLDER, f"{log_title}.json")
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for item in data:
-                if item["prompt"] == prompt:
-                    return item["response"]
-    return False
+    with closing(_connect_cache()) as conn:
+        row = conn.execute("SELECT response FROM responses WHERE key = ?", (_cache_key(prompt, model, response_json),)).fetchone()
+    return json.loads(row[0]) if row else False
+
+def save_to_cache(model, prompt, response, response_json=True, log_title='default'):
+    with closing(_connect_cache()) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                     (_cache_key(prompt, model, response_json), log_title, model, prompt,
+                      json.dumps(response, ensure_ascii=False), time.time()))
+
+def export_gpt_logs(log_title=None):
+    """Export cached responses to readable `output/gpt_log/<log_title>.json` files"""
+    if not os.path.exists(CACHE_DB):
+        return
+    with closing(_connect_cache()) as conn:
+        query = "SELECT log_title, model, prompt, response FROM responses"
+        rows = conn.execute(query + " WHERE log_title = ? ORDER BY created", (log_title,)) if log_title \
+            else conn.execute(query + " ORDER BY created")
+        logs = {}
+        for title, model, prompt, response in rows:
+            logs.setdefault(title, []).append({"model": model, "prompt": prompt, "response": json.loads(response), "message": None})
+    for title, items in logs.items():
+        with open(os.path.join(LOG_FOLDER, f"{title}.json"), 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False, indent=4)
 
 def fix_base_url(base_url):
     # huoshan
@@ -53,11 +92,207 @@ def fix_base_url(base_url):
         base_url = base_url.strip('/') + '/v1'
     return base_url
 
-def ask_gpt(prompt, response_json=True, valid_def=None, log_title='default'):
+## ------------------------------------------------------------------
+# Asyncio engine: every LLM call runs on one shared event loop, with an adaptive
+# concurrency limit per backend and token buckets for the provider's requests/tokens per minute.
+
+_ENGINE = {'loop': None, 'thread': None, 'limits': None}
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute`, 0 disables the limit"""
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        if not self.capacity:
+            return
+        amount = min(amount, self.capacity)
+        async with self.lock:  # FIFO, so big requests are not starved by small ones
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) * 60 / self.capacity)
+                self._refill()
+            self.tokens -= amount
+
+    def consume(self, amount):
+        """Settle the difference once the real usage is known, may go negative"""
+        if self.capacity:
+            self._refill()
+            self.tokens -= amount
+
+def _get_loop():
+    with CLIENT_LOCK:
+        if _ENGINE['loop'] is None:
+            loop = asyncio.new_event_loop()
+            thread = Thread(target=loop.run_forever, daemon=True, name='ask_gpt_engine')
+            thread.start()
+            _ENGINE['loop'], _ENGINE['thread'] = loop, thread
+    return _ENGINE['loop']
+
+def _get_rate_limits():
+    # created lazily inside the engine loop, and again when llm_rate_limit changes
+    rate_set = load_key("llm_rate_limit")
+    settings = (rate_set["rpm"], rate_set["tpm"])
+    if _ENGINE['limits'] is None or _ENGINE['limits'][0] != settings:
+        _ENGINE['limits'] = (settings, TokenBucket(rate_set["rpm"]), TokenBucket(rate_set["tpm"]))
+    return _ENGINE['limits'][1:]
+
+def run_async(coro):
+    """Run a coroutine on the engine loop and block until it finishes"""
+    loop = _get_loop()
+    if current_thread() is _ENGINE['thread']:
+        raise RuntimeError("run_async() called from inside the engine loop, use `await` instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+def run_all(coros, return_exceptions=False):
+    """Run many coroutines concurrently on the engine loop, results keep the input order"""
+    async def _gather():
+        return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+    return run_async(_gather())
+
+def estimate_tokens(text):
+    # rough upper bound covering both CJK and latin text, corrected by the real usage afterwards
+    return max(1, len(text) // 2)
+
+def get_client(base_url, api_key):
+    """Process-wide AsyncOpenAI client pool keyed by base_url, key and llm_pool settings, connections are kept
+    alive between calls. Changed pool settings get a new client, calls still running finish on the old one"""
+    pool_set = load_key("llm_pool")
+    settings = (pool_set["max_connections"], pool_set["max_keepalive"], pool_set["keepalive_expiry"])
+    with CLIENT_LOCK:
+        built = _CLIENTS.get((base_url, api_key))
+        if built is None or built[0] != settings:
+            limits = httpx.Limits(max_connections=pool_set["max_connections"],
+                                  max_keepalive_connections=pool_set["max_keepalive"],
+                                  keepalive_expiry=pool_set["keepalive_expiry"])
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=DefaultAsyncHttpxClient(limits=limits))
+            _CLIENTS[(base_url, api_key)] = built = (settings, client)
+    return built[1]
+
+def parse_json(content):
+    # strict parsing is much faster, only fall back to json_repair for malformed output
+    try:
+        return json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return json_repair.loads(content)
+
+class StreamAbort(Exception):
+    """Raised when a streamed response diverges from the expected structure"""
+    def __init__(self, message, partial):
+        super().__init__(message)
+        self.partial = partial
+
+PENDING = object()  # value of an item whose key has been streamed but not its value yet
+
+class JsonItemStream:
+    """Incrementally parse the top-level items of a JSON object while it is being streamed.
+    `feed` yields (key, PENDING) as soon as a key is complete and (key, value) once its value is."""
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.item_start = None
+        self.closed = False
+        self.count = 0
+        self.open_key = None
+
+    def feed(self, text):
+        """Add a chunk of text, return the (key, value) items completed by it"""
+        self.buffer += text
+        items = []
+        while self.pos < len(self.buffer) and not self.closed:
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif self.depth > 0 and ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+                if self.depth == 1 and ch == '{':
+                    self.item_start = self.pos + 1
+            elif ch in '}]' and self.depth > 0:
+                if self.depth == 1 and self.item_start is not None:
+                    items += self._emit(self.pos)
+                    self.closed = True
+                self.depth -= 1
+            elif ch == ':' and self.depth == 1 and self.item_start is not None and self.open_key is None:
+                try:
+                    self.open_key = json.loads(self.buffer[self.item_start:self.pos].strip())
+                    items.append((self.open_key, PENDING))
+                except json.JSONDecodeError:
+                    pass
+            elif ch == ',' and self.depth == 1 and self.item_start is not None:
+                items += self._emit(self.pos)
+                self.item_start = self.pos + 1
+            self.pos += 1
+        return items
+
+    def _emit(self, end):
+        self.open_key = None
+        text = self.buffer[self.item_start:end].strip()
+        if not text:
+            return []
+        try:
+            item = json.loads('{' + text + '}')
+        except json.JSONDecodeError:
+            self.count += 1  # still one item, so the count of the following ones stays right
+            return []  # left to json_repair on the full response
+        self.count += len(item)
+        return list(item.items())
+
+async def _stream_completion(client, completion_args, stream_check=None, on_item=None):
+    """Stream a completion, validating each top-level JSON item as soon as it is complete.
+    Returns the content and the usage reported in the last chunk (None if the backend does not send it)"""
+    parser = JsonItemStream()
+    content = []
+    usage = None
+    stream = await client.chat.completions.create(**completion_args, stream=True, stream_options={"include_usage": True})
+    try:
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ''
+            content.append(delta)
+            for key, value in parser.feed(delta):
+                if stream_check:
+                    count = parser.count + 1 if value is PENDING else parser.count
+                    error = stream_check(key, value, count)
+                    if error:
+                        raise StreamAbort(f"{error} (aborted after {len(parser.buffer)} chars)", parser.buffer)
+                if on_item and value is not PENDING:
+                    on_item(key, value)
+    finally:
+        await stream.close()  # stop generation early instead of paying for a bad answer
+    return ''.join(content), usage
+
+async def ask_gpt_async(prompt, response_json=True, valid_def=None, log_title='default', stream_check=None, on_item=None):
+    """
+    stream_check(key, value, count) -> error message or None, runs on every top-level item of a streamed JSON
+    response, once with value PENDING when its key arrives and once with the parsed value, and aborts the
+    generation early on error. on_item(key, value) receives items as
+    they complete, and sees them again if the request is retried.
+    """
     api_set = load_key("api")
     llm_support_json = load_key("llm_support_json")
-    with LOCK:
-        history_response = check_ask_gpt_history(prompt, api_set["model"], log_title)
+    if log_title != 'None':
+        history_response = await asyncio.to_thread(check_ask_gpt_history, prompt, api_set["model"], response_json)
         if history_response:
             return history_response
     
@@ -67,8 +302,12 @@ def ask_gpt(prompt, response_json=True, valid_def=None, log_title='default'):
     messages = [{"role": "user", "content": prompt}]
     
     base_url = fix_base_url(api_set["base_url"])
-    client = OpenAI(api_key=api_set["key"], base_url=base_url)
+    client = get_client(base_url, api_set["key"])
     response_format = {"type": "json_object"} if response_json and api_set["model"] in llm_support_json else None
+    concurrency = get_controller(f"llm:{base_url}")
+    rpm, tpm = _get_rate_limits()
+    est_tokens = estimate_tokens(prompt)
+    stream = response_json and load_key("llm_stream") and (stream_check or on_item)
 
     max_retries = 3
     for attempt in range(max_retries):
@@ -79,46 +318,68 @@ def ask_gpt(prompt, response_json=True, valid_def=None, log_title='default'):
             }
             if response_format is not None:
                 completion_args["response_format"] = response_format
-                
-            response = client.chat.completions.create(**completion_args)
+            
+            await rpm.acquire(1)
+            await tpm.acquire(est_tokens)
+            async with concurrency.async_slot(log_title):
+                if stream:
+                    content, usage = await _stream_completion(client, completion_args, stream_check, on_item)
+                else:
+                    response = await client.chat.completions.create(**completion_args)
+                    content, usage = response.choices[0].message.content, response.usage
+            # settle the completion tokens, estimated from the text when the backend reports no usage
+            tpm.consume((usage.total_tokens if usage else est_tokens + estimate_tokens(content or '')) - est_tokens)
             
             if response_json:
                 try:
-                    response_data = json_repair.loads(response.choices[0].message.content)
+                    response_data = parse_json(content)
                     
                     # check if the response is valid, otherwise save the log and raise error and retry
                     if valid_def:
                         valid_response = valid_def(response_data)
                         if valid_response['status'] != 'success':
-                            save_log(api_set["model"], prompt, response_data, log_title="error", message=valid_response['message'])
+                            await asyncio.to_thread(save_log, api_set["model"], prompt, response_data, log_title="error", message=valid_response['message'])
                             raise ValueError(f"❎ API response error: {valid_response['message']}")
                         
                     break  # Successfully accessed and parsed, break the loop
                 except Exception as e:
-                    response_data = response.choices[0].message.content
+                    response_data = content
                     print(f"❎ json_repair parsing failed. Retrying: '''{response_data}'''")
-                    save_log(api_set["model"], prompt, response_data, log_title="error", message=f"json_repair parsing failed.")
+                    await asyncio.to_thread(save_log, api_set["model"], prompt, response_data, log_title="error", message=f"json_repair parsing failed.")
                     if attempt == max_retries - 1:
                         raise Exception(f"JSON parsing still failed after {max_retries} attempts: {e}\n Please check your network connection or API key or `output/gpt_log/error.json` to debug.")
             else:
-                response_data = response.choices[0].message.content
+                response_data = content
                 break  # Non-JSON format, break the loop directly
                 
         except Exception as e:
+            if isinstance(e, StreamAbort):
+                tpm.consume(estimate_tokens(e.partial))  # the aborted generation is billed up to where it stopped
+                await asyncio.to_thread(save_log, api_set["model"], prompt, e.partial, log_title="error", message=str(e))
             if attempt < max_retries - 1:
-                if isinstance(e, RequestException):
+                if isinstance(e, StreamAbort):
+                    print(f"❎ Streamed response diverged: {e}. Retrying ({attempt + 1}/{max_retries})...")
+                    continue
+                if isinstance(e, RateLimitError):
+                    print(f"Rate limited: {e}. Backing off ({attempt + 1}/{max_retries})...")
+                    await asyncio.sleep(10 * (attempt + 1))
+                    continue
+                elif isinstance(e, RequestException):
                     print(f"Request error: {e}. Retrying ({attempt + 1}/{max_retries})...")
                 else:
                     print(f"Unexpected error occurred: {e}\nRetrying...")
-                time.sleep(2)
+                await asyncio.sleep(2)
             else:
                 raise Exception(f"Still failed after {max_retries} attempts: {e}")
-    with LOCK:
-        if log_title != 'None':
-            save_log(api_set["model"], prompt, response_data, log_title=log_title)
+    if log_title != 'None':
+        await asyncio.to_thread(save_to_cache, api_set["model"], prompt, response_data, response_json, log_title=log_title)
 
     return response_data
 
+def ask_gpt(prompt, response_json=True, valid_def=None, log_title='default'):
+    """Blocking wrapper around `ask_gpt_async`, for callers outside the engine loop"""
+    return run_async(ask_gpt_async(prompt, response_json=response_json, valid_def=valid_def, log_title=log_title))
+
 
 if __name__ == '__main__':
     print(ask_gpt('hi there hey response in json format, just return 200.' , response_json=True, log_title=None))
\ No newline at end of file
@@ -0,0 +1,105 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hashlib
+import subprocess
+from threading import Lock
+import numpy as np
+from rich import print as rprint
+
+# Decode-once PCM store. Each (source file, sample rate, channels, volume) is decoded by ffmpeg a single time
+# into a raw float32 file, every consumer then reads zero-copy slices of a memory map of it.
+# Entries are keyed by the source's size and mtime, so a rewritten source gets a fresh decode.
+
+STORE_DIR = 'output/audio/pcm'
+BLOCK = 1 << 22  # samples per block when post-processing an entry
+
+_LOCK = Lock()
+_KEY_LOCKS = {}
+
+def _entry_file(path, sr, channels, volume):
+    st = os.stat(path)
+    ident = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{sr}|{channels}|{volume}"
+    digest = hashlib.sha1(ident.encode('utf-8')).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(STORE_DIR, f"{name}_{sr}hz_{channels}ch_{digest}.f32")
+
+def _key_lock(entry):
+    with _LOCK:
+        return _KEY_LOCKS.setdefault(entry, Lock())
+
+def _open(entry, channels, mode):
+    if os.path.getsize(entry) == 0:
+        return np.zeros((0,) if channels == 1 else (0, channels), dtype=np.float32)
+    data = np.memmap(entry, dtype=np.float32, mode=mode)
+    return data if channels == 1 else data.reshape(-1, channels)
+
+def _decode(path, entry, sr, channels, volume):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    tmp_file = entry + '.tmp'
+    cmd = ['ffmpeg', '-y', '-v', 'error', '-i', path, '-vn', '-ac', str(channels), '-ar', str(sr)]
+    if volume != 1.0:
+        cmd += ['-af', f'volume={volume}']
+    cmd += ['-f', 'f32le', tmp_file]
+    rprint(f"[cyan]🎼 Decoding {path} to {sr} Hz PCM...[/cyan]")
+    subprocess.run(cmd, check=True, stderr=subprocess.PIPE)
+    if volume != 1.0 and os.path.getsize(tmp_file):
+        # a gain can push float samples past full scale, clip like an encoder would
+        data = np.memmap(tmp_file, dtype=np.float32, mode='r+')
+        for i in range(0, len(data), BLOCK):
+            np.clip(data[i:i + BLOCK], -1.0, 1.0, out=data[i:i + BLOCK])
+        data.flush()
+        del data
+    os.replace(tmp_file, entry)
+
+def pcm_entry(path, sr, channels=1, volume=1.0):
+    """Path of the raw float32 file of `path`, decoded on first use. For callers that stream it in blocks
+    with np.fromfile instead of mapping it, so a long read does not keep the whole file resident."""
+    entry = _entry_file(path, sr, channels, volume)
+    with _key_lock(entry):
+        if not os.path.exists(entry):
+            _decode(path, entry, sr, channels, volume)
+    return entry
+
+def load_pcm(path, sr, channels=1, volume=1.0, mode='r'):
+    """Float32 samples of `path` at `sr`, shape (n,) for mono or (n, channels), memory-mapped.
+    Use mode='c' when the caller modifies the array in place (copy-on-write, the entry stays intact)."""
+    return _open(pcm_entry(path, sr, channels, volume), channels, mode)
+
+def register_pcm(path, sr, raw_file, channels=1, volume=1.0):
+    """Move a raw float32 file written alongside the encoding of `path` into the store, call it once `path` is final"""
+    entry = _entry_file(path, sr, channels, volume)
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with _key_lock(entry):
+        os.replace(raw_file, entry)
+
+def put_pcm(path, sr, samples, channels=1, volume=1.0):
+    """Register samples already in memory (e.g. a Demucs output) for an encoded file, so it is never decoded"""
+    os.makedirs(STORE_DIR, exist_ok=True)
+    tmp_file = _entry_file(path, sr, channels, volume) + '.tmp'
+    np.ascontiguousarray(samples, dtype=np.float32).tofile(tmp_file)
+    register_pcm(path, sr, tmp_file, channels, volume)
+
+def pcm_slice(samples, sr, start, end):
+    """Zero-copy view of [start, end) seconds"""
+    return samples[int(round(start * sr)):int(round(end * sr))]
+
+def open_encoder(path, sr, channels, bitrate='64k'):
+    """ffmpeg encoding interleaved float32 written to its stdin, into a temp name renamed by close_encoder"""
+    root, ext = os.path.splitext(path)
+    tmp_file = f"{root}.tmp{ext}"
+    cmd = ['ffmpeg', '-y', '-v', 'error', '-f', 'f32le', '-ar', str(sr), '-ac', str(channels), '-i', '-',
+           '-b:a', bitrate, tmp_file]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE), tmp_file
+
+def close_encoder(proc, tmp_file, path):
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed writing {path}: {proc.stderr.read().decode('utf-8', 'ignore')}")
+    proc.stderr.close()
+    os.replace(tmp_file, path)
+
+def abort_encoder(proc, tmp_file):
+    proc.kill()
+    proc.wait()
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
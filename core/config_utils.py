@@ -1,6 +1,10 @@
 from ruamel.yaml import YAML
+from ruamel.yaml.scalarbool import ScalarBoolean
 from typing import Any
+from types import MappingProxyType
+from collections.abc import Mapping
 import os, sys
+import hashlib
 import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -11,21 +15,67 @@ config_lock = threading.Lock()
 yaml = YAML()
 yaml.preserve_quotes = True
 
+# In-memory snapshot of config.yaml, only re-parsed when the file changes on disk.
+# One (stat, digest, flat) tuple swapped as a whole, readers never see a half-updated snapshot.
+# Values are plain and immutable (read-only mappings, tuples, built-in scalars), so load_key returns them without copying.
+_snapshot = (None, None, {})
+
+def _freeze(value):
+    """ruamel nodes to plain immutable values"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({str(k): _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (bool, ScalarBoolean)):
+        return bool(value)
+    for plain in (int, float, str):
+        if isinstance(value, plain):
+            return plain(value)
+    return value
+
+def _flatten(data: Mapping, prefix: str = '') -> dict:
+    """Flatten nested config into {'a.b.c': value} for O(1) dotted-key lookups"""
+    flat = {}
+    for k, v in data.items():
+        dotted = f"{prefix}{k}"
+        flat[dotted] = v
+        if isinstance(v, Mapping):
+            flat.update(_flatten(v, dotted + '.'))
+    return flat
+
+def _refresh_snapshot(stat_key) -> None:
+    # caller holds config_lock
+    global _snapshot
+    with open(CONFIG_PATH, 'rb') as file:
+        raw = file.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    flat = _snapshot[2] if digest == _snapshot[1] else _flatten(_freeze(yaml.load(raw.decode('utf-8'))))
+    _snapshot = (stat_key, digest, flat)
+
+def _get_snapshot() -> dict:
+    st = os.stat(CONFIG_PATH)
+    stat_key = (st.st_mtime_ns, st.st_size)
+    snapshot = _snapshot
+    if stat_key != snapshot[0]:
+        with config_lock:
+            if stat_key != _snapshot[0]:
+                _refresh_snapshot(stat_key)
+            snapshot = _snapshot
+    return snapshot[2]
+
 def load_key(key: str) -> Any:
-    with config_lock:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as file:
-            data = yaml.load(file)
+    flat = _get_snapshot()
+    if key in flat:
+        return flat[key]
 
+    # report the first missing part of the key, same as walking the yaml tree
     keys = key.split('.')
-    value = data
-    for k in keys:
-        if isinstance(value, dict) and k in value:
-            value = value[k]
-        else:
-            raise KeyError(f"Key '{k}' not found in configuration")
-    return value
+    for i in range(len(keys)):
+        if '.'.join(keys[:i+1]) not in flat:
+            raise KeyError(f"Key '{keys[i]}' not found in configuration")
 
 def update_key(key: str, new_value: Any) -> bool:
+    global _snapshot
     with config_lock:
         with open(CONFIG_PATH, 'r', encoding='utf-8') as file:
             data = yaml.load(file)
@@ -42,6 +92,8 @@ def update_key(key: str, new_value: Any) -> bool:
             current[keys[-1]] = new_value
             with open(CONFIG_PATH, 'w', encoding='utf-8') as file:
                 yaml.dump(data, file)
+            # force a reload even if the filesystem mtime resolution is coarse
+            _snapshot = (None,) + _snapshot[1:]
             return True
         else:
             raise KeyError(f"Key '{keys[-1]}' not found in configuration")
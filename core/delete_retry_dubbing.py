@@ -1,6 +1,7 @@
 import os, sys
 import shutil
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.stage_cache import invalidate_stages
 
 def delete_dubbing_files():
     files_to_delete = [
@@ -28,5 +29,8 @@ def delete_dubbing_files():
     else:
         print(f"Folder not found: {segs_folder}")
 
+    # otherwise the stage cache would restore the deleted dubbing
+    invalidate_stages(["gen_audio", "merge_full_audio", "merge_dub_to_vid"])
+
 if __name__ == "__main__":
     delete_dubbing_files()
\ No newline at end of file
@@ -2,6 +2,7 @@ import os, sys
 import glob
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.step1_ytdlp import find_video_files
+from core.ask_gpt import export_gpt_logs
 import shutil
 
 def cleanup(history_dir="history"):
@@ -19,6 +20,10 @@ def cleanup(history_dir="history"):
     os.makedirs(log_dir, exist_ok=True)
     os.makedirs(gpt_log_dir, exist_ok=True)
 
+    # The stage cache and decoded PCM only serve re-runs of this video
+    shutil.rmtree("output/cache", ignore_errors=True)
+    shutil.rmtree("output/audio/pcm", ignore_errors=True)
+
     # Move non-log files
     for file in glob.glob("output/*"):
         if not file.endswith(('log', 'gpt_log')):
@@ -28,7 +33,8 @@ def cleanup(history_dir="history"):
     for file in glob.glob("output/log/*"):
         move_file(file, log_dir)
 
-    # Move gpt_log files
+    # Move gpt_log files, with a readable json export of the response cache
+    export_gpt_logs()
     for file in glob.glob("output/gpt_log/*"):
         move_file(file, gpt_log_dir)
 
@@ -0,0 +1,224 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from rich.console import Console
+from rich.table import Table
+from rich import box
+from core.config_utils import load_key
+from core.stage_cache import StageCache
+
+# Dependency-graph runner for the pipeline steps. Each stage declares the artifacts it reads and writes,
+# a stage starts as soon as the stages producing its inputs are done, so independent steps overlap.
+
+console = Console()
+
+class Stage:
+    """`config_keys` are the config entries the step reads, they key its cache entry together with its inputs.
+    An entry can also be a function returning keys, resolved when the key is computed (e.g. the settings of the
+    selected TTS backend only). Stages with cache=False always run (e.g. copying the input video)."""
+    def __init__(self, name, func, inputs=(), outputs=(), label=None, config_keys=(), cache=True):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.label = label or name
+        self.config_keys = tuple(config_keys)
+        self.cache = cache
+        self.cache_key = None
+        self.input_hashes = {}
+
+    def resolve_config_keys(self):
+        keys = []
+        for key in self.config_keys:
+            keys.extend(key() if callable(key) else [key])
+        return keys
+
+class StageError(Exception):
+    """A stage still failed after its retries, carries the stage so callers can report the failing step"""
+    def __init__(self, stage, error):
+        super().__init__(str(error))
+        self.stage = stage
+        self.error = error
+
+def resolve_dependencies(stages):
+    """Map each stage name to the names of the stages it waits for.
+    An input is produced by the latest earlier stage that outputs it, so in-place rewrites of one file
+    (e.g. tts_tasks.xlsx) chain in declaration order."""
+    producers, deps = {}, {}
+    for stage in stages:
+        if stage.name in deps:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        deps[stage.name] = {producers[artifact] for artifact in stage.inputs if artifact in producers}
+        for artifact in stage.outputs:
+            producers[artifact] = stage.name
+    return deps
+
+def _run_stage(stage, retries, on_retry, cache=None):
+    start = time.time()
+    for attempt in range(retries):
+        try:
+            stage.func()
+            if cache is not None and stage.cache:
+                cache.store(stage)
+            break
+        except Exception as e:
+            if attempt == retries - 1:
+                raise StageError(stage, e) from e
+            if on_retry:
+                on_retry(stage, attempt + 1, e)
+    end = time.time()
+    return {"start": start, "end": end, "seconds": end - start, "attempts": attempt + 1}
+
+def print_timings(timings, started):
+    table = Table(title="⏱️ Stage timings", box=box.ROUNDED)
+    table.add_column("Stage", style="cyan")
+    table.add_column("Start", justify="right")
+    table.add_column("Duration", justify="right", style="green")
+    table.add_column("Attempts", justify="right")
+    for name, t in sorted(timings.items(), key=lambda item: item[1]["start"]):
+        table.add_row(name, f"+{t['start'] - started:.1f}s", f"{t['seconds']:.1f}s", "cached" if t.get("cached") else str(t["attempts"]))
+    console.print(table)
+    wall = max(t["end"] for t in timings.values()) - started
+    serial = sum(t["seconds"] for t in timings.values())
+    console.print(f"[bold green]⏱️ Wall time {wall:.1f}s, serial time {serial:.1f}s, {serial - wall:.1f}s saved by overlapping stages[/bold green]")
+
+def run_pipeline(stages, max_parallel=None, retries=1, on_start=None, on_retry=None, on_done=None, use_cache=None):
+    """Run stages in dependency order, overlapping the independent ones. Returns per-stage timings.
+    on_start / on_done are called from the calling thread, on_retry from the worker running the stage.
+    After a failure no new stage is started, running ones are awaited and the StageError is raised.
+    With the stage cache (config `stage_cache`) stages whose inputs and config are unchanged are skipped."""
+    deps = resolve_dependencies(stages)
+    use_cache = load_key("stage_cache") if use_cache is None else use_cache
+    cache = StageCache(stages) if use_cache else None
+    pending = {stage.name: stage for stage in stages}
+    running, timings = {}, {}
+    failure = None
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max_parallel or len(stages)) as pool:
+        while pending or running:
+            scheduled = failure is None
+            while scheduled:
+                scheduled = False
+                for name, stage in list(pending.items()):
+                    if not deps[name] <= timings.keys():
+                        continue
+                    del pending[name]
+                    if on_start:
+                        on_start(stage)
+                    if cache is not None and stage.cache and cache.prepare(stage):
+                        now = time.time()
+                        timings[name] = {"start": now, "end": now, "seconds": 0.0, "attempts": 0, "cached": True}
+                        if on_done:
+                            on_done(stage, timings[name])
+                        scheduled = True  # dependents may be ready now
+                        continue
+                    running[pool.submit(_run_stage, stage, retries, on_retry, cache)] = stage
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    timings[stage.name] = future.result()
+                except StageError as e:
+                    failure = failure or e
+                else:
+                    if on_done:
+                        on_done(stage, timings[stage.name])
+    if timings:
+        print_timings(timings, started)
+    if failure is not None:
+        raise failure
+    return timings
+
+# ------------
+# Stage graphs of the VideoLingo steps, artifacts are the files each step reads and writes
+# ------------
+
+def selected_tts_config_keys():
+    """The settings section of the selected TTS backend, named after the method (none for custom_tts).
+    Other backends' settings and keys do not re-run dubbing."""
+    return [load_key("tts_method")]
+
+def text_stages(before_translate=None):
+    """Steps 2-7. `before_translate` runs right before translation, e.g. to pause for terminology edits"""
+    from core import (step2_whisperX, step3_1_spacy_split, step3_2_splitbymeaning, step4_1_summarize,
+                      step4_2_translate_all, step5_splitforsub, step6_generate_final_timeline, step7_merge_sub_to_vid)
+    def translate():
+        if before_translate:
+            before_translate()
+        step4_2_translate_all.translate_all()
+    return [
+        Stage("transcribe", step2_whisperX.transcribe, label="🎙️ Transcribing with Whisper",
+              inputs=["video"],
+              outputs=["output/log/cleaned_chunks.xlsx", "output/audio/raw.mp3", "output/audio/vocal.mp3", "output/audio/background.mp3",
+                       "output/log/demucs_decision.json"],
+              config_keys=["whisper.model", "whisper.language", "whisper.runtime", "whisper.upload_codec", "demucs", "separation_engine", "demucs_window", "demucs_skip_below"]),
+        Stage("split_by_spacy", step3_1_spacy_split.split_by_spacy, label="✂️ Splitting sentences with NLP",
+              inputs=["output/log/cleaned_chunks.xlsx"], outputs=["output/log/sentence_splitbynlp.txt"],
+              config_keys=["whisper.language", "whisper.detected_language", "spacy_model_map"]),
+        Stage("split_by_meaning", step3_2_splitbymeaning.split_sentences_by_meaning, label="✂️ Splitting long sentences",
+              inputs=["output/log/sentence_splitbynlp.txt"], outputs=["output/log/sentence_splitbymeaning.txt"],
+              config_keys=["max_split_length", "api.model", "whisper.language", "whisper.detected_language"]),
+        Stage("summarize", step4_1_summarize.get_summary, label="📝 Summarizing",
+              inputs=["output/log/sentence_splitbymeaning.txt", "custom_terms.xlsx"], outputs=["output/log/terminology.json"],
+              config_keys=["target_language", "summary_length", "api.model"]),
+        Stage("translate", translate, label="📝 Translating",
+              inputs=["output/log/sentence_splitbymeaning.txt", "output/log/terminology.json", "output/log/cleaned_chunks.xlsx"],
+              outputs=["output/log/translation_results.xlsx"],
+              config_keys=["target_language", "reflect_translate", "min_trim_duration", "api.model",
+                           "whisper.language", "whisper.detected_language"]),
+        Stage("split_for_sub", step5_splitforsub.split_for_sub_main, label="⚡ Splitting subtitles",
+              inputs=["output/log/translation_results.xlsx"],
+              outputs=["output/log/translation_results_for_subtitles.xlsx", "output/log/translation_results_remerged.xlsx"],
+              config_keys=["subtitle", "target_language", "api.model"]),
+        Stage("gen_timeline", step6_generate_final_timeline.align_timestamp_main, label="⚡ Aligning subtitle timestamps",
+              inputs=["output/log/cleaned_chunks.xlsx", "output/log/translation_results_for_subtitles.xlsx",
+                      "output/log/translation_results_remerged.xlsx"],
+              outputs=["output/src.srt", "output/trans.srt",
+                       "output/audio/src_subs_for_audio.srt", "output/audio/trans_subs_for_audio.srt"]),
+        Stage("merge_sub_to_vid", step7_merge_sub_to_vid.merge_subtitles_to_video, label="🎬 Merging subtitles to video",
+              inputs=["video", "output/src.srt", "output/trans.srt"], outputs=["output/output_sub.mp4"],
+              config_keys=["burn_subtitles"]),
+    ]
+
+def audio_stages():
+    """Steps 8-12. Reference extraction only needs the rows written by step 8_1 so it overlaps step 8_2"""
+    from core import (step8_1_gen_audio_task, step8_2_gen_dub_chunks, step9_extract_refer_audio, step10_gen_audio,
+                      step11_merge_full_audio, step12_merge_dub_to_vid)
+    return [
+        Stage("gen_audio_task", step8_1_gen_audio_task.gen_audio_task_main, label="🔊 Generating audio tasks",
+              inputs=["output/audio/src_subs_for_audio.srt", "output/audio/trans_subs_for_audio.srt"],
+              outputs=["output/audio/tts_tasks.xlsx"],
+              config_keys=["min_subtitle_duration", "speed_factor", "api.model"]),
+        # declared before gen_dub_chunks so it depends on the tasks written by gen_audio_task
+        Stage("extract_refer_audio", step9_extract_refer_audio.extract_refer_audio_main, label="🎵 Extracting reference audio",
+              inputs=["output/audio/tts_tasks.xlsx", "output/audio/vocal.mp3"], outputs=["output/audio/refers"]),
+        Stage("gen_dub_chunks", step8_2_gen_dub_chunks.gen_dub_chunks, label="🔊 Generating dubbing chunks",
+              inputs=["output/audio/tts_tasks.xlsx", "output/src.srt", "output/trans.srt", "output/audio/raw.mp3"],
+              outputs=["output/audio/tts_tasks.xlsx"],
+              config_keys=["speed_factor", "tolerance"]),
+        Stage("gen_audio", step10_gen_audio.gen_audio, label="🗣️ Generating audio",
+              inputs=["output/audio/tts_tasks.xlsx", "output/audio/refers"],
+              outputs=["output/audio/tts_tasks.xlsx", "output/audio/segs", "output/audio/tmp"],
+              config_keys=["tts_method", "speed_factor", selected_tts_config_keys]),
+        Stage("merge_full_audio", step11_merge_full_audio.merge_full_audio, label="🔄 Merging full audio",
+              inputs=["output/audio/tts_tasks.xlsx", "output/audio/segs"], outputs=["output/dub.mp3", "output/dub.srt"]),
+        Stage("merge_dub_to_vid", step12_merge_dub_to_vid.merge_video_audio, label="🎞️ Merging dubbing to video",
+              inputs=["video", "output/audio/background.mp3", "output/dub.mp3", "output/dub.srt"],
+              outputs=["output/output_dub.mp4"],
+              config_keys=["burn_subtitles"]),
+    ]
+
+if __name__ == "__main__":
+    # e.g. b and c overlap once a is done, d waits for both
+    def sleeper(seconds):
+        return lambda: time.sleep(seconds)
+    demo = [
+        Stage("a", sleeper(0.5), outputs=["x"]),
+        Stage("b", sleeper(1), inputs=["x"], outputs=["y"]),
+        Stage("c", sleeper(1), inputs=["x"], outputs=["z"]),
+        Stage("d", sleeper(0.5), inputs=["y", "z"]),
+    ]
+    run_pipeline(demo, on_start=lambda stage: console.print(f"▶️ {stage.label}"), use_cache=False)
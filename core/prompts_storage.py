@@ -35,6 +35,38 @@ Split the given subtitle text into {num_parts} parts, each less than {word_limit
     return split_prompt
 
 
+def get_batch_split_prompt(items, word_limit = 20):
+    """items: list of (id, sentence, num_parts), packed into one request to save the repeated instructions"""
+    language = load_key("whisper.detected_language")
+    sentences = '\n'.join(f'<sentence id="{item_id}" parts="{num_parts}">{sentence}</sentence>' for item_id, sentence, num_parts in items)
+    json_format = {item_id: {"split": f"<<complete sentence {item_id} with [br] tags at the {num_parts - 1} split position(s)>>"} for item_id, _, num_parts in items}
+    split_prompt = f"""
+### Role
+You are a professional Netflix subtitle splitter in {language}.
+
+### Task
+Split each of the given subtitle texts into the number of parts given by its `parts` attribute, each part less than {word_limit} words.
+
+### Instructions
+1. Maintain sentence meaning coherence according to Netflix subtitle standards
+2. Keep parts roughly equal in length (minimum 3 words each)
+3. Split at natural points like punctuation marks or conjunctions
+4. If provided text is repeated words, simply split at the middle of the repeated words.
+5. Handle every sentence independently, never move words between sentences, and keep the original wording
+
+### Given Texts
+<split_these_sentences>
+{sentences}
+</split_these_sentences>
+
+### Output Format in JSON
+Complete the following JSON, keyed by sentence id, where << >> represents placeholders that should not appear in your answer:
+{json.dumps(json_format, ensure_ascii=False, indent=4)}
+
+### Your Answer, Provide ONLY a valid JSON object:
+""".strip()
+    return split_prompt
+
 ## ================================================================
 # @ step4_1_summarize.py
 def get_summary_prompt(source_content, custom_terms_json=None):
@@ -1,4 +1,6 @@
 import os,sys
+import time
+import threading
 import spacy
 from spacy.cli import download
 from rich import print
@@ -13,19 +15,64 @@ def get_spacy_model(language: str):
         print(f"[yellow]Spacy model does not support '{language}', using en_core_web_md model as fallback...[/yellow]")
     return model
 
-def init_nlp():
-    try:
-        language = "en" if load_key("whisper.language") == "en" else load_key("whisper.detected_language")
-        model = get_spacy_model(language)
+# Process-wide model registry: each spaCy model is loaded once per process (streamlit session, batch run) and
+# shared by every stage. Components no stage uses are never loaded, each stage gets a view of the model that
+# skips the components it does not need. Views pass `disable` per call, so the shared model is never mutated.
+_MODELS = {}
+_LOCK = threading.Lock()
+UNUSED_PIPES = ["ner", "entity_ruler", "entity_linker", "lemmatizer", "textcat", "textcat_multilabel", "spancat"]
+STAGE_PIPES = {
+    # sentence boundaries, dependencies and POS for the split rules
+    "split": ["tok2vec", "transformer", "tagger", "morphologizer", "attribute_ruler", "parser", "senter", "sentencizer"],
+    # token counts, the tokenizer alone
+    "tokenize": [],
+}
+
+class NlpView:
+    """A shared model called with the components of one stage only"""
+    def __init__(self, nlp, stage):
+        self.nlp = nlp
+        self.stage = stage
+        self.disable = [name for name in nlp.pipe_names if name not in STAGE_PIPES[stage]]
+
+    def __call__(self, text):
+        return self.nlp(text, disable=self.disable)
+
+    def pipe(self, texts, **kwargs):
+        return self.nlp.pipe(texts, disable=self.disable, **kwargs)
+
+    def __getattr__(self, name):
+        if name == "nlp":  # not set yet, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.nlp, name)
+
+def load_model(model):
+    with _LOCK:
+        if model in _MODELS:
+            return _MODELS[model]
         print(f"[blue]⏳ Loading NLP Spacy model: <{model}> ...[/blue]")
+        start = time.time()
         try:
-            nlp = spacy.load(model)
-        except:
+            nlp = spacy.load(model, exclude=UNUSED_PIPES)
+        except OSError:
             print(f"[yellow]Downloading {model} model...[/yellow]")
             print("[yellow]If download failed, please check your network and try again.[/yellow]")
             download(model)
-            nlp = spacy.load(model)
-    except:
-        raise ValueError(f"❌ Failed to load NLP Spacy model: {model}")
-    print(f"[green]✅ NLP Spacy model loaded successfully![/green]")
-    return nlp
\ No newline at end of file
+            nlp = spacy.load(model, exclude=UNUSED_PIPES)
+        _MODELS[model] = nlp
+        print(f"[green]✅ NLP Spacy model loaded in {time.time() - start:.1f}s, pipes: {nlp.pipe_names}[/green]")
+        return nlp
+
+def init_nlp(stage="split"):
+    """The model of the transcript language, with only the components `stage` needs running"""
+    try:
+        language = "en" if load_key("whisper.language") == "en" else load_key("whisper.detected_language")
+        model = get_spacy_model(language)
+        nlp = load_model(model)
+    except Exception as e:
+        raise ValueError(f"❌ Failed to load NLP Spacy model: {model}") from e
+    return NlpView(nlp, stage)
+
+def count_tokens(nlp, texts):
+    """Token counts from the tokenizer alone, the tagger and parser do not change how text is tokenized"""
+    return [len(doc) for doc in nlp.tokenizer.pipe(texts, batch_size=load_key("spacy_batch_size"))]
@@ -2,8 +2,8 @@ import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 import itertools
 import os,sys
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from load_nlp_model import init_nlp
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.spacy_utils.load_nlp_model import init_nlp
 from rich import print
 
 def is_valid_phrase(phrase):
@@ -12,9 +12,9 @@ def is_valid_phrase(phrase):
     has_verb = any((token.pos_ == "VERB" or token.pos_ == 'AUX') for token in phrase)
     return (has_subject and has_verb)
 
-def analyze_comma(start, doc, token):
+def analyze_comma(start, doc, token, end):
     left_phrase = doc[max(start, token.i - 9):token.i]
-    right_phrase = doc[token.i + 1:min(len(doc), token.i + 10)]
+    right_phrase = doc[token.i + 1:min(end, token.i + 10)]
     
     suitable_for_splitting = is_valid_phrase(right_phrase) # and is_valid_phrase(left_phrase) # ! no need to chekc left phrase
     
@@ -27,51 +27,31 @@ def analyze_comma(start, doc, token):
 
     return suitable_for_splitting
 
-def split_by_comma(text, nlp):
-    doc = nlp(text)
-    sentences = []
-    start = 0
+def split_by_comma(span):
+    """Cut a sentence span at suitable commas and at colons, returns sub-spans of the same parse"""
+    doc = span.doc
+    pieces = []
+    start = span.start
     
-    for i, token in enumerate(doc):
+    for token in span:
         if token.text == "," or token.text == "，":
-            suitable_for_splitting = analyze_comma(start, doc, token)
-            
-            if suitable_for_splitting :
-                sentences.append(doc[start:token.i].text.strip())
-                print(f"[yellow]✂️  Split at comma: {doc[start:token.i][-4:]},| {doc[token.i + 1:][:4]}[/yellow]")
+            if analyze_comma(start, doc, token, span.end):
+                pieces.append(doc[start:token.i])
+                print(f"[yellow]✂️  Split at comma: {doc[start:token.i][-4:]},| {doc[token.i + 1:span.end][:4]}[/yellow]")
                 start = token.i + 1
+        elif token.text == ":": # Split at colon
+            pieces.append(doc[start:token.i])
+            print(f"[yellow]✂️  Split at colon: {doc[start:token.i][-4:]}:| {doc[token.i + 1:span.end][:4]}[/yellow]")
+            start = token.i + 1
     
-    for i, token in enumerate(doc):
-        if token.text == ":": # Split at colon
-            sentences.append(doc[start:token.i].text.strip())
-            print(f"[yellow]✂️  Split at colon: {doc[start:token.i][-4:]}:| {doc[token.i + 1:][:4]}[/yellow]")
-                
-    
-    sentences.append(doc[start:].text.strip())
-    return sentences
-
-def split_by_comma_main(nlp):
-
-    with open("output/log/sentence_by_mark.txt", "r", encoding="utf-8") as input_file:
-        sentences = input_file.readlines()
+    pieces.append(doc[start:span.end])
+    return [piece for piece in pieces if piece.text.strip()]
 
-    all_split_sentences = []
-    for sentence in sentences:
-        split_sentences = split_by_comma(sentence.strip(), nlp)
-        all_split_sentences.extend(split_sentences)
-
-    with open("output/log/sentence_by_comma.txt", "w", encoding="utf-8") as output_file:
-        for sentence in all_split_sentences:
-            output_file.write(sentence + "\n")
-    
-    # delete the original file
-    os.remove("output/log/sentence_by_mark.txt")
-    
-    print("[green]💾 Sentences split by commas saved to →  `sentences_by_comma.txt`[/green]")
+def split_by_comma_spans(spans):
+    for span in spans:
+        yield from split_by_comma(span)
 
 if __name__ == "__main__":
     nlp = init_nlp()
-    split_by_comma_main(nlp)
-    # nlp = init_nlp()
-    # test = "So in the same frame, right there, almost in the exact same spot on the ice, Brown has committed himself, whereas McDavid has not."
-    # print(split_by_comma(test, nlp))
\ No newline at end of file
+    test = "So in the same frame, right there, almost in the exact same spot on the ice, Brown has committed himself, whereas McDavid has not."
+    print([piece.text for piece in split_by_comma(nlp(test)[:])])
@@ -7,7 +7,9 @@ from core.spacy_utils.load_nlp_model import init_nlp
 from core.config_utils import load_key, get_joiner
 from rich import print
 
-def split_by_mark(nlp):
+PUNCT_ONLY = [',', '.', '，', '。', '？', '！']
+
+def load_transcript_text():
     whisper_language = load_key("whisper.language")
     language = load_key("whisper.detected_language") if whisper_language == 'auto' else whisper_language # consider force english case
     joiner = get_joiner(language)
@@ -16,24 +18,24 @@ def split_by_mark(nlp):
     chunks.text = chunks.text.apply(lambda x: x.strip('"').strip(""))
     
     # join with joiner
-    input_text = joiner.join(chunks.text.to_list())
+    return joiner.join(chunks.text.to_list())
 
-    doc = nlp(input_text)
+def split_by_mark(doc):
+    """Sentence spans of the parsed transcript"""
     assert doc.has_annotation("SENT_START")
-
-    sentences_by_mark = [sent.text for sent in doc.sents]
-
-    with open("output/log/sentence_by_mark.txt", "w", encoding="utf-8") as output_file:
-        for i, sentence in enumerate(sentences_by_mark):
-            if i > 0 and sentence.strip() in [',', '.', '，', '。', '？', '！']:
-                # ! If the current line contains only punctuation, merge it with the previous line, this happens in Chinese, Japanese, etc.
-                output_file.seek(output_file.tell() - 1, os.SEEK_SET)  # Move to the end of the previous line
-                output_file.write(sentence)  # Add the punctuation
-            else:
-                output_file.write(sentence + "\n")
-    
-    print("[green]💾 Sentences split by punctuation marks saved to →  `sentences_by_mark.txt`[/green]")
+    prev = None
+    for sent in doc.sents:
+        if prev is not None and sent.text.strip() in PUNCT_ONLY:
+            # ! If the current sentence contains only punctuation, merge it with the previous one, this happens in Chinese, Japanese, etc.
+            prev = doc[prev.start:sent.end]
+            continue
+        if prev is not None:
+            yield prev
+        prev = sent
+    if prev is not None:
+        yield prev
 
 if __name__ == "__main__":
     nlp = init_nlp()
-    split_by_mark(nlp)
+    for sent in split_by_mark(nlp(load_transcript_text())):
+        print(sent.text)
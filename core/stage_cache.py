@@ -0,0 +1,314 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import shutil
+import fnmatch
+from collections.abc import Mapping
+import hashlib
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+from rich import print as rprint
+from core.config_utils import load_key
+
+# Content-addressed cache of stage artifacts. A stage is keyed by its name, the config keys it reads and
+# the content hashes of its input files; its outputs are stored under output/cache/<stage>/<key>.
+# A stage whose key is unchanged is skipped (or restored from the cache), a changed key removes the stale
+# outputs so the step's own `if os.path.exists(...)` check does not skip it.
+
+CACHE_DIR = 'output/cache'
+# final renders are large and cheap to redo from the cached subtitles and dub, only their fingerprint is kept
+FINGERPRINT_ONLY = ["output/output_*.mp4"]
+HASH_CHUNK = 1 << 20
+FICLONE = 0x40049409  # Linux ioctl: copy-on-write clone of a file (btrfs, xfs, ...)
+
+def _resolve_video():
+    from core.step1_ytdlp import find_video_files
+    return find_video_files()
+
+# logical artifacts that are not a fixed path
+ARTIFACT_RESOLVERS = {
+    "video": _resolve_video,
+}
+
+def resolve_artifact(artifact):
+    resolver = ARTIFACT_RESOLVERS.get(artifact)
+    if resolver is None:
+        return artifact
+    try:
+        return resolver()
+    except Exception:
+        return None
+
+def fingerprint(path):
+    """Cheap change detector: (size, mtime_ns) of a file, or of every file in a directory"""
+    if path is None or not os.path.exists(path):
+        return None
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    return sorted([os.path.relpath(os.path.join(root, f), path), *fingerprint(os.path.join(root, f))]
+                  for root, _, files in os.walk(path) for f in files)
+
+def clone_file(src, dst):
+    """Copy src to dst, as a copy-on-write reflink where the filesystem supports it, otherwise byte by byte.
+    Never a hard link: the cache entry and the working file must not share an inode, or rewriting one in place
+    would change the other."""
+    if fcntl is not None:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+def _jsonable(value):
+    # config sections are read-only mappings
+    return dict(value) if isinstance(value, Mapping) else str(value)
+
+def _config_value(key):
+    try:
+        return load_key(key)
+    except KeyError:
+        return None
+
+class StageCache:
+    def __init__(self, stages, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.manifest_file = os.path.join(cache_dir, 'manifest.json')
+        self.lock = threading.RLock()
+        # in-place artifacts (written by several stages), a differing version is restored rather than kept as an edit
+        writers = {}
+        for stage in stages:
+            for artifact in stage.outputs:
+                writers.setdefault(artifact, []).append(stage.name)
+        self.shared = {artifact for artifact, names in writers.items() if len(names) > 1}
+        self.producers = {}
+        for stage in stages:
+            self.producers[stage.name] = {}
+            for artifact in stage.inputs:
+                writer = self._latest_writer(stages, stage, artifact)
+                if writer is not None:
+                    self.producers[stage.name][artifact] = writer
+        self.manifest = self._load_manifest()
+
+    @staticmethod
+    def _latest_writer(stages, stage, artifact):
+        writer = None
+        for other in stages:
+            if other is stage:
+                break
+            if artifact in other.outputs:
+                writer = other
+        return writer
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_file):
+            try:
+                with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError):
+                pass
+        return {"stages": {}, "hashes": {}}
+
+    def _save_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    # ------------
+    # Hashing
+    # ------------
+
+    def _hash_file(self, path):
+        """sha1 of a file, memoized on its (size, mtime_ns) so big media is hashed once"""
+        fp = fingerprint(path)
+        with self.lock:
+            known = self.manifest["hashes"].get(path)
+        if known and known[0] == fp:
+            return known[1]
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_CHUNK), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with self.lock:
+            self.manifest["hashes"][path] = [fp, digest]
+        return digest
+
+    def hash_artifact(self, artifact):
+        path = resolve_artifact(artifact)
+        if path is None or not os.path.exists(path):
+            return None
+        if os.path.isfile(path):
+            return self._hash_file(path)
+        sha = hashlib.sha1()
+        for root, _, files in sorted(os.walk(path)):
+            for f in sorted(files):
+                file_path = os.path.join(root, f)
+                sha.update(os.path.relpath(file_path, path).encode('utf-8'))
+                sha.update(self._hash_file(file_path).encode())
+        return sha.hexdigest()
+
+    def stage_key(self, stage, known_hashes=None):
+        """Key of the stage's config and inputs, `known_hashes` overrides the hash of some inputs"""
+        known_hashes = known_hashes or {}
+        config = {key: _config_value(key) for key in stage.resolve_config_keys()}
+        inputs = {artifact: known_hashes[artifact] if artifact in known_hashes else self.hash_artifact(artifact)
+                  for artifact in stage.inputs}
+        stage.input_hashes = inputs
+        payload = json.dumps([stage.name, config, inputs], sort_keys=True, ensure_ascii=False, default=_jsonable)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # ------------
+    # Storing and restoring artifacts
+    # ------------
+
+    def _entry_dir(self, stage_name, key):
+        return os.path.join(self.cache_dir, stage_name, key[:16])
+
+    def _place(self, src, dst):
+        """Atomically put a copy (reflink where possible) of src at dst, readers never see a half-written file"""
+        if os.path.isdir(src):
+            tmp_dir = dst.rstrip('/\\') + '.tmp'
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            shutil.copytree(src, tmp_dir, copy_function=clone_file)
+            shutil.rmtree(dst, ignore_errors=True)
+            os.replace(tmp_dir, dst)
+            return
+        os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+        root, ext = os.path.splitext(dst)
+        tmp_file = f"{root}.tmp{ext}"
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        clone_file(src, tmp_file)
+        os.replace(tmp_file, dst)
+
+    def _restore_artifact(self, stage_name, artifact):
+        entry = self.manifest["stages"].get(stage_name)
+        if not entry or artifact not in entry["outputs"]:
+            return False
+        if entry["outputs"][artifact]["file"] is None:  # fingerprint only, nothing to restore
+            return False
+        src = os.path.join(self._entry_dir(stage_name, entry["key"]), entry["outputs"][artifact]["file"])
+        dst = resolve_artifact(artifact)
+        if dst is None or not os.path.exists(src):
+            return False
+        self._place(src, dst)
+        entry["outputs"][artifact]["fingerprint"] = fingerprint(dst)
+        return True
+
+    def _load_entry(self, stage, key):
+        meta_file = os.path.join(self._entry_dir(stage.name, key), 'meta.json')
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def prepare(self, stage):
+        """Called before a stage is scheduled. Returns True when the stage is up to date or was restored,
+        otherwise clears the stale outputs so the stage runs."""
+        with self.lock:
+            return self._prepare(stage)
+
+    def _prepare(self, stage):
+        # in-place artifacts may hold a later stage's version, bring back the version this stage reads
+        for artifact, producer in self.producers[stage.name].items():
+            recorded = self.manifest["stages"].get(producer.name, {}).get("outputs", {}).get(artifact)
+            if recorded and fingerprint(resolve_artifact(artifact)) != recorded["fingerprint"]:
+                self._restore_artifact(producer.name, artifact)
+
+        key = self.stage_key(stage)
+        stage.cache_key = key
+        entry = self.manifest["stages"].get(stage.name)
+        if entry and entry["key"] == key:
+            for artifact, output in entry["outputs"].items():
+                current = fingerprint(resolve_artifact(artifact))
+                if current == output["fingerprint"]:
+                    continue
+                if current is not None and artifact not in self.shared:
+                    # edited by hand (e.g. terminology.json), keep the edit, dependents see the new content hash
+                    rprint(f"[yellow]✏️ {artifact} was modified, keeping your version.[/yellow]")
+                    output["fingerprint"] = current
+                elif not self._restore_artifact(stage.name, artifact):
+                    break
+            else:
+                rprint(f"[cyan]♻️ {stage.label}: inputs and config unchanged, skip.[/cyan]")
+                self._save_manifest()
+                return True
+
+        meta = self._load_entry(stage, key)
+        if meta is not None:
+            self.manifest["stages"][stage.name] = {"key": key, "outputs": meta}
+            if all(self._restore_artifact(stage.name, artifact) for artifact in meta):
+                os.utime(self._entry_dir(stage.name, key))  # most recently used, evicted last
+                rprint(f"[cyan]♻️ {stage.label}: restored from cache {key[:8]}.[/cyan]")
+                self._save_manifest()
+                return True
+
+        if entry:
+            rprint(f"[yellow]🔄 {stage.label}: inputs or config changed, re-running.[/yellow]")
+        for artifact in stage.outputs:
+            path = resolve_artifact(artifact)
+            if artifact in stage.inputs or path is None or not os.path.exists(path):
+                continue
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+        self.manifest["stages"].pop(stage.name, None)
+        self._save_manifest()
+        return False
+
+    def store(self, stage):
+        """Called from the worker after the stage succeeded, snapshots its outputs under its key.
+        The key is computed again: the stage may have waited for input edits (e.g. the terminology pause before
+        translating), the next run sees the edited files. Inputs the stage rewrites itself keep their hash from
+        before the run, which is what the next run's key sees once the producer's version is restored."""
+        in_place = {artifact: stage.input_hashes[artifact] for artifact in stage.inputs if artifact in stage.outputs}
+        stage.cache_key = self.stage_key(stage, in_place)
+        entry_dir = self._entry_dir(stage.name, stage.cache_key)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(entry_dir)
+        outputs = {}
+        for i, artifact in enumerate(stage.outputs):
+            path = resolve_artifact(artifact)
+            if path is None or not os.path.exists(path):
+                continue
+            name = None
+            if not any(fnmatch.fnmatch(artifact, pattern) for pattern in FINGERPRINT_ONLY):
+                name = f"{i}_{os.path.basename(path.rstrip('/'))}"
+                self._place(path, os.path.join(entry_dir, name))
+            outputs[artifact] = {"file": name, "fingerprint": fingerprint(path)}
+        with open(os.path.join(entry_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(outputs, f, ensure_ascii=False, indent=2)
+        with self.lock:
+            self.manifest["stages"][stage.name] = {"key": stage.cache_key, "outputs": outputs}
+            self._save_manifest()
+        self._evict(stage.name, keep=entry_dir)
+
+    def _evict(self, stage_name, keep):
+        """Remove the least recently used entries of a stage beyond `stage_cache_entries`"""
+        limit = max(1, _config_value("stage_cache_entries") or 1)
+        stage_dir = os.path.join(self.cache_dir, stage_name)
+        entries = [os.path.join(stage_dir, name) for name in os.listdir(stage_dir)
+                   if os.path.isdir(os.path.join(stage_dir, name)) and not name.endswith('.tmp')]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for entry_dir in [e for e in entries if e != keep][limit - 1:]:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+def invalidate_stages(stage_names, cache_dir=CACHE_DIR):
+    """Forget the cached results of some stages, e.g. when the user deletes the dubbing files to redo them"""
+    manifest_file = os.path.join(cache_dir, 'manifest.json')
+    if not os.path.exists(manifest_file):
+        return
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    for name in stage_names:
+        manifest["stages"].pop(name, None)
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
@@ -16,6 +16,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.config_utils import load_key
 from core.all_whisper_methods.audio_preprocess import get_audio_duration
 from core.all_tts_functions.tts_main import tts_main
+from core.adaptive_concurrency import get_controller
 
 console = Console()
 
@@ -68,8 +69,11 @@ def adjust_audio_speed(input_file: str, output_file: str, speed_factor: float) -
                 rprint(f"[red]❌ Audio speed adjustment failed, max retries reached ({max_retries})[/red]")
                 raise e
 
-def process_row(row: pd.Series, tasks_df: pd.DataFrame) -> Tuple[int, float]:
+def process_row(row: pd.Series, tasks_df: pd.DataFrame, concurrency=None) -> Tuple[int, float]:
     """Helper function for processing single row data"""
+    if concurrency is not None:
+        with concurrency.slot():
+            return process_row(row, tasks_df)
     number = row['number']
     lines = eval(row['lines']) if isinstance(row['lines'], str) else row['lines']
     real_dur = 0
@@ -99,13 +103,17 @@ def generate_tts_audio(tasks_df: pd.DataFrame) -> pd.DataFrame:
                 raise e
         
         # for gpt_sovits, do not use parallel to avoid mistakes
-        max_workers = load_key("max_workers") if load_key("tts_method") != "gpt_sovits" else 1
-        # parallel processing for remaining tasks
+        tts_method = load_key("tts_method")
+        if tts_method == "gpt_sovits":
+            concurrency = get_controller("tts:gpt_sovits", initial=1, max_limit=1)
+        else:
+            concurrency = get_controller(f"tts:{tts_method}")
+        # parallel processing for remaining tasks, the controller adapts how many run at once
         if len(tasks_df) > warmup_size:
             remaining_tasks = tasks_df.iloc[warmup_size:].copy()
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            with ThreadPoolExecutor(max_workers=concurrency.max_limit) as executor:
                 futures = [
-                    executor.submit(process_row, row, tasks_df.copy())
+                    executor.submit(process_row, row, tasks_df.copy(), concurrency)
                     for _, row in remaining_tasks.iterrows()
                 ]
                 
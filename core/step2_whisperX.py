@@ -2,35 +2,14 @@ import os,sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from rich import print as rprint
-import subprocess
 
 from core.config_utils import load_key
-from core.all_whisper_methods.demucs_vl import demucs_main, RAW_AUDIO_FILE, VOCAL_AUDIO_FILE
-from core.all_whisper_methods.audio_preprocess import process_transcription, convert_video_to_audio, split_audio, save_results, compress_audio, CLEANED_CHUNKS_EXCEL_PATH
+from core.all_whisper_methods.demucs_vl import demucs_main, demucs_skipped, RAW_AUDIO_FILE, VOCAL_AUDIO_FILE
+from core.all_whisper_methods.audio_preprocess import process_transcription, convert_video_to_audio, split_audio, save_results, CLEANED_CHUNKS_EXCEL_PATH
 from core.step1_ytdlp import find_video_files
 
-WHISPER_FILE = "output/audio/for_whisper.mp3"
-ENHANCED_VOCAL_PATH = "output/audio/enhanced_vocals.mp3"
+VOCALS_RATIO = 2.50  # vocals gain before transcription, applied when decoding into the audio store
 
-def enhance_vocals(vocals_ratio=2.50):
-    """Enhance vocals audio volume"""
-    if not load_key("demucs"):
-        return RAW_AUDIO_FILE
-        
-    try:
-        print(f"[cyan]🎙️ Enhancing vocals with volume ratio: {vocals_ratio}[/cyan]")
-        ffmpeg_cmd = (
-            f'ffmpeg -y -i "{VOCAL_AUDIO_FILE}" '
-            f'-filter:a "volume={vocals_ratio}" '
-            f'"{ENHANCED_VOCAL_PATH}"'
-        )
-        subprocess.run(ffmpeg_cmd, shell=True, check=True, capture_output=True)
-        
-        return ENHANCED_VOCAL_PATH
-    except subprocess.CalledProcessError as e:
-        print(f"[red]Error enhancing vocals: {str(e)}[/red]")
-        return VOCAL_AUDIO_FILE  # Fallback to original vocals if enhancement fails
-    
 def transcribe():
     if os.path.exists(CLEANED_CHUNKS_EXCEL_PATH):
         rprint("[yellow]⚠️ Transcription results already exist, skipping transcription step.[/yellow]")
@@ -44,25 +23,25 @@ def transcribe():
     if load_key("demucs"):
         demucs_main()
     
-    # step2 Compress audio
-    choose_audio = enhance_vocals() if load_key("demucs") else RAW_AUDIO_FILE
-    whisper_audio = compress_audio(choose_audio, WHISPER_FILE)
+    # step2 Choose the whisper input. The model, the cloud uploads and the silence map all read 16 kHz PCM
+    # straight from the audio store, no intermediate mp3
+    runtime = load_key("whisper.runtime")
+    # a bypassed separation leaves the full mix in vocal.mp3, boosting it would clip
+    separated = load_key("demucs") and not demucs_skipped()
+    whisper_audio, volume = (VOCAL_AUDIO_FILE, VOCALS_RATIO) if separated else (RAW_AUDIO_FILE, 1.0)
 
     # step3 Extract audio
-    segments = split_audio(whisper_audio)
+    segments = split_audio(whisper_audio, volume=volume)
     
     # step4 Transcribe audio
-    all_results = []
-    if load_key("whisper.runtime") == "local":
-        from core.all_whisper_methods.whisperX_local import transcribe_audio as ts
+    if runtime == "local":
+        from core.all_whisper_methods.whisperX_local import transcribe_segments
         rprint("[cyan]🎤 Transcribing audio with local model...[/cyan]")
+        all_results = transcribe_segments(whisper_audio, segments, volume=volume)
     else:
-        from core.all_whisper_methods.whisperX_302 import transcribe_audio_302 as ts
+        from core.all_whisper_methods.whisperX_302 import transcribe_segments_302
         rprint("[cyan]🎤 Transcribing audio with 302 API...[/cyan]")
-
-    for start, end in segments:
-        result = ts(whisper_audio, start, end)
-        all_results.append(result)
+        all_results = transcribe_segments_302(whisper_audio, segments, volume=volume)
     
     # step5 Combine results
     combined_result = {'segments': []}
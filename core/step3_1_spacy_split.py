@@ -1,24 +1,53 @@
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import string
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from spacy_utils.split_by_comma import split_by_comma_main
-from spacy_utils.split_by_connector import split_sentences_main
-from spacy_utils.split_by_mark import split_by_mark
-from spacy_utils.split_long_by_root import split_long_by_root_main
-from spacy_utils.load_nlp_model import init_nlp
+from rich import print
+from core.config_utils import load_key
+from core.spacy_utils.split_by_comma import split_by_comma_spans
+from core.spacy_utils.split_by_connector import split_by_connector_spans
+from core.spacy_utils.split_by_mark import split_by_mark, load_transcript_text
+from core.spacy_utils.split_long_by_root import split_long_by_root
+from core.spacy_utils.load_nlp_model import init_nlp
+
+OUTPUT_FILE = 'output/log/sentence_splitbynlp.txt'
+
+def dump_stage(items, file_name):
+    """Pass items through, writing their text to output/log/<file_name> when `spacy_debug_dumps` is on"""
+    if not load_key("spacy_debug_dumps"):
+        yield from items
+        return
+    with open(f"output/log/{file_name}", "w", encoding="utf-8") as f:
+        for item in items:
+            f.write((item if isinstance(item, str) else item.text.strip()) + "\n")
+            yield item
+    print(f"[green]💾 Debug dump saved to →  `{file_name}`[/green]")
 
 def split_by_spacy():
-    if os.path.exists('output/log/sentence_splitbynlp.txt'):
-        print("File 'sentence_splitbynlp.txt' already exists. Skipping split_by_spacy.")
+    if os.path.exists(OUTPUT_FILE):
+        print(f"File '{os.path.basename(OUTPUT_FILE)}' already exists. Skipping split_by_spacy.")
         return
-    
+
     nlp = init_nlp()
-    split_by_mark(nlp)
-    split_by_comma_main(nlp)
-    split_sentences_main(nlp)
-    split_long_by_root_main(nlp)
+    # parse the transcript once, every stage cuts spans of this parse, nothing is re-parsed
+    doc = nlp(load_transcript_text())
+    spans = dump_stage(split_by_mark(doc), "sentence_by_mark.txt")
+    spans = dump_stage(split_by_comma_spans(spans), "sentence_by_comma.txt")
+    spans = dump_stage(split_by_connector_spans(spans), "sentence_splitbyconnector.txt")
+    sentences = list(split_long_by_root(spans, nlp))
+
+    punctuation = string.punctuation + "'" + '"'  # include all punctuation and apostrophe ' and "
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as output_file:
+        for i, sentence in enumerate(sentences):
+            stripped_sentence = sentence.strip()
+            if not stripped_sentence or all(char in punctuation for char in stripped_sentence):
+                print(f"[yellow]⚠️  Warning: Empty or punctuation-only line detected at index {i}[/yellow]")
+                continue
+            output_file.write(sentence + "\n")
+
+    print(f"[green]💾 Sentences split by NLP saved to →  `{os.path.basename(OUTPUT_FILE)}`[/green]")
     return
 
 if __name__ == '__main__':
-    split_by_spacy()
\ No newline at end of file
+    split_by_spacy()
@@ -1,21 +1,96 @@
 import sys,os,math
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import concurrent.futures
-from core.ask_gpt import ask_gpt
-from core.prompts_storage import get_split_prompt
+import asyncio
+from core.ask_gpt import ask_gpt_async, run_async, run_all
+from core.prompts_storage import get_split_prompt, get_batch_split_prompt
 from difflib import SequenceMatcher
-import math
-from core.spacy_utils.load_nlp_model import init_nlp
+from bisect import bisect_left
+from core.spacy_utils.load_nlp_model import init_nlp, count_tokens
 from core.config_utils import load_key, get_joiner
 from rich.console import Console
 from rich.table import Table
 
 console = Console()
 
-def tokenize_sentence(sentence, nlp):
-    # tokenizer counts the number of words in the sentence
-    doc = nlp(sentence)
-    return [token.text for token in doc]
+# from this length on difflib treats frequent characters of the part as junk (autojunk), its ratio no longer
+# peaks near the edit distance optimum, so such parts keep the full scan
+AUTOJUNK_CHARS = 200
+
+def normalize_with_offsets(text):
+    """Lowercased text without whitespace, plus the index in `text` of every kept character"""
+    chars, offsets = [], []
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            continue
+        lower = ch.lower()
+        chars.append(lower)
+        offsets.extend([i] * len(lower))
+    return ''.join(chars), offsets
+
+def banded_prefix_end(target, text, band):
+    """End j of the prefix text[:j] with the smallest edit distance to `target`, computing only the cells
+    with |i - j| <= band, O(len(target) * band). Returns None when no prefix is within the band."""
+    m, n = len(target), len(text)
+    inf = m + n + 1
+    width = 2 * band + 1
+    prev = [k - band if 0 <= k - band <= n else inf for k in range(width)]  # row 0, cell k is j = k - band
+    for i in range(1, m + 1):
+        cur = [inf] * width
+        for k in range(width):
+            j = i - band + k
+            if j < 0 or j > n:
+                continue
+            if j == 0:
+                cur[k] = i
+                continue
+            best = prev[k] + (target[i - 1] != text[j - 1])  # diagonal
+            if k + 1 < width:
+                best = min(best, prev[k + 1] + 1)  # skip a target char
+            if k > 0:
+                best = min(best, cur[k - 1] + 1)  # skip a text char
+            cur[k] = best
+        prev = cur
+    cost, k = min((cost, k) for k, cost in enumerate(prev))
+    return None if cost >= inf else m - band + k
+
+def best_ratio_split(original, start, target, candidates):
+    """The legacy rule on a set of candidates: the first j with the highest SequenceMatcher ratio.
+    The part is indexed once as seq2, candidates whose ratio upper bounds cannot beat the best are skipped."""
+    matcher = SequenceMatcher(None, '', target)
+    max_similarity, best_split = 0, None
+    for j in candidates:
+        matcher.set_seq1(original[start:j])
+        if matcher.real_quick_ratio() <= max_similarity or matcher.quick_ratio() <= max_similarity:
+            continue
+        similarity = matcher.ratio()
+        if similarity > max_similarity:
+            max_similarity, best_split = similarity, j
+    return best_split, max_similarity
+
+def find_split_position(original, norm, offsets, start, target):
+    """Where the part `target` ends in original[start:], as the legacy full scan would pick it.
+    1. the part is literally the next text: cut after it
+    2. same ignoring whitespace and case: cut after its last character, via the offset map
+    3. otherwise a banded edit distance finds the end, the legacy ratio decides within the band"""
+    last = len(original) - 1  # the legacy scan never cuts at the very end
+    if start > last:
+        return None, 0
+    if original.startswith(target, start):
+        return min(start + len(target), last), 1.0
+    norm_target = normalize_with_offsets(target)[0]
+    p = bisect_left(offsets, start)
+    if norm_target and norm.startswith(norm_target, p):
+        return min(offsets[p + len(norm_target) - 1] + 1, last), 1.0
+
+    if len(target) >= AUTOJUNK_CHARS:
+        return best_ratio_split(original, start, target, range(start, len(original)))
+    band = max(8, len(norm_target) // 4)
+    end = banded_prefix_end(norm_target, norm[p:p + len(norm_target) + band], band)
+    if end is None:
+        return best_ratio_split(original, start, target, range(start, len(original)))
+    lo = offsets[p + end - band - 1] + 1 if end - band > 0 else start
+    hi = offsets[p + end + band - 1] + 1 if p + end + band - 1 < len(offsets) else len(original)
+    return best_ratio_split(original, start, target, range(max(start, lo), min(hi + 1, len(original))))
 
 def find_split_positions(original, modified):
     split_positions = []
@@ -24,20 +99,11 @@ def find_split_positions(original, modified):
     whisper_language = load_key("whisper.language")
     language = load_key("whisper.detected_language") if whisper_language == 'auto' else whisper_language
     joiner = get_joiner(language)
+    # normalized once, every part is matched against it
+    norm, offsets = normalize_with_offsets(original)
 
     for i in range(len(parts) - 1):
-        max_similarity = 0
-        best_split = None
-
-        for j in range(start, len(original)):
-            original_left = original[start:j]
-            modified_left = joiner.join(parts[i].split())
-
-            left_similarity = SequenceMatcher(None, original_left, modified_left).ratio()
-
-            if left_similarity > max_similarity:
-                max_similarity = left_similarity
-                best_split = j
+        best_split, max_similarity = find_split_position(original, norm, offsets, start, joiner.join(parts[i].split()))
 
         if max_similarity < 0.9:
             console.print(f"[yellow]Warning: low similarity found at the best split point: {max_similarity}[/yellow]")
@@ -49,18 +115,8 @@ def find_split_positions(original, modified):
 
     return split_positions
 
-def split_sentence(sentence, num_parts, word_limit=18, index=-1, retry_attempt=0):
-    """Split a long sentence using GPT and return the result as a string."""
-    split_prompt = get_split_prompt(sentence, num_parts, word_limit)
-    def valid_split(response_data):
-        if 'split' not in response_data:
-            return {"status": "error", "message": "Missing required key: `split`"}
-        if "[br]" not in response_data["split"]:
-            return {"status": "error", "message": "Split failed, no [br] found"}
-        return {"status": "success", "message": "Split completed"}
-    
-    response_data = ask_gpt(split_prompt + ' ' * retry_attempt, response_json=True, valid_def=valid_split, log_title='sentence_splitbymeaning')
-    best_split = response_data["split"]
+def apply_split(sentence, best_split, index=-1):
+    """Cut the original sentence where the LLM put its [br] tags, keeping the original wording."""
     split_points = find_split_positions(sentence, best_split)
     # split the sentence based on the split points
     for i, split_point in enumerate(split_points):
@@ -82,30 +138,112 @@ def split_sentence(sentence, num_parts, word_limit=18, index=-1, retry_attempt=0
     
     return best_split
 
-def parallel_split_sentences(sentences, max_length, max_workers, nlp, retry_attempt=0):
-    """Split sentences in parallel using a thread pool."""
-    new_sentences = [None] * len(sentences)
-    futures = []
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for index, sentence in enumerate(sentences):
-            # Use tokenizer to split the sentence
-            tokens = tokenize_sentence(sentence, nlp)
-            # print("Tokenization result:", tokens)
-            num_parts = math.ceil(len(tokens) / max_length)
-            if len(tokens) > max_length:
-                future = executor.submit(split_sentence, sentence, num_parts, max_length, index=index, retry_attempt=retry_attempt)
-                futures.append((future, index, num_parts, sentence))
-            else:
-                new_sentences[index] = [sentence]
+async def split_sentence(sentence, num_parts, word_limit=18, index=-1, retry_attempt=0):
+    """Split a long sentence using GPT and return the result as a string."""
+    split_prompt = get_split_prompt(sentence, num_parts, word_limit)
+    def valid_split(response_data):
+        if 'split' not in response_data:
+            return {"status": "error", "message": "Missing required key: `split`"}
+        if "[br]" not in response_data["split"]:
+            return {"status": "error", "message": "Split failed, no [br] found"}
+        return {"status": "success", "message": "Split completed"}
+    
+    response_data = await ask_gpt_async(split_prompt + ' ' * retry_attempt, response_json=True, valid_def=valid_split, log_title='sentence_splitbymeaning')
+    # matching the split back onto the sentence is CPU work, kept off the engine loop
+    return await asyncio.to_thread(apply_split, sentence, response_data["split"], index)
+
+def valid_split_item(sentence, item):
+    """Validate one item of a batched response on its own, so only broken items get resubmitted"""
+    if not isinstance(item, dict) or not isinstance(item.get('split'), str):
+        return False
+    if '[br]' not in item['split']:
+        return False
+    # the item must still be this sentence, not a neighbour or a rewrite
+    normalize = lambda text: ''.join(text.replace('[br]', '').split()).lower()
+    return SequenceMatcher(None, normalize(sentence), normalize(item['split'])).ratio() >= 0.9
+
+async def split_sentence_batch(items, word_limit, retry_attempt=0):
+    """Split several sentences with one request. items: list of (index, sentence, num_parts), returns {index: split}"""
+    batch = [(str(k + 1), sentence, num_parts) for k, (_, sentence, num_parts) in enumerate(items)]
+    prompt = get_batch_split_prompt(batch, word_limit)
+    def valid_batch(response_data):
+        if not isinstance(response_data, dict) or not response_data:
+            return {"status": "error", "message": "Expected a JSON object keyed by sentence id"}
+        return {"status": "success", "message": "Batch received"}
+    expected_ids = {b[0] for b in batch}
+    def stream_check(key, value, count):
+        # bad items are resubmitted on their own, only an unknown id means the answer went off the rails
+        return None if key in expected_ids else f"Unexpected sentence id {key}"
 
-        for future, index, num_parts, sentence in futures:
-            split_result = future.result()
-            if split_result:
-                split_lines = split_result.strip().split('\n')
-                new_sentences[index] = [line.strip() for line in split_lines]
+    response_data = await ask_gpt_async(prompt + ' ' * retry_attempt, response_json=True, valid_def=valid_batch,
+                                        log_title='sentence_splitbymeaning_batch', stream_check=stream_check)
+    def apply_items():
+        results = {}
+        for item_id, (index, sentence, _) in zip((b[0] for b in batch), items):
+            item = response_data.get(item_id)
+            if valid_split_item(sentence, item):
+                results[index] = apply_split(sentence, item['split'], index)
+        return results
+    # validating and matching the splits is CPU work, kept off the engine loop
+    return await asyncio.to_thread(apply_items)
+
+async def split_in_batches(items, word_limit, batch_size, retry_attempt=0, max_rounds=3):
+    """Pack long sentences into batched requests, resubmit only the items that failed validation."""
+    results = {}
+    pending = items
+    for round_idx in range(max_rounds):
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        batch_results = await asyncio.gather(*(split_sentence_batch(batch, word_limit, retry_attempt + round_idx) for batch in batches), return_exceptions=True)
+        for batch_result in batch_results:
+            if isinstance(batch_result, Exception):
+                console.print(f"[yellow]⚠️ Batch split request failed: {batch_result}[/yellow]")
             else:
-                new_sentences[index] = [sentence]
+                results.update(batch_result)
+        pending = [item for item in pending if item[0] not in results]
+        if not pending:
+            break
+        console.print(f"[yellow]🔄 Resubmitting {len(pending)} sentence(s) that failed validation...[/yellow]")
+
+    # last resort, one request per sentence as before, and like before a sentence that still fails stops the stage
+    singles = await asyncio.gather(*(split_sentence(sentence, num_parts, word_limit, index=index, retry_attempt=retry_attempt)
+                                     for index, sentence, num_parts in pending), return_exceptions=True)
+    failed = []
+    for (index, sentence, _), split_result in zip(pending, singles):
+        if isinstance(split_result, Exception):
+            failed.append((index, split_result))
+        else:
+            results[index] = split_result
+    if failed:
+        console.print(f"[red]❌ {len(failed)} sentence(s) could not be split: {', '.join(str(index) for index, _ in failed)}[/red]")
+        raise failed[0][1]
+    return results
+
+def parallel_split_sentences(sentences, max_length, nlp, retry_attempt=0):
+    """Split sentences concurrently through the shared LLM engine."""
+    new_sentences = [None] * len(sentences)
+    long_items = []
+
+    for index, (sentence, token_count) in enumerate(zip(sentences, count_tokens(nlp, sentences))):
+        num_parts = math.ceil(token_count / max_length)
+        if token_count > max_length:
+            long_items.append((index, sentence, num_parts))
+        else:
+            new_sentences[index] = [sentence]
+
+    batch_size = load_key("split_batch_size")
+    if batch_size > 1:
+        split_results = run_async(split_in_batches(long_items, max_length, batch_size, retry_attempt))
+    else:
+        split_results = dict(zip((index for index, _, _ in long_items), run_all(
+            [split_sentence(sentence, num_parts, max_length, index=index, retry_attempt=retry_attempt) for index, sentence, num_parts in long_items])))
+
+    for index, sentence, _ in long_items:
+        split_result = split_results.get(index)
+        if split_result:
+            split_lines = split_result.strip().split('\n')
+            new_sentences[index] = [line.strip() for line in split_lines]
+        else:
+            new_sentences[index] = [sentence]
 
     return [sentence for sublist in new_sentences for sentence in sublist]
 
@@ -115,10 +253,10 @@ def split_sentences_by_meaning():
     with open('output/log/sentence_splitbynlp.txt', 'r', encoding='utf-8') as f:
         sentences = [line.strip() for line in f.readlines()]
 
-    nlp = init_nlp()
+    nlp = init_nlp("tokenize")
     # 🔄 process sentences multiple times to ensure all are split
     for retry_attempt in range(3):
-        sentences = parallel_split_sentences(sentences, max_length=load_key("max_split_length"), max_workers=load_key("max_workers"), nlp=nlp, retry_attempt=retry_attempt)
+        sentences = parallel_split_sentences(sentences, max_length=load_key("max_split_length"), nlp=nlp, retry_attempt=retry_attempt)
 
     # 💾 save results
     with open('output/log/sentence_splitbymeaning.txt', 'w', encoding='utf-8') as f:
@@ -126,5 +264,5 @@ def split_sentences_by_meaning():
     console.print('[green]✅ All sentences have been successfully split![/green]')
 
 if __name__ == '__main__':
-    # print(split_sentence('Which makes no sense to the... average guy who always pushes the character creation slider all the way to the right.', 2, 22))
+    # print(run_async(split_sentence('Which makes no sense to the... average guy who always pushes the character creation slider all the way to the right.', 2, 22)))
     split_sentences_by_meaning()
\ No newline at end of file
@@ -2,7 +2,8 @@ import os, sys, json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.ask_gpt import ask_gpt
 from core.prompts_storage import get_summary_prompt
-from core.config_utils import load_key
+from core.config_utils import load_key, get_joiner
+from core.term_matcher import load_term_matcher
 import pandas as pd
 
 TERMINOLOGY_JSON_PATH = 'output/log/terminology.json'
@@ -19,15 +20,15 @@ def combine_chunks():
 
 def search_things_to_note_in_prompt(sentence):
     """Search for terms to note in the given sentence"""
-    with open(TERMINOLOGY_JSON_PATH, 'r', encoding='utf-8') as file:
-        things_to_note = json.load(file)
-    things_to_note_list = [term['src'] for term in things_to_note['terms'] if term['src'].lower() in sentence.lower()]
-    if things_to_note_list:
+    whisper_language = load_key("whisper.language")
+    language = load_key("whisper.detected_language") if whisper_language == 'auto' else whisper_language
+    terms, matcher = load_term_matcher(TERMINOLOGY_JSON_PATH, word_boundaries=get_joiner(language) == " ")
+    matched = matcher.find(sentence)
+    if matched:
         prompt = '\n'.join(
-            f'{i+1}. "{term["src"]}": "{term["tgt"]}",'
-            f' meaning: {term["note"]}'
-            for i, term in enumerate(things_to_note['terms'])
-            if term['src'] in things_to_note_list
+            f'{i+1}. "{terms[i]["src"]}": "{terms[i]["tgt"]}",'
+            f' meaning: {terms[i]["note"]}'
+            for i in matched
         )
         return prompt
     else:
@@ -2,11 +2,14 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import pandas as pd
 import json
-import concurrent.futures
+import asyncio
+import zlib
+from core.ask_gpt import run_all
 from core.translate_once import translate_lines
 from core.step4_1_summarize import search_things_to_note_in_prompt
 from core.step8_1_gen_audio_task import check_len_then_trim
 from core.step6_generate_final_timeline import align_timestamp
+from core.transcript_index import load_transcript_index
 from core.config_utils import load_key
 from rich.console import Console
 from rich.panel import Panel
@@ -47,17 +50,50 @@ def get_after_content(chunks, chunk_index):
     return None if chunk_index == len(chunks) - 1 else chunks[chunk_index + 1].split('\n')[:2] # Get first 2 lines
 
 # 🔍 Translate a single chunk
-def translate_chunk(chunk, chunks, theme_prompt, i):
-    things_to_note_prompt = search_things_to_note_in_prompt(chunk)
+async def translate_chunk(chunk, chunks, theme_prompt, i, on_line=None):
+    things_to_note_prompt = await asyncio.to_thread(search_things_to_note_in_prompt, chunk)
     previous_content_prompt = get_previous_content(chunks, i)
     after_content_prompt = get_after_content(chunks, i)
-    translation, english_result = translate_lines(chunk, previous_content_prompt, after_content_prompt, things_to_note_prompt, theme_prompt, i)
+    translation, english_result = await translate_lines(chunk, previous_content_prompt, after_content_prompt, things_to_note_prompt, theme_prompt, i, on_line=on_line)
     return i, english_result, translation
 
 # Add similarity calculation function
 def similar(a, b):
     return SequenceMatcher(None, a, b).ratio()
 
+def chunk_checksum(text):
+    """Fingerprint of a chunk, line breaks and case ignored"""
+    return zlib.crc32(''.join(text.split('\n')).lower().encode('utf-8'))
+
+def best_similar_result(chunk, results):
+    """Diagnostic only: the result whose source text is closest to `chunk`, with its similarity"""
+    chunk_text = ''.join(chunk.split('\n')).lower()
+    return max(((r, similar(''.join(r[1].split('\n')).lower(), chunk_text)) for r in results), key=lambda x: x[1])
+
+def reassemble_translations(chunks, results):
+    """Source and translated lines in chunk order. Each result (index, source, translation) is taken by its chunk
+    index and validated by the checksum of its source and its line count; only when that fails the results are
+    searched by similarity, to report what went wrong or recover a near-identical source."""
+    by_index = {r[0]: r for r in results}
+    src_text, trans_text = [], []
+    for i, chunk in enumerate(chunks):
+        chunk_lines = chunk.split('\n')
+        result = by_index.get(i)
+        valid = (result is not None and chunk_checksum(result[1]) == chunk_checksum(chunk)
+                 and len(result[2].split('\n')) == len(chunk_lines))
+        if not valid:
+            best_match = best_similar_result(chunk, results)
+            match_lines = len(best_match[0][2].split('\n'))
+            if best_match[1] < 0.9 or match_lines != len(chunk_lines):
+                console.print(f"[yellow]Warning: No matching translation found for chunk {i} (closest: chunk {best_match[0][0]}, "
+                              f"similarity {best_match[1]:.3f}, {match_lines} translated lines for {len(chunk_lines)})[/yellow]")
+                raise ValueError(f"Translation matching failed (chunk {i})")
+            console.print(f"[yellow]Warning: Similar match found (chunk {i}, similarity: {best_match[1]:.3f})[/yellow]")
+            result = best_match[0]
+        src_text.extend(chunk_lines)
+        trans_text.extend(result[2].split('\n'))
+    return src_text, trans_text
+
 # 🚀 Main function to translate all chunks
 def translate_all():
     # Check if the file exists
@@ -74,52 +110,30 @@ def translate_all():
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
+        TextColumn("{task.completed:.0f}/{task.total:.0f} lines"),
         transient=True,
     ) as progress:
-        task = progress.add_task("[cyan]Translating chunks...", total=len(chunks))
-        with concurrent.futures.ThreadPoolExecutor(max_workers=load_key("max_workers")) as executor:
-            futures = []
-            for i, chunk in enumerate(chunks):
-                future = executor.submit(translate_chunk, chunk, chunks, theme_prompt, i)
-                futures.append(future)
-
-            results = []
-            for future in concurrent.futures.as_completed(futures):
-                results.append(future.result())
-                progress.update(task, advance=1)
-
-    results.sort(key=lambda x: x[0])  # Sort results based on original order
-    
-    # 💾 Save results to lists and Excel file
-    src_text, trans_text = [], []
-    for i, chunk in enumerate(chunks):
-        chunk_lines = chunk.split('\n')
-        src_text.extend(chunk_lines)
-        
-        # Calculate similarity between current chunk and translation results
-        chunk_text = ''.join(chunk_lines).lower()
-        matching_results = [(r, similar(''.join(r[1].split('\n')).lower(), chunk_text)) 
-                          for r in results]
-        best_match = max(matching_results, key=lambda x: x[1])
-        
-        # Check similarity and handle exceptions
-        if best_match[1] < 0.9:
-            console.print(f"[yellow]Warning: No matching translation found for chunk {i}[/yellow]")
-            raise ValueError(f"Translation matching failed (chunk {i})")
-        elif best_match[1] < 1.0:
-            console.print(f"[yellow]Warning: Similar match found (chunk {i}, similarity: {best_match[1]:.3f})[/yellow]")
-            
-        trans_text.extend(best_match[0][2].split('\n'))
-    
+        # advances per line as translations stream in, not only when a whole chunk is done
+        task = progress.add_task("[cyan]Translating chunks...", total=sum(len(chunk.split('\n')) for chunk in chunks))
+        async def translate_and_advance(chunk, i):
+            return await translate_chunk(chunk, chunks, theme_prompt, i, on_line=lambda: progress.update(task, advance=1))
+
+        results = run_all([translate_and_advance(chunk, i) for i, chunk in enumerate(chunks)])
+
+    # 💾 Reassemble results in chunk order
+    src_text, trans_text = reassemble_translations(chunks, results)
+
     # Trim long translation text
-    df_text = pd.read_excel(CLEANED_CHUNKS_FILE)
-    df_text['text'] = df_text['text'].str.strip('"').str.strip()
+    transcript = load_transcript_index(CLEANED_CHUNKS_FILE)
     df_translate = pd.DataFrame({'Source': src_text, 'Translation': trans_text})
     subtitle_output_configs = [('trans_subs_for_audio.srt', ['Translation'])]
-    df_time = align_timestamp(df_text, df_translate, subtitle_output_configs, output_dir=None, for_display=False)
+    df_time = align_timestamp(transcript, df_translate, subtitle_output_configs, output_dir=None, for_display=False)
     console.print(df_time)
     # apply check_len_then_trim to df_time['Translation'], only when duration > MIN_TRIM_DURATION.
-    df_time['Translation'] = df_time.apply(lambda x: check_len_then_trim(x['Translation'], x['duration']) if x['duration'] > load_key("min_trim_duration") else x['Translation'], axis=1)
+    min_trim_duration = load_key("min_trim_duration")
+    async def trim(text, duration):
+        return await check_len_then_trim(text, duration) if duration > min_trim_duration else text
+    df_time['Translation'] = run_all([trim(text, duration) for text, duration in zip(df_time['Translation'], df_time['duration'])])
     console.print(df_time)
     
     df_time.to_excel(TRANSLATION_RESULTS_FILE, index=False)
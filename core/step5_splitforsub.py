@@ -1,11 +1,10 @@
 import sys, os
 import pandas as pd
 from typing import List, Tuple
-import concurrent.futures
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.step3_2_splitbymeaning import split_sentence
-from core.ask_gpt import ask_gpt
+from core.ask_gpt import ask_gpt_async, run_all
 from core.prompts_storage import get_align_prompt
 from core.config_utils import load_key, get_joiner
 from rich.panel import Panel
@@ -38,7 +37,7 @@ def calc_len(text: str) -> float:
 
     return sum(char_weight(char) for char in text)
 
-def align_subs(src_sub: str, tr_sub: str, src_part: str) -> Tuple[List[str], List[str], str]:
+async def align_subs(src_sub: str, tr_sub: str, src_part: str) -> Tuple[List[str], List[str], str]:
     align_prompt = get_align_prompt(src_sub, tr_sub, src_part)
     
     def valid_align(response_data):
@@ -48,7 +47,7 @@ def align_subs(src_sub: str, tr_sub: str, src_part: str) -> Tuple[List[str], Lis
             return {"status": "error", "message": "Align does not contain more than 1 part as expected!"}
         return {"status": "success", "message": "Align completed"}
 
-    parsed = ask_gpt(align_prompt, response_json=True, valid_def=valid_align, log_title='align_subs')
+    parsed = await ask_gpt_async(align_prompt, response_json=True, valid_def=valid_align, log_title='align_subs')
     
     align_data = parsed['align']
     src_parts = src_part.split('\n')
@@ -87,15 +86,17 @@ def split_align_subs(src_lines: List[str], tr_lines: List[str]) -> Tuple[List[st
             table.add_row("Target Line", tr)
             console.print(table)
     
-    def process(i):
-        split_src = split_sentence(src_lines[i], num_parts=2).strip()
-        src_parts, tr_parts, tr_remerged = align_subs(src_lines[i], tr_lines[i], split_src)
+    async def process(i):
+        split_src = (await split_sentence(src_lines[i], num_parts=2)).strip()
+        src_parts, tr_parts, tr_remerged = await align_subs(src_lines[i], tr_lines[i], split_src)
         src_lines[i] = src_parts
         tr_lines[i] = tr_parts
         remerged_tr_lines[i] = tr_remerged
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=load_key("max_workers")) as executor:
-        executor.map(process, to_split)
+    # a failed line stays unsplit and is retried in the next attempt
+    for i, result in zip(to_split, run_all([process(i) for i in to_split], return_exceptions=True)):
+        if isinstance(result, Exception):
+            console.print(f"[yellow]⚠️ Line {i} could not be split: {result}[/yellow]")
     
     # Flatten `src_lines` and `tr_lines`
     src_lines = [item for sublist in src_lines for item in (sublist if isinstance(sublist, list) else [sublist])]
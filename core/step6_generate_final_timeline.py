@@ -1,10 +1,11 @@
 import pandas as pd
+import numpy as np
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import re
 from rich.panel import Panel
 from rich.console import Console
 import autocorrect_py as autocorrect
+from core.transcript_index import load_transcript_index
 
 console = Console()
 
@@ -27,124 +28,71 @@ AUDIO_SUBTITLE_OUTPUT_CONFIGS = [
     ('trans_subs_for_audio.srt', ['Translation'])
 ]
 
-def convert_to_srt_format(start_time, end_time):
-    """Convert time (in seconds) to the format: hours:minutes:seconds,milliseconds"""
-    def seconds_to_hmsm(seconds):
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        seconds = seconds % 60
-        milliseconds = int(seconds * 1000) % 1000
-        return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
-
-    start_srt = seconds_to_hmsm(start_time)
-    end_srt = seconds_to_hmsm(end_time)
-    return f"{start_srt} --> {end_srt}"
-
-def remove_punctuation(text):
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'[^\w\s]', '', text)
-    return text.strip()
-
-def show_difference(str1, str2):
-    """Show the difference positions between two strings"""
-    min_len = min(len(str1), len(str2))
-    diff_positions = []
-    
-    for i in range(min_len):
-        if str1[i] != str2[i]:
-            diff_positions.append(i)
-    
-    if len(str1) != len(str2):
-        diff_positions.extend(range(min_len, max(len(str1), len(str2))))
-    
-    print("Difference positions:")
-    print(f"Expected sentence: {str1}")
-    print(f"Actual match: {str2}")
-    print("Position markers: " + "".join("^" if i in diff_positions else " " for i in range(max(len(str1), len(str2)))))
-    print(f"Difference indices: {diff_positions}")
-
-def get_sentence_timestamps(df_words, df_sentences):
-    time_stamp_list = []
-    
-    # Build complete string and position mapping
-    full_words_str = ''
-    position_to_word_idx = {}
-    
-    for idx, word in enumerate(df_words['text']):
-        clean_word = remove_punctuation(word.lower())
-        start_pos = len(full_words_str)
-        full_words_str += clean_word
-        for pos in range(start_pos, len(full_words_str)):
-            position_to_word_idx[pos] = idx
-    
-    current_pos = 0
-    for idx, sentence in df_sentences['Source'].items():
-        clean_sentence = remove_punctuation(sentence.lower()).replace(" ", "")
-        sentence_len = len(clean_sentence)
-        
-        match_found = False
-        while current_pos <= len(full_words_str) - sentence_len:
-            if full_words_str[current_pos:current_pos+sentence_len] == clean_sentence:
-                start_word_idx = position_to_word_idx[current_pos]
-                end_word_idx = position_to_word_idx[current_pos + sentence_len - 1]
-                
-                time_stamp_list.append((
-                    float(df_words['start'][start_word_idx]),
-                    float(df_words['end'][end_word_idx])
-                ))
-                
-                current_pos += sentence_len
-                match_found = True
-                break
-            current_pos += 1
-            
-        if not match_found:
-            print(f"\n⚠️ Warning: No exact match found for sentence: {sentence}")
-            show_difference(clean_sentence, 
-                          full_words_str[current_pos:current_pos+len(clean_sentence)])
-            print("\nOriginal sentence:", df_sentences['Source'][idx])
-            raise ValueError("❎ No match found for sentence.")
-    
-    return time_stamp_list
-
-def align_timestamp(df_text, df_translate, subtitle_output_configs: list, output_dir: str, for_display: bool = True):
-    """Align timestamps and add a new timestamp column to df_translate"""
+def seconds_to_hmsm(seconds):
+    """Convert an array of times (in seconds) to the format: hours:minutes:seconds,milliseconds"""
+    seconds = np.asarray(seconds, dtype=np.float64)
+    hours = (seconds // 3600).astype(np.int64)
+    minutes = ((seconds % 3600) // 60).astype(np.int64)
+    seconds = seconds % 60
+    milliseconds = (seconds * 1000).astype(np.int64) % 1000
+    return [f"{h:02d}:{m:02d}:{s:02d},{ms:03d}" for h, m, s, ms in
+            zip(hours.tolist(), minutes.tolist(), seconds.astype(np.int64).tolist(), milliseconds.tolist())]
+
+def convert_to_srt_format(start_times, end_times):
+    """SRT time ranges `start --> end` for arrays of start and end times (in seconds)"""
+    return [f"{start} --> {end}" for start, end in zip(seconds_to_hmsm(start_times), seconds_to_hmsm(end_times))]
+
+def close_gaps(starts, ends, max_gap=1):
+    """Extend each end to the next start when the silence between them is shorter than `max_gap` seconds"""
+    ends = ends.copy()
+    gaps = starts[1:] - ends[:-1]
+    close = (gaps > 0) & (gaps < max_gap)
+    ends[:-1][close] = starts[1:][close]
+    return ends
+
+def generate_subtitle_strings(df, subtitle_output_configs):
+    """{filename: SRT text} for every subtitle variant, the numbering, times and stripped texts are built once"""
+    heads = [f"{i}\n{timestamp}\n" for i, timestamp in enumerate(df['timestamp'].tolist(), 1)]
+    texts = {column: df[column].str.strip().tolist() for _, columns in subtitle_output_configs for column in columns}
+    subtitles = {}
+    for filename, columns in subtitle_output_configs:
+        second_texts = texts[columns[1]] if len(columns) > 1 else [''] * len(heads)
+        subtitles[filename] = ''.join([f"{head}{first}\n{second}\n\n" for head, first, second in
+                                       zip(heads, texts[columns[0]], second_texts)]).strip()
+    return subtitles
+
+def get_sentence_timestamps(transcript, df_sentences):
+    """(start, end) times of df_sentences['Source'] in a TranscriptIndex"""
+    return transcript.timestamps(df_sentences['Source'])
+
+def align_timestamp(transcript, df_translate, subtitle_output_configs: list, output_dir: str, for_display: bool = True):
+    """Align timestamps and add a new timestamp column to df_translate, `transcript` is a TranscriptIndex"""
     df_trans_time = df_translate.copy()
 
-    # Assign an ID to each word in df_text['text'] and create a new DataFrame
-    words = df_text['text'].str.split(expand=True).stack().reset_index(level=1, drop=True).reset_index()
-    words.columns = ['id', 'word']
-    words['id'] = words['id'].astype(int)
-
     # Process timestamps ⏰
-    time_stamp_list = get_sentence_timestamps(df_text, df_translate)
-    df_trans_time['timestamp'] = time_stamp_list
-    df_trans_time['duration'] = df_trans_time['timestamp'].apply(lambda x: x[1] - x[0])
+    time_stamp_list = get_sentence_timestamps(transcript, df_translate)
+    times = np.array(time_stamp_list, dtype=np.float64).reshape(-1, 2)
+    starts, ends = times[:, 0], times[:, 1]
+    duration = ends - starts
 
     # Remove gaps 🕳️
-    for i in range(len(df_trans_time)-1):
-        delta_time = df_trans_time.loc[i+1, 'timestamp'][0] - df_trans_time.loc[i, 'timestamp'][1]
-        if 0 < delta_time < 1:
-            df_trans_time.at[i, 'timestamp'] = (df_trans_time.loc[i, 'timestamp'][0], df_trans_time.loc[i+1, 'timestamp'][0])
+    ends = close_gaps(starts, ends)
 
     # Convert start and end timestamps to SRT format
-    df_trans_time['timestamp'] = df_trans_time['timestamp'].apply(lambda x: convert_to_srt_format(x[0], x[1]))
+    df_trans_time['timestamp'] = convert_to_srt_format(starts, ends)
+    df_trans_time['duration'] = duration
 
     # Polish subtitles: replace punctuation in Translation if for_display
     if for_display:
-        df_trans_time['Translation'] = df_trans_time['Translation'].apply(lambda x: re.sub(r'[，。]', ' ', x).strip())
+        df_trans_time['Translation'] = df_trans_time['Translation'].str.replace(r'[，。]', ' ', regex=True).str.strip()
 
     # Output subtitles 📜
-    def generate_subtitle_string(df, columns):
-        return ''.join([f"{i+1}\n{row['timestamp']}\n{row[columns[0]].strip()}\n{row[columns[1]].strip() if len(columns) > 1 else ''}\n\n" for i, row in df.iterrows()]).strip()
-
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
-        for filename, columns in subtitle_output_configs:
-            subtitle_str = generate_subtitle_string(df_trans_time, columns)
+        for filename, subtitle_str in generate_subtitle_strings(df_trans_time, subtitle_output_configs).items():
             with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
                 f.write(subtitle_str)
-    
+
     return df_trans_time
 
 # ✨ Beautify the translation
@@ -155,19 +103,18 @@ def clean_translation(x):
     return autocorrect.format(cleaned)
 
 def align_timestamp_main():
-    df_text = pd.read_excel(CLEANED_CHUNKS_FILE)
-    df_text['text'] = df_text['text'].str.strip('"').str.strip()
+    transcript = load_transcript_index(CLEANED_CHUNKS_FILE)
     df_translate = pd.read_excel(TRANSLATION_RESULTS_FOR_SUBTITLES_FILE)
     df_translate['Translation'] = df_translate['Translation'].apply(clean_translation)
     
-    align_timestamp(df_text, df_translate, SUBTITLE_OUTPUT_CONFIGS, OUTPUT_DIR)
+    align_timestamp(transcript, df_translate, SUBTITLE_OUTPUT_CONFIGS, OUTPUT_DIR)
     console.print(Panel("[bold green]🎉📝 Subtitles generation completed! Please check in the `output` folder 👀[/bold green]"))
 
     # for audio
     df_translate_for_audio = pd.read_excel(TRANSLATION_RESULTS_REMERGED_FILE) # use remerged file to avoid unmatched lines when dubbing
     df_translate_for_audio['Translation'] = df_translate_for_audio['Translation'].apply(clean_translation)
     
-    align_timestamp(df_text, df_translate_for_audio, AUDIO_SUBTITLE_OUTPUT_CONFIGS, AUDIO_OUTPUT_DIR)
+    align_timestamp(transcript, df_translate_for_audio, AUDIO_SUBTITLE_OUTPUT_CONFIGS, AUDIO_OUTPUT_DIR)
     console.print(Panel("[bold green]🎉📝 Audio subtitles generation completed! Please check in the `output/audio` folder 👀[/bold green]"))
     
 
@@ -3,7 +3,9 @@ import datetime
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import re
-from core.ask_gpt import ask_gpt
+import asyncio
+from threading import Lock
+from core.ask_gpt import ask_gpt_async
 from core.prompts_storage import get_subtitle_trim_prompt
 from rich import print as rprint
 from rich.panel import Panel
@@ -18,12 +20,19 @@ TRANS_SUBS_FOR_AUDIO_FILE = 'output/audio/trans_subs_for_audio.srt'
 SRC_SUBS_FOR_AUDIO_FILE = 'output/audio/src_subs_for_audio.srt'
 SOVITS_TASKS_FILE = 'output/audio/tts_tasks.xlsx'
 ESTIMATOR = None
+ESTIMATOR_LOCK = Lock()
 
-def check_len_then_trim(text, duration):
+def estimate_reading_duration(text):
+    """Estimated reading duration of `text`, the estimator (g2p model) is loaded on first use"""
     global ESTIMATOR
-    if ESTIMATOR is None:
-        ESTIMATOR = init_estimator()
-    estimated_duration = estimate_duration(text, ESTIMATOR) / speed_factor['max']
+    with ESTIMATOR_LOCK:
+        if ESTIMATOR is None:
+            ESTIMATOR = init_estimator()
+    return estimate_duration(text, ESTIMATOR) / speed_factor['max']
+
+async def check_len_then_trim(text, duration):
+    # loading the estimator and g2p are CPU work, kept off the engine loop
+    estimated_duration = await asyncio.to_thread(estimate_reading_duration, text)
     
     console.print(f"Subtitle text: {text}, "
                   f"[bold green]Estimated reading duration: {estimated_duration:.2f} seconds[/bold green]")
@@ -37,7 +46,7 @@ def check_len_then_trim(text, duration):
                 return {'status': 'error', 'message': 'No result in response'}
             return {'status': 'success', 'message': ''}
         try:    
-            response = ask_gpt(prompt, response_json=True, log_title='subtitle_trim', valid_def=valid_trim)
+            response = await ask_gpt_async(prompt, response_json=True, log_title='subtitle_trim', valid_def=valid_trim)
             shortened_text = response['result']
         except Exception:
             rprint("[bold red]🚫 AI refused to answer due to sensitivity, so manually remove punctuation[/bold red]")
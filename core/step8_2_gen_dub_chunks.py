@@ -203,8 +203,10 @@ def gen_dub_chunks():
             rprint(f"Current: '{current}'")
             raise ValueError("Matching failed")
 
-    # Save results
-    df.to_excel(OUTPUT_EXCEL, index=False)
+    # Save results, replace atomically as reference audio extraction may read the tasks concurrently
+    tmp_excel = OUTPUT_EXCEL.replace('.xlsx', '.tmp.xlsx')
+    df.to_excel(tmp_excel, index=False)
+    os.replace(tmp_excel, OUTPUT_EXCEL)
     rprint("[✅ Complete] Matching completed successfully!")
 
 if __name__ == "__main__":
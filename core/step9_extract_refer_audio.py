@@ -7,7 +7,8 @@ from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 import pandas as pd
 import soundfile as sf
 console = Console()
-from core.all_whisper_methods.demucs_vl import demucs_main, VOCAL_AUDIO_FILE
+from core.all_whisper_methods.demucs_vl import demucs_main, VOCAL_AUDIO_FILE, DEMUCS_SR
+from core.audio_store import load_pcm
 
 # Simplified path definitions
 REF_DIR = 'output/audio/refers'
@@ -22,23 +23,24 @@ def time_to_samples(time_str, sr):
     return int(seconds * sr)
 
 def extract_audio(audio_data, sr, start_time, end_time, out_file):
-    """Simplified audio extraction function"""
+    """Write a zero-copy slice of the vocals"""
     start = time_to_samples(start_time, sr)
     end = time_to_samples(end_time, sr)
     sf.write(out_file, audio_data[start:end], sr)
 
 def extract_refer_audio_main():
     demucs_main() #!!! in case demucs is not run
-    if os.path.exists(os.path.join(SEG_DIR, '1.wav')):
+    if os.path.exists(os.path.join(REF_DIR, '1.wav')):
         rprint(Panel("Audio segments already exist, skipping extraction", title="Info", border_style="blue"))
         return
 
     # Create output directory
     os.makedirs(REF_DIR, exist_ok=True)
     
-    # Read task file and audio data
+    # Read task file and audio data, mono vocals from the audio store (handed over by Demucs, no decode)
     df = pd.read_excel(TASKS_FILE)
-    data, sr = sf.read(VOCAL_AUDIO_FILE)
+    sr = DEMUCS_SR
+    data = load_pcm(VOCAL_AUDIO_FILE, sr)
     
     with Progress(
         SpinnerColumn(),
@@ -0,0 +1,86 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+from collections import deque
+from threading import Lock
+
+# Aho–Corasick automaton over the terminology, finds every term of a chunk in one pass over its characters
+# instead of one substring scan per term. Matching is case-folded; for languages written with spaces a term
+# must also start and end on word boundaries ("AI" does not match "said"), otherwise any substring matches.
+# Built once per version of terminology.json and shared by all chunks of a run.
+
+_MATCHERS = {}
+_LOCK = Lock()
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+class TermMatcher:
+    """Finds which of `terms` (strings) occur in a text, returns their indices"""
+    def __init__(self, terms, word_boundaries=True):
+        self.word_boundaries = word_boundaries
+        self.always = []  # empty terms match every text
+        # node 0 is the root; goto[n] maps a character to a child, fail[n] is the longest proper suffix node,
+        # out[n] lists (term index, length) of all terms ending at n, including those reached through fail links
+        self.goto, self.fail, self.out = [{}], [0], [[]]
+        for idx, term in enumerate(terms):
+            folded = term.casefold()
+            if not folded:
+                self.always.append(idx)
+                continue
+            node = 0
+            for ch in folded:
+                child = self.goto[node].get(ch)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][ch] = child
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = child
+            self.out[node].append((idx, len(folded), _is_word_char(folded[0]), _is_word_char(folded[-1])))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and ch not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text):
+        """Sorted indices of the terms that occur in `text`"""
+        text = text.casefold()
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set(self.always)
+        node = 0
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx, length, word_start, word_end in out[node]:
+                if idx in found:
+                    continue
+                if self.word_boundaries:
+                    start = end - length
+                    if word_start and start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if word_end and end < len(text) and _is_word_char(text[end]):
+                        continue
+                found.add(idx)
+        return sorted(found)
+
+def load_term_matcher(path, word_boundaries=True):
+    """(terms, matcher) of the terminology file at `path`, parsed and built once per version of the file"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns, word_boundaries)
+    with _LOCK:
+        if key not in _MATCHERS:
+            with open(path, 'r', encoding='utf-8') as file:
+                terms = json.load(file)['terms']
+            _MATCHERS.clear()  # a rewritten terminology makes older matchers stale
+            _MATCHERS[key] = (terms, TermMatcher([term['src'] for term in terms], word_boundaries))
+        return _MATCHERS[key]
@@ -0,0 +1,110 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import re
+from difflib import SequenceMatcher
+from threading import Lock
+import numpy as np
+import pandas as pd
+from rich import print as rprint
+
+# Word-level transcript indexed for sentence lookups. The words are lowercased and stripped of punctuation and
+# concatenated into one string, a cumulative offset array maps a character of it back to its word.
+# A sentence is found with str.find from the end of the previous one, its words with searchsorted.
+# Built once per cleaned_chunks.xlsx and shared by translate_all and both align_timestamp passes.
+
+CLEANED_CHUNKS_FILE = 'output/log/cleaned_chunks.xlsx'
+
+# a sentence that is not found verbatim is aligned approximately in the next stretch of the transcript,
+# at most this many times its own length (plus a fixed slack) is searched
+FUZZY_WINDOW_FACTOR = 2
+FUZZY_SLACK = 50
+FUZZY_MIN_RATIO = 0.8
+
+_SPACES = re.compile(r'\s+')
+_PUNCT = re.compile(r'[^\w\s]')
+
+_INDEXES = {}
+_LOCK = Lock()
+
+def remove_punctuation(text):
+    text = _SPACES.sub(' ', text)
+    text = _PUNCT.sub('', text)
+    return text.strip()
+
+def show_difference(str1, str2):
+    """Show the difference positions between two strings"""
+    min_len = min(len(str1), len(str2))
+    diff_positions = [i for i in range(min_len) if str1[i] != str2[i]]
+    if len(str1) != len(str2):
+        diff_positions.extend(range(min_len, max(len(str1), len(str2))))
+    diff_set = set(diff_positions)
+
+    print("Difference positions:")
+    print(f"Expected sentence: {str1}")
+    print(f"Actual match: {str2}")
+    print("Position markers: " + "".join("^" if i in diff_set else " " for i in range(max(len(str1), len(str2)))))
+    print(f"Difference indices: {diff_positions}")
+
+class TranscriptIndex:
+    """Sentence → (start, end) time lookups over a word-level transcript (columns text, start, end)"""
+    def __init__(self, df_words):
+        clean = (df_words['text'].fillna('').astype(str).str.lower()
+                 .str.replace(_SPACES, ' ', regex=True).str.replace(_PUNCT, '', regex=True).str.strip())
+        self.text = ''.join(clean)
+        # word i covers characters [word_ends[i-1], word_ends[i]) of self.text, empty words cover none
+        self.word_ends = np.cumsum(clean.str.len().to_numpy(dtype=np.int64))
+        self.starts = df_words['start'].to_numpy(dtype=np.float64)
+        self.ends = df_words['end'].to_numpy(dtype=np.float64)
+
+    def word_at(self, positions):
+        return np.minimum(np.searchsorted(self.word_ends, positions, side='right'), len(self.word_ends) - 1)
+
+    def fuzzy_find(self, sentence, cursor):
+        """(start, end, similarity) of the best approximate match of `sentence` in a bounded window after `cursor`, or None"""
+        window = self.text[cursor:cursor + FUZZY_WINDOW_FACTOR * len(sentence) + FUZZY_SLACK]
+        blocks = [b for b in SequenceMatcher(None, window, sentence, autojunk=False).get_matching_blocks() if b.size]
+        if not blocks:
+            return None
+        start, end = blocks[0].a, blocks[-1].a + blocks[-1].size
+        ratio = 2 * sum(b.size for b in blocks) / (len(sentence) + end - start)
+        if ratio < FUZZY_MIN_RATIO:
+            return None
+        return cursor + start, cursor + end, ratio
+
+    def timestamps(self, sentences):
+        """(start, end) times of each sentence, sentences in transcript order"""
+        spans = []
+        cursor = 0
+        for sentence in sentences:
+            clean = remove_punctuation(sentence.lower()).replace(" ", "")
+            pos = self.text.find(clean, cursor)
+            if pos >= 0:
+                start, end = pos, pos + len(clean)
+            else:
+                match = self.fuzzy_find(clean, cursor)
+                if match is None:
+                    rprint(f"\n[yellow]⚠️ Warning: No match found for sentence: {sentence}[/yellow]")
+                    show_difference(clean, self.text[cursor:cursor + len(clean)])
+                    raise ValueError("❎ No match found for sentence.")
+                start, end, ratio = match
+                rprint(f"[yellow]⚠️ Warning: approximate match (similarity {ratio:.2f}) for sentence: {sentence}[/yellow]")
+            spans.append((start, end))
+            cursor = end
+
+        if not spans:
+            return []
+        spans = np.array(spans, dtype=np.int64)
+        first, last = self.word_at(spans[:, 0]), self.word_at(spans[:, 1] - 1)
+        return list(zip(self.starts[first].tolist(), self.ends[last].tolist()))
+
+def load_transcript_index(path=CLEANED_CHUNKS_FILE):
+    """The index of the word-level transcript at `path`, built once per version of the file"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _LOCK:
+        if key not in _INDEXES:
+            df_words = pd.read_excel(path)
+            df_words['text'] = df_words['text'].fillna('').astype(str).str.strip('"').str.strip()
+            _INDEXES.clear()  # a rewritten transcript makes older indexes stale
+            _INDEXES[key] = TranscriptIndex(df_words)
+        return _INDEXES[key]
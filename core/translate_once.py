@@ -1,6 +1,7 @@
 import os, sys
+import asyncio
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.ask_gpt import ask_gpt
+from core.ask_gpt import ask_gpt_async, run_async, export_gpt_logs, PENDING
 from core.prompts_storage import generate_shared_prompt, get_prompt_faithfulness, get_prompt_expressiveness
 from rich.panel import Panel
 from rich.console import Console
@@ -22,21 +23,54 @@ def valid_translate_result(result: dict, required_keys: list, required_sub_keys:
 
     return {"status": "success", "message": "Translation completed"}
 
-def translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_to_note_prompt, summary_prompt, index = 0):
+def stream_translate_check(expected_count: int, required_sub_key: str):
+    """Per-item check of a streamed translation, catches wrong ids or a missing sub-key before the answer is finished"""
+    def check(key, value, count):
+        if count > expected_count:
+            return f"Got more than {expected_count} items"
+        if key != str(count):
+            return f"Expected item {count}, got item {key}"
+        if value is PENDING:
+            return None
+        if not isinstance(value, dict) or required_sub_key not in value:
+            return f"Missing required sub-key in item {key}: {required_sub_key}"
+        return None
+    return check
+
+def finish_lines(on_line, done_lines, result):
+    """Report the lines that did not stream in (cached or non-streamed answers)"""
+    if on_line:
+        for _ in range(len(set(result) - done_lines)):
+            on_line()
+
+async def translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_to_note_prompt, summary_prompt, index = 0, on_line=None):
+    """on_line() is called once per line of `lines` as its final translation arrives (streamed) or at the latest on return"""
     shared_prompt = generate_shared_prompt(previous_content_prompt, after_cotent_prompt, summary_prompt, things_to_note_prompt)
+    reflect_translate = load_key('reflect_translate')
+    final_step = 'expressiveness' if reflect_translate else 'faithfulness'
+    done_lines = set()
+    def on_item(key, value):
+        # items are seen again when a request is retried, count each line once
+        if on_line and key not in done_lines:
+            done_lines.add(key)
+            on_line()
 
     # Retry translation if the length of the original text and the translated text are not the same, or if the specified key is missing
-    def retry_translation(prompt, step_name):
+    async def retry_translation(prompt, step_name):
+        item_callback = on_item if step_name == final_step else None
         def valid_faith(response_data):
             return valid_translate_result(response_data, ['1'], ['direct'])
         def valid_express(response_data):
             return valid_translate_result(response_data, ['1'], ['free'])
+        line_count = len(lines.split('\n'))
         for retry in range(3):
             if step_name == 'faithfulness':
-                result = ask_gpt(prompt+retry* " ", response_json=True, valid_def=valid_faith, log_title=f'translate_{step_name}')
+                result = await ask_gpt_async(prompt+retry* " ", response_json=True, valid_def=valid_faith, log_title=f'translate_{step_name}',
+                                             stream_check=stream_translate_check(line_count, 'direct'), on_item=item_callback)
             elif step_name == 'expressiveness':
-                result = ask_gpt(prompt+retry* " ", response_json=True, valid_def=valid_express, log_title=f'translate_{step_name}')
-            if len(lines.split('\n')) == len(result):
+                result = await ask_gpt_async(prompt+retry* " ", response_json=True, valid_def=valid_express, log_title=f'translate_{step_name}',
+                                             stream_check=stream_translate_check(line_count, 'free'), on_item=item_callback)
+            if line_count == len(result):
                 return result
             if retry != 2:
                 console.print(f'[yellow]⚠️ {step_name.capitalize()} translation of block {index} failed, Retry...[/yellow]')
@@ -44,13 +78,12 @@ def translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_
 
     ## Step 1: Faithful to the Original Text
     prompt1 = get_prompt_faithfulness(lines, shared_prompt)
-    faith_result = retry_translation(prompt1, 'faithfulness')
+    faith_result = await retry_translation(prompt1, 'faithfulness')
 
     for i in faith_result:
         faith_result[i]["direct"] = faith_result[i]["direct"].replace('\n', ' ')
 
     # If reflect_translate is False or not set, use faithful translation directly
-    reflect_translate = load_key('reflect_translate')
     if not reflect_translate:
         # If reflect_translate is False or not set, use faithful translation directly
         translate_result = "\n".join([faith_result[i]["direct"].strip() for i in faith_result])
@@ -64,11 +97,12 @@ def translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_
                 table.add_row("[yellow]" + "-" * 50 + "[/yellow]")
         
         console.print(table)
+        finish_lines(on_line, done_lines, faith_result)
         return translate_result, lines
 
     ## Step 2: Express Smoothly  
     prompt2 = get_prompt_expressiveness(faith_result, lines, shared_prompt)
-    express_result = retry_translation(prompt2, 'expressiveness')
+    express_result = await retry_translation(prompt2, 'expressiveness')
 
     table = Table(title="Translation Results", show_header=False, box=box.ROUNDED)
     table.add_column("Translations", style="bold")
@@ -84,9 +118,11 @@ def translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_
     translate_result = "\n".join([express_result[i]["free"].replace('\n', ' ').strip() for i in express_result])
 
     if len(lines.split('\n')) != len(translate_result.split('\n')):
+        await asyncio.to_thread(export_gpt_logs, 'translate_expressiveness')
         console.print(Panel(f'[red]❌ Translation of block {index} failed, Length Mismatch, Please check `output/gpt_log/translate_expressiveness.json`[/red]'))
         raise ValueError(f'Origin ···{lines}···,\nbut got ···{translate_result}···')
 
+    finish_lines(on_line, done_lines, express_result)
     return translate_result, lines
 
 
@@ -100,4 +136,4 @@ Also the founder and creator and early lead of Google Brain.'''
     after_cotent_prompt = None
     things_to_note_prompt = None
     summary_prompt = None
-    translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_to_note_prompt, summary_prompt)
\ No newline at end of file
+    run_async(translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_to_note_prompt, summary_prompt))
\ No newline at end of file
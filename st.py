@@ -2,6 +2,7 @@ import streamlit as st
 import os, sys
 from st_components.imports_and_utils import *
 from core.config_utils import load_key
+from core.pipeline import run_pipeline, text_stages, audio_stages
 
 # SET PATH
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -42,22 +43,37 @@ def text_processing_section():
                 st.rerun()
             return True
 
+TEXT_STAGE_MESSAGES = {
+    "transcribe": "Using Whisper for transcription...",
+    "split_by_spacy": "Splitting long sentences...",
+    "split_by_meaning": "Splitting long sentences...",
+    "summarize": "Summarizing and translating...",
+    "translate": "Summarizing and translating...",
+    "split_for_sub": "Processing and aligning subtitles...",
+    "gen_timeline": "Processing and aligning subtitles...",
+    "merge_sub_to_vid": "Merging subtitles to video...",
+}
+
+AUDIO_STAGE_MESSAGES = {
+    "gen_audio_task": "Generate audio tasks",
+    "gen_dub_chunks": "Generate audio tasks",
+    "extract_refer_audio": "Extract refer audio",
+    "gen_audio": "Generate all audio",
+    "merge_full_audio": "Merge full audio",
+    "merge_dub_to_vid": "Merge dubbing to the video",
+}
+
+def run_stages(stages, messages):
+    # stages may overlap, the placeholder shows the latest one started
+    status = st.empty()
+    run_pipeline(stages, on_start=lambda stage: status.info(f"⏳ {t(messages[stage.name])}"))
+    status.empty()
+
 def process_text():
-    with st.spinner(t("Using Whisper for transcription...")):
-        step2_whisperX.transcribe()
-    with st.spinner(t("Splitting long sentences...")):  
-        step3_1_spacy_split.split_by_spacy()
-        step3_2_splitbymeaning.split_sentences_by_meaning()
-    with st.spinner(t("Summarizing and translating...")):
-        step4_1_summarize.get_summary()
+    def pause_before_translate():
         if load_key("pause_before_translate"):
             input(t("⚠️ PAUSE_BEFORE_TRANSLATE. Go to `output/log/terminology.json` to edit terminology. Then press ENTER to continue..."))
-        step4_2_translate_all.translate_all()
-    with st.spinner(t("Processing and aligning subtitles...")): 
-        step5_splitforsub.split_for_sub_main()
-        step6_generate_final_timeline.align_timestamp_main()
-    with st.spinner(t("Merging subtitles to video...")):
-        step7_merge_sub_to_vid.merge_subtitles_to_video()
+    run_stages(text_stages(before_translate=pause_before_translate), TEXT_STAGE_MESSAGES)
     
     st.success(t("Subtitle processing complete! 🎉"))
     st.balloons()
@@ -90,17 +106,7 @@ def audio_processing_section():
                 st.rerun()
 
 def process_audio():
-    with st.spinner(t("Generate audio tasks")): 
-        step8_1_gen_audio_task.gen_audio_task_main()
-        step8_2_gen_dub_chunks.gen_dub_chunks()
-    with st.spinner(t("Extract refer audio")):
-        step9_extract_refer_audio.extract_refer_audio_main()
-    with st.spinner(t("Generate all audio")):
-        step10_gen_audio.gen_audio()
-    with st.spinner(t("Merge full audio")):
-        step11_merge_full_audio.merge_full_audio()
-    with st.spinner(t("Merge dubbing to the video")):
-        step12_merge_dub_to_vid.merge_video_audio()
+    run_stages(audio_stages(), AUDIO_STAGE_MESSAGES)
     
     st.success(t("Audio processing complete! 🎇"))
     st.balloons()
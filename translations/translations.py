@@ -1,5 +1,6 @@
 import json
 import sys,os
+from functools import lru_cache
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.config_utils import load_key
 
@@ -13,7 +14,8 @@ DISPLAY_LANGUAGES = {
     "🇫🇷 Français": "fr",
 }
 
-# Load the language file based on user selection
+# Load the language file based on user selection, cached since translate() runs for every UI string
+@lru_cache(maxsize=None)
 def load_translations(language="en"):
     with open(f'translations/{language}.json', 'r', encoding='utf-8') as file:
         return json.load(file)